@@ -0,0 +1,117 @@
+"""
+Logging assíncrono do chatbot: a thread do Streamlit só enfileira o registro
+(QueueHandler) e uma thread de fundo (QueueListener) formata e grava.
+
+O arquivo gira por tamanho (RotatingFileHandler) e cada linha é um JSON com
+sessão e turno, preenchidos a partir do contexto vinculado com `bind()` na
+thread que gerou o registro. Com a fila cheia o registro é descartado e
+contado, em vez de travar a resposta ao usuário.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+_context: contextvars.ContextVar = contextvars.ContextVar("mylle_log_context", default={})
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def bind(**fields) -> None:
+    """Acrescenta campos (session, turn...) ao contexto de log da thread atual; None remove."""
+    current = dict(_context.get())
+    for key, value in fields.items():
+        if value is None:
+            current.pop(key, None)
+        else:
+            current[key] = value
+    _context.set(current)
+
+
+def current_context() -> Dict:
+    return _context.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro: ts, level, logger, msg, contexto e exceção."""
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        data.update(getattr(record, "context", None) or {})
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Anexa o contexto da thread e enfileira sem bloquear; a formatação fica no listener."""
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Só resolve a mensagem (os args podem mudar depois); JSON e traceback no listener
+        record.context = _context.get()
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AsyncLogging:
+    """Fila + listener + handlers reais; `stop()` drena a fila."""
+    def __init__(self, handler: ContextQueueHandler, listener: logging.handlers.QueueListener):
+        self.handler = handler
+        self.listener = listener
+        self._stopped = threading.Event()
+
+    def stop(self) -> None:
+        if not self._stopped.is_set():
+            self._stopped.set()
+            self.listener.stop()
+
+    def stats(self) -> Dict:
+        return {"queued": self.handler.queue.qsize(), "dropped": self.handler.dropped}
+
+
+def setup_async_logging(path: Optional[str] = "app.log", level: int = logging.INFO,
+                        max_bytes: int = 10 * 1024 * 1024, backups: int = 5, json_file: bool = True,
+                        console: bool = True, queue_size: int = 10000) -> AsyncLogging:
+    """Troca os handlers do logger raiz por um QueueHandler ligado a arquivo rotativo e console."""
+    handlers = []
+    if path:
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                            encoding="utf-8", delay=True)
+        file_handler.setFormatter(JsonFormatter() if json_file else logging.Formatter(TEXT_FORMAT))
+        handlers.append(file_handler)
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(stream_handler)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = ContextQueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener.start()
+    async_logging = AsyncLogging(queue_handler, listener)
+    atexit.register(async_logging.stop)
+    return async_logging
@@ -140,6 +140,11 @@ class DatabaseService:
             st.error(f"Erro ao atualizar perfil: {str(e)}")
             return False
 
+@st.cache_data(max_entries=4096, show_spinner=False)
+def _cached_sentiment(text: str) -> tuple:
+    """Polaridade do texto via TextBlob, memorizada pelo conteúdo (limite de 4096 entradas)"""
+    return ApiService._compute_sentiment(text)
+
 class ApiService:
     """Serviço para integração com APIs externas"""
     
@@ -148,6 +153,11 @@ class ApiService:
         self.base_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
     
     def analyze_sentiment(self, text: str) -> tuple:
+        """Analisa o sentimento do texto (cada texto distinto passa pelo TextBlob uma vez só)"""
+        return _cached_sentiment(text.strip())
+    
+    @staticmethod
+    def _compute_sentiment(text: str) -> tuple:
         """Analisa o sentimento do texto usando TextBlob"""
         try:
             blob = TextBlob(text)
@@ -0,0 +1,269 @@
+"""
+Cache local dos áudios da Mylle.
+
+Baixa cada clipe de `Config.AUDIOS` uma única vez, valida que é um MP3 de
+verdade, grava com nome endereçado por conteúdo e pré-calcula duração e
+tamanho para o player. Os arquivos podem ser servidos pelo `media_server.py`
+(Range, ETag e cache longo) ou por qualquer servidor estático.
+
+Uso:
+    python audio_assets.py sync      # baixa/verifica todos os clipes
+    python audio_assets.py list      # mostra o manifesto
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+AUDIO_CACHE_DIR = os.getenv("MYLLE_AUDIO_CACHE", os.path.join("media", "audio"))
+MEDIA_BASE_URL = os.getenv("MYLLE_MEDIA_BASE_URL", "").rstrip("/")
+MANIFEST_NAME = "manifest.json"
+DOWNLOAD_TIMEOUT = 30
+DOWNLOAD_RETRIES = 3
+
+# ======================
+# LEITURA DE CABEÇALHOS MP3
+# ======================
+# Bitrates em kbps indexados por [versão MPEG-1?][camada][índice]
+_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _parse_frame_header(data: bytes, pos: int) -> Optional[Dict]:
+    """Interpreta um cabeçalho de frame MPEG na posição informada."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (data[pos + 1] >> 3) & 0x03
+    layer_bits = (data[pos + 1] >> 1) & 0x03
+    bitrate_idx = (data[pos + 2] >> 4) & 0x0F
+    sr_idx = (data[pos + 2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_idx in (0, 15) or sr_idx == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_idx]
+    sample_rate = _SAMPLE_RATES[version_bits][sr_idx]
+    padding = (data[pos + 2] >> 1) & 0x01
+    mono = ((data[pos + 3] >> 6) & 0x03) == 3
+
+    if layer == 1:
+        samples = 384
+        frame_len = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        frame_len = samples // 8 * bitrate * 1000 // sample_rate + padding
+
+    return {
+        "mpeg1": mpeg1, "layer": layer, "bitrate": bitrate, "sample_rate": sample_rate,
+        "samples": samples, "frame_len": frame_len, "mono": mono,
+    }
+
+
+def probe_mp3(data: bytes) -> Optional[Dict]:
+    """Retorna duração, bitrate e taxa de amostragem de um MP3, ou None se não for MP3."""
+    start = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+
+    # Procura o primeiro frame válido seguido de outro frame válido
+    pos, limit = start, min(len(data), start + 64 * 1024)
+    header = None
+    while pos < limit:
+        pos = data.find(b"\xff", pos, limit)
+        if pos < 0:
+            return None
+        header = _parse_frame_header(data, pos)
+        if header and (pos + header["frame_len"] >= len(data)
+                       or _parse_frame_header(data, pos + header["frame_len"])):
+            break
+        header = None
+        pos += 1
+    if not header:
+        return None
+
+    audio_bytes = len(data) - pos
+    duration = audio_bytes * 8 / (header["bitrate"] * 1000)
+
+    # Cabeçalhos Xing/Info (VBR) ou VBRI trazem o número exato de frames
+    side_info = (32 if not header["mono"] else 17) if header["mpeg1"] else (17 if not header["mono"] else 9)
+    xing = pos + 4 + side_info
+    if len(data) >= xing + 12 and data[xing:xing + 4] in (b"Xing", b"Info") and data[xing + 7] & 0x01:
+        frames = int.from_bytes(data[xing + 8:xing + 12], "big")
+        duration = frames * header["samples"] / header["sample_rate"]
+    elif len(data) >= pos + 54 and data[pos + 36:pos + 40] == b"VBRI":
+        frames = int.from_bytes(data[pos + 50:pos + 54], "big")
+        duration = frames * header["samples"] / header["sample_rate"]
+
+    return {
+        "duration": round(duration, 2),
+        "bitrate": header["bitrate"],
+        "sample_rate": header["sample_rate"],
+    }
+
+
+# ======================
+# ARMAZENAMENTO LOCAL
+# ======================
+class AudioAssetStore:
+    """Baixa, verifica e indexa os clipes de áudio em disco."""
+    def __init__(self, cache_dir: str = AUDIO_CACHE_DIR, base_url: str = MEDIA_BASE_URL):
+        self.cache_dir = cache_dir
+        self.base_url = base_url
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+        self.manifest: Dict[str, Dict] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _is_cached(self, key: str, url: str) -> bool:
+        entry = self.manifest.get(key)
+        if not entry or entry.get("source") != url:
+            return False
+        path = os.path.join(self.cache_dir, entry["file"])
+        return os.path.isfile(path) and os.path.getsize(path) == entry["size"]
+
+    def _download(self, key: str, url: str) -> Dict:
+        """Baixa um clipe, valida e grava de forma atômica."""
+        last_error: Optional[Exception] = None
+        for attempt in range(DOWNLOAD_RETRIES):
+            try:
+                response = requests.get(url, timeout=DOWNLOAD_TIMEOUT)
+                response.raise_for_status()
+                data = response.content
+                info = probe_mp3(data) if data else None
+                if not info:
+                    raise ValueError(f"conteúdo de {url} não é um MP3 válido")
+                break
+            except (requests.exceptions.RequestException, ValueError) as e:
+                last_error = e
+                time.sleep(0.5 * (attempt + 1))
+        else:
+            raise RuntimeError(f"Falha ao baixar áudio '{key}': {last_error}")
+
+        digest = hashlib.sha256(data).hexdigest()
+        file_name = f"{key}.{digest[:12]}.mp3"
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(self.cache_dir, file_name))
+
+        # Remove a versão anterior do mesmo clipe, se o conteúdo mudou
+        old = self.manifest.get(key)
+        if old and old.get("file") != file_name:
+            try:
+                os.remove(os.path.join(self.cache_dir, old["file"]))
+            except OSError:
+                pass
+
+        return {
+            "source": url,
+            "file": file_name,
+            "sha256": digest,
+            "size": len(data),
+            "mime": "audio/mpeg",
+            "fetched_at": int(time.time()),
+            **info,
+        }
+
+    def sync(self, audios: Dict[str, str], force: bool = False) -> Dict[str, Dict]:
+        """Garante que todos os clipes estejam em disco. Retorna o manifesto atualizado."""
+        with self._lock:
+            changed = False
+            for key, url in audios.items():
+                if not force and self._is_cached(key, url):
+                    continue
+                try:
+                    self.manifest[key] = self._download(key, url)
+                    changed = True
+                    logger.info(f"Áudio '{key}' armazenado ({self.manifest[key]['size']} bytes)")
+                except RuntimeError as e:
+                    logger.warning(str(e))
+            if changed:
+                self._save_manifest()
+            return dict(self.manifest)
+
+    def sync_in_background(self, audios: Dict[str, str]) -> None:
+        """Dispara o sync uma única vez por processo sem bloquear a página."""
+        if self._sync_thread is not None or all(self._is_cached(k, u) for k, u in audios.items()):
+            return
+        self._sync_thread = threading.Thread(target=self.sync, args=(dict(audios),), daemon=True)
+        self._sync_thread.start()
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.manifest.get(key)
+
+    def local_path(self, key: str) -> Optional[str]:
+        entry = self.manifest.get(key)
+        return os.path.join(self.cache_dir, entry["file"]) if entry else None
+
+    def url_for(self, key: str, fallback: str) -> str:
+        """URL pública do clipe: origem própria se configurada, senão a URL original."""
+        entry = self.manifest.get(key)
+        if entry and self.base_url:
+            return f"{self.base_url}/audio/{entry['file']}"
+        return fallback
+
+
+@lru_cache(maxsize=1)
+def get_audio_store() -> AudioAssetStore:
+    """Instância única do cache de áudios por processo."""
+    return AudioAssetStore()
+
+
+def format_duration(seconds: float) -> str:
+    """Formata a duração como m:ss para o player."""
+    seconds = int(round(seconds))
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else "sync"
+    store = get_audio_store()
+    if command == "sync":
+        from chatbot import Config
+        manifest = store.sync(Config.AUDIOS, force="--force" in sys.argv)
+        missing = sorted(set(Config.AUDIOS) - set(manifest))
+        print(f"✅ {len(manifest)} áudios em {store.cache_dir}")
+        if missing:
+            print(f"❌ Falharam: {', '.join(missing)}")
+            sys.exit(1)
+    elif command == "list":
+        for key, entry in sorted(store.manifest.items()):
+            print(f"{key:45} {format_duration(entry['duration']):>6} {entry['size']:>9} B  {entry['file']}")
+    else:
+        print(__doc__)
+        sys.exit(2)
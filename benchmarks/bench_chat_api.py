@@ -0,0 +1,136 @@
+"""
+Requisições por segundo da API headless (chat_api.py) contra o caminho do
+Streamlit para a mesma conversa.
+
+- API: sobe `chat_api.py serve` num diretório temporário e dispara `POST /chat`
+  de vários clientes em paralelo, cada um com a própria sessão;
+- Streamlit: o mesmo roteiro de mensagens pelo AppTest (rerun completo com
+  sidebar, CSS, histórico e os efeitos de "digitando"), uma sessão por vez.
+
+As mensagens misturam intenções que o classificador local responde e uma
+pergunta aberta que vai ao Gemini (sem rede, cai no fallback). O limitador de
+taxa é aberto para a medição.
+
+Uso:
+    python benchmarks/bench_chat_api.py [clientes] [segundos] [turnos_streamlit]
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8793
+MESSAGES = ["oi gata, tudo bem?", "quanto custa o pack?", "manda uma amostra", "me conta do seu dia"]
+ENV = dict(os.environ, MYLLE_METRICS_PORT="0", MYLLE_LOG_LEVEL="WARNING", PYTHONWARNINGS="ignore",
+           MYLLE_RATE_LIMIT_MESSAGES="1000000000")
+
+STREAMLIT_TURNS = f"""
+import sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({os.path.join(ROOT, "chatbot.py")!r}, default_timeout=300)
+app.run()
+for key in ("age_verified", "connection_complete", "chat_started"):
+    app.session_state[key] = True
+app.session_state["current_page"] = "chat"
+app.run()
+messages = {MESSAGES!r}
+for i in range(int(sys.argv[1])):
+    started = time.perf_counter()
+    app.chat_input[0].set_value(messages[i % len(messages)]).run()
+    print(f"TURN {{time.perf_counter() - started:.4f}} {{len(app.exception)}}", flush=True)
+"""
+
+
+def wait_port(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.3)
+    raise RuntimeError(f"porta {port} sem resposta")
+
+
+def bench_api(clients, seconds):
+    workdir = tempfile.mkdtemp(prefix="mylle-api-")
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "chat_api.py"), "serve", str(PORT)],
+                              cwd=workdir, env=ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    latencies, sources, errors = [], Counter(), Counter()
+    lock = threading.Lock()
+
+    def client(index, deadline):
+        http = requests.Session()
+        token, session_id, turn = None, None, 0
+        while time.time() < deadline:
+            if turn % 50 == 0:  # sessão nova antes do limite de mensagens por sessão
+                session_id = None
+            started = time.perf_counter()
+            response = http.post(f"http://127.0.0.1:{PORT}/chat", timeout=60, json={
+                "message": MESSAGES[turn % len(MESSAGES)], "token": token, "session_id": session_id})
+            elapsed = time.perf_counter() - started
+            turn += 1
+            with lock:
+                if response.status_code != 200:
+                    errors[response.status_code] += 1
+                    continue
+                payload = response.json()
+                token, session_id = payload["token"], payload["session_id"]
+                latencies.append(elapsed)
+                sources[payload.get("source")] += 1
+
+    try:
+        wait_port(PORT)
+        client(0, time.time() + 3)  # aquecimento: imports e caches do processo
+        latencies.clear(), sources.clear(), errors.clear()
+        deadline = time.time() + seconds
+        threads = [threading.Thread(target=client, args=(i, deadline)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return latencies, sources, errors
+
+
+def bench_streamlit(turns):
+    workdir = tempfile.mkdtemp(prefix="mylle-st-")
+    result = subprocess.run([sys.executable, "-c", STREAMLIT_TURNS, str(turns)], capture_output=True,
+                            text=True, cwd=workdir, env=ENV)
+    latencies = [float(line.split()[1]) for line in result.stdout.splitlines() if line.startswith("TURN")]
+    if not latencies:
+        raise RuntimeError(result.stderr[-2000:])
+    return latencies
+
+
+def report(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    print(f"{name:<22} {len(latencies) / elapsed:>9.1f} {statistics.median(latencies) * 1000:>9.0f} {p95 * 1000:>9.0f}")
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 15
+    turns = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    latencies, sources, errors = bench_api(clients, seconds)
+    st_latencies = bench_streamlit(turns)
+    print(f"{'caminho':<22} {'turnos/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    report(f"API ({clients} clientes)", latencies, seconds)
+    report("Streamlit (1 sessão)", st_latencies, sum(st_latencies))
+    print("origem das respostas da API:", dict(sources), f"erros: {dict(errors)}" if errors else "")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Micro-benchmark do CTAEngine.should_show_cta: varredura por substring
+(implementação anterior) vs. matcher compilado alimentado incrementalmente.
+
+Uso:
+    python benchmarks/bench_cta.py [turnos]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot import CTAEngine, CTAWindow, KeywordMatcher  # noqa: E402
+
+USER_LINES = [
+    "oi gata tudo bem?", "quero ver suas fotos", "quanto custa o pack?",
+    "você é muito gostosa", "me manda um vídeo", "tô no trabalho agora",
+    "verdade? nunca vi isso", "qual valor do conteúdo completo?", "kkkk adoro",
+    "me mostra mais", "boa noite amor", "tem desconto hoje?",
+]
+MYLLE_LINES = [
+    "Oi amor, tô bem e você? 😘", "Hmm, adoro quando você fala assim...",
+    "Meus packs estão com desconto hoje 🔥", "Me conta seu nome, gato",
+]
+
+LEGACY_HOT = [
+    "buceta", "peito", "fuder", "gozar", "gostosa", "delicia", "molhad", "xereca",
+    "pau", "piroca", "transar", "foto", "video", "mostra", "ver", "quero", "tesão",
+    "molhada", "foda", "nude", "seios", "bunda", "rabuda", "gata", "pack",
+    "conteúdo", "comprar", "quanto", "valor", "preço", "custa", "safada", "tarada",
+]
+
+
+def legacy_scan(history):
+    """Reprodução da implementação anterior (re-parse + substring a cada turno)."""
+    last_msgs = []
+    for msg in history[-6:]:
+        content = msg["content"]
+        if content.startswith('{"text"'):
+            try:
+                content = json.loads(content).get("text", content)
+            except ValueError:
+                pass
+        last_msgs.append(f"{msg['role']}: {content.lower()}")
+    context = " ".join(last_msgs)
+    hot_count = sum(1 for word in LEGACY_HOT if word in context)
+    has_direct_ask = any(ask in context for ask in CTAEngine.DIRECT_ASKS)
+    return hot_count, has_direct_ask
+
+
+def build_history(turns):
+    history = []
+    for _ in range(turns):
+        history.append({"role": "user", "content": random.choice(USER_LINES)})
+        history.append({"role": "assistant", "content": json.dumps({"text": random.choice(MYLLE_LINES)})})
+    return history
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    random.seed(42)
+    history = build_history(turns)
+
+    # O histórico cresce a cada turno, como st.session_state.messages
+    start = time.perf_counter()
+    live = []
+    for i in range(0, len(history), 2):
+        live.extend(history[i:i + 2])
+        legacy_scan(live)
+    legacy = time.perf_counter() - start
+
+    build_start = time.perf_counter()
+    hot, ask = KeywordMatcher(CTAEngine.HOT_WORDS), KeywordMatcher(CTAEngine.DIRECT_ASKS)
+    build = time.perf_counter() - build_start
+
+    window = CTAWindow()
+    start = time.perf_counter()
+    live = []
+    for i in range(0, len(history), 2):
+        live.extend(history[i:i + 2])
+        window.sync(live, hot, ask)
+        window.hot_count, window.has_direct_ask
+    incremental = time.perf_counter() - start
+
+    print(f"turnos: {turns}")
+    print(f"substring (anterior): {legacy / turns * 1e6:8.1f} µs/turno")
+    print(f"matcher incremental:  {incremental / turns * 1e6:8.1f} µs/turno "
+          f"({legacy / incremental:.1f}x; compilação única {build * 1e3:.2f} ms)")
+
+    # Falsos positivos da varredura por substring
+    sample = [{"role": "user", "content": "verdade, nunca vi isso"}]
+    print(f"'verdade, nunca vi isso' -> anterior: {legacy_scan(sample)[0]} palavra(s) quente(s), "
+          f"matcher: {len(hot.find('verdade, nunca vi isso'))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark do índice de memória (memory_index.py) com muitos usuários:
+escrita incremental, carga preguiçosa a frio e busca top-k a quente.
+
+Uso:
+    python benchmarks/bench_memory.py [usuários] [mensagens_por_usuário]
+"""
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_index import MemoryIndex  # noqa: E402
+
+WORDS = (
+    "praia cerveja futebol trabalho academia viagem musica pagode sertanejo carro moto cachorro gato "
+    "pizza churrasco filme serie netflix fotos video pack lingerie vermelha preta banho noite cidade "
+    "salvador recife curitiba porto alegre aniversario ferias namorada solteiro casado chefe faculdade "
+    "cansado feliz saudade desconto pix valor conteudo exclusivo chamada audio presente surpresa"
+).split()
+
+
+def fake_message(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(7)
+    root = tempfile.mkdtemp(prefix="mylle-memory-")
+    try:
+        index = MemoryIndex(root=root)
+
+        # Popula os logs em lote (mesmo formato que add() grava)
+        start = time.perf_counter()
+        for u in range(users):
+            path = index._path(f"user-{u}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                for m in range(per_user):
+                    doc = {"session": f"s{m // 10}", "role": "user" if m % 2 == 0 else "assistant",
+                           "text": fake_message(rng), "ts": 1700000000 + m}
+                    f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        populate = time.perf_counter() - start
+        disk = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+        print(f"{users:,} usuários x {per_user} mensagens em {populate:.1f} s; {disk / 1e6:.0f} MB em disco")
+
+        # Escrita incremental (caminho de save_message)
+        samples = []
+        for i in range(2000):
+            user = f"user-{rng.randrange(users)}"
+            t = time.perf_counter()
+            index.add(user, "live", "user", fake_message(rng))
+            samples.append(time.perf_counter() - t)
+        print(f"add:          p50 {percentile(samples, .5) * 1e6:7.1f} µs   p99 {percentile(samples, .99) * 1e6:7.1f} µs")
+
+        # Primeira busca de um usuário (carrega o log do disco)
+        cold, targets = [], rng.sample(range(users), 2000)
+        for u in targets:
+            t = time.perf_counter()
+            index.search(f"user-{u}", fake_message(rng), k=3, exclude_session="live")
+            cold.append(time.perf_counter() - t)
+        print(f"busca a frio: p50 {percentile(cold, .5) * 1e6:7.1f} µs   p99 {percentile(cold, .99) * 1e6:7.1f} µs")
+
+        # Buscas seguintes (índice já em memória)
+        warm = []
+        for _ in range(20000):
+            u = rng.choice(targets)
+            t = time.perf_counter()
+            index.search(f"user-{u}", fake_message(rng), k=3, exclude_session="live")
+            warm.append(time.perf_counter() - t)
+        print(f"busca quente: p50 {percentile(warm, .5) * 1e6:7.1f} µs   p99 {percentile(warm, .99) * 1e6:7.1f} µs "
+              f"(média {statistics.mean(warm) * 1e6:.1f} µs)")
+        print(f"usuários em memória: {index.stats()['loaded_users']} (limite {index.max_loaded})")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
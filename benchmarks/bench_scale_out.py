@@ -0,0 +1,107 @@
+"""
+Teste de carga do modo scale-out: sobe `scale_out.py run N` para cada N,
+abre clientes WebSocket pelo roteador (protocolo do próprio Streamlit, sem
+navegador) e mede reruns completos por segundo. Cada cliente é um usuário
+com `?uid=` próprio, então o hash consistente espalha a carga pelos workers.
+
+O rerun medido é a página de entrada (verificação de idade), que é só CPU:
+a escala esperada é quase linear até o número de núcleos. Numa máquina de um
+núcleo os workers só dividem a mesma CPU (1 vs 2 workers: ~14 reruns/s nos
+dois casos), então rode num host com vários núcleos para medir a escala.
+
+Uso:
+    python benchmarks/bench_scale_out.py [workers,...] [clientes_por_worker] [segundos]
+    # ex.: python benchmarks/bench_scale_out.py 1,2,4 8 20
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import websockets  # já vem com o Streamlit (servidor Starlette)
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTER_PORT = 8790
+
+
+def wait_ready(port, workers, timeout=120):
+    """Espera o roteador aceitar conexões e cada worker responder ao health check."""
+    deadline = time.time() + timeout
+    base = int(os.getenv("MYLLE_WORKER_BASE_PORT", "8601"))
+    pending = {ROUTER_PORT} | {base + i for i in range(workers)}
+    while pending and time.time() < deadline:
+        for p in list(pending):
+            try:
+                with socket.create_connection(("127.0.0.1", p), timeout=1) as s:
+                    s.sendall(b"GET /_stcore/health HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+                    if b" 200 " in s.recv(64):
+                        pending.discard(p)
+            except OSError:
+                pass
+        time.sleep(0.5)
+    if pending:
+        raise RuntimeError(f"portas sem resposta: {sorted(pending)}")
+
+
+async def client(user, deadline, counts, latencies):
+    token = f"{user}.bench"
+    async with websockets.connect(f"ws://127.0.0.1:{ROUTER_PORT}/_stcore/stream", subprotocols=["streamlit"],
+                                  additional_headers={"Cookie": f"mylle_uid={token}"}, max_size=None) as ws:
+        while time.time() < deadline:
+            message = BackMsg()
+            message.rerun_script.query_string = f"uid={token}"
+            started = time.perf_counter()
+            await ws.send(message.SerializeToString())
+            while True:
+                forward = ForwardMsg()
+                forward.ParseFromString(await ws.recv())
+                if forward.WhichOneof("type") == "script_finished":
+                    break
+            latencies.append(time.perf_counter() - started)
+            counts[user] = counts.get(user, 0) + 1
+
+
+async def load(clients, seconds):
+    counts, latencies = {}, []
+    # Aquecimento: primeira execução de cada worker (imports, cache_resource)
+    await asyncio.gather(*(client(f"warm{i}", time.time() + 3, {}, []) for i in range(clients)))
+    deadline = time.time() + seconds
+    await asyncio.gather(*(client(f"user{i}", deadline, counts, latencies) for i in range(clients)))
+    latencies.sort()
+    return sum(counts.values()) / seconds, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def measure(workers, per_worker, seconds):
+    workdir = tempfile.mkdtemp(prefix="mylle-scale-")
+    env = dict(os.environ, MYLLE_METRICS_PORT="0", MYLLE_LOG_LEVEL="WARNING", PYTHONWARNINGS="ignore")
+    router = subprocess.Popen([sys.executable, os.path.join(ROOT, "scale_out.py"), "run", str(workers), str(ROUTER_PORT)],
+                              cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(ROUTER_PORT, workers)
+        return asyncio.run(load(workers * per_worker, seconds))
+    finally:
+        router.terminate()
+        router.wait(timeout=30)
+
+
+def main():
+    counts = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else f"1,{os.cpu_count() or 1}").split(",")]
+    per_worker = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 20
+    print(f"{os.cpu_count()} núcleos, {per_worker} clientes por worker, {seconds:.0f} s por medição")
+    print(f"{'workers':>7} {'reruns/s':>9} {'p50 ms':>7} {'p95 ms':>7} {'escala':>7} {'eficiência':>10}")
+    baseline = None
+    for workers in sorted(set(counts)):
+        rate, p50, p95 = measure(workers, per_worker, seconds)
+        baseline = baseline or rate / workers
+        speedup = rate / baseline
+        print(f"{workers:>7} {rate:>9.1f} {p50 * 1000:>7.0f} {p95 * 1000:>7.0f} {speedup:>6.2f}× {speedup / workers:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark dos motores de sentimento: léxico em português (escalar e em lote
+com NumPy) vs. TextBlob, em acurácia e mensagens/segundo, sobre um corpus de
+validação que não foi usado para montar o léxico.
+
+Uso:
+    python benchmarks/bench_sentiment.py [mensagens]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from textblob import TextBlob  # noqa: E402
+
+from sentiment_pt import PortugueseSentiment  # noqa: E402
+
+CORPUS = os.path.join(ROOT, "benchmarks", "data", "sentimento_pt.tsv")
+
+
+def load_corpus():
+    samples = []
+    with open(CORPUS, encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                label, text = line.rstrip("\n").split("\t", 1)
+                samples.append((label, text))
+    return samples
+
+
+def label_of(polarity):
+    # Mesmos limites de EmotionalIntelligence.get_emotional_state
+    if polarity > 0.1:
+        return "pos"
+    if polarity < -0.1:
+        return "neg"
+    return "neu"
+
+
+def accuracy(samples, polarities):
+    right = sum(1 for (label, _), p in zip(samples, polarities) if label_of(p) == label)
+    return right / len(samples)
+
+
+def throughput(fn, texts):
+    start = time.perf_counter()
+    fn(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    samples = load_corpus()
+    texts = [text for _, text in samples]
+    workload = (texts * (total // len(texts) + 1))[:total]
+
+    engine = PortugueseSentiment()
+    engine.score_batch(texts[:2])  # monta as tabelas do caminho vetorizado
+
+    lexicon_scores = [engine.score(t)[0] for t in texts]
+    batch_scores = engine.score_batch(texts)[0]
+    textblob_scores = [TextBlob(t).sentiment.polarity for t in texts]
+    assert all(abs(a - b) < 1e-3 for a, b in zip(lexicon_scores, batch_scores)), "escalar e lote divergem"
+
+    print(f"corpus: {len(samples)} mensagens rotuladas; carga: {total} mensagens")
+    print(f"{'motor':<18}{'acurácia':>10}{'msgs/s':>12}")
+    rates = {
+        "textblob": throughput(lambda ts: [TextBlob(t).sentiment for t in ts], workload),
+        "léxico (escalar)": throughput(lambda ts: [engine.score(t) for t in ts], workload),
+        "léxico (lote)": throughput(engine.score_batch, workload),
+    }
+    accuracies = {
+        "textblob": accuracy(samples, textblob_scores),
+        "léxico (escalar)": accuracy(samples, lexicon_scores),
+        "léxico (lote)": accuracy(samples, batch_scores),
+    }
+    for name, rate in rates.items():
+        print(f"{name:<18}{accuracies[name]:>10.1%}{rate:>12,.0f}")
+    neutral = sum(1 for p in textblob_scores if label_of(p) == "neu")
+    print(f"textblob classificou {neutral}/{len(samples)} mensagens como neutras")
+
+
+if __name__ == "__main__":
+    main()
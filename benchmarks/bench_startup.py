@@ -0,0 +1,80 @@
+"""
+Tempo de partida a frio do chatbot: custo de import por módulo
+(`python -X importtime`) e tempo até a primeira página renderizada
+(Streamlit AppTest), cada medição num processo novo.
+
+Uso:
+    python benchmarks/bench_startup.py [repetições]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_PAGE = f"""
+import time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({os.path.join(ROOT, "chatbot.py")!r}, default_timeout=120)
+app.run()
+print(f"FIRST_PAGE {{time.perf_counter() - started:.4f}} {{len(app.exception)}}")
+"""
+
+
+def import_costs():
+    """Custo cumulativo (ms) de cada módulo importado diretamente pelo chatbot."""
+    code = f"import sys; sys.path.insert(0, {ROOT!r}); import chatbot"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, cwd=tempfile.gettempdir())
+    costs = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        indent = len(name) - len(name.lstrip())
+        if indent <= 3:  # módulos de primeiro nível (e o próprio chatbot)
+            costs[name.strip().split(".")[0]] += int(cumulative) / 1000
+    return costs
+
+
+def first_page_time(workdir):
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    result = subprocess.run([sys.executable, "-c", FIRST_PAGE], capture_output=True,
+                            text=True, cwd=workdir, env=env)
+    for line in result.stdout.splitlines():
+        if line.startswith("FIRST_PAGE"):
+            _, seconds, errors = line.split()
+            return float(seconds), int(errors)
+    raise RuntimeError(result.stderr[-2000:])
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    costs = import_costs()
+    total = costs.pop("chatbot", 0.0)
+    print(f"import chatbot: {total:.0f} ms (cumulativo)")
+    for name, ms in sorted(costs.items(), key=lambda item: -item[1])[:12]:
+        print(f"  {name:<24}{ms:8.1f} ms")
+    for lazy in ("textblob", "nltk", "numpy", "PIL"):
+        if lazy in costs:
+            print(f"  ⚠️ {lazy} importado na partida")
+
+    timings = []
+    with tempfile.TemporaryDirectory() as workdir:  # bancos SQLite e media/ descartáveis
+        for _ in range(repeats):
+            seconds, errors = first_page_time(workdir)
+            timings.append(seconds)
+            if errors:
+                print(f"  ⚠️ {errors} exceção(ões) na renderização")
+    print(f"primeira página (processo novo): mediana {statistics.median(timings) * 1000:.0f} ms "
+          f"em {repeats} execuções")
+
+
+if __name__ == "__main__":
+    main()
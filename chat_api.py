@@ -0,0 +1,304 @@
+"""
+API HTTP/JSON do chat, sem o Streamlit: o mesmo motor do app (ApiService,
+LearningEngine, DatabaseService, limitador de taxa e cotas) atrás de um app
+ASGI, para integrações como um relay do Telegram.
+
+    POST /chat          {"message": "...", "token": "...", "session_id": "..."}
+                        -> {"text", "audio", "cta", "token", "session_id", "source"}
+    POST /chat/stream   mesmo corpo, resposta em Server-Sent Events:
+                        "typing", "delta" (texto em pedaços) e "done" (resposta completa)
+    GET  /health
+
+`token` é o id assinado de identity.py (o mesmo do `?uid=` do app); sem ele,
+ou com assinatura inválida, um usuário novo é criado e o token volta na
+resposta. Essas mensagens sem token são cobradas num balde do endereço de
+origem, não no do usuário novo (que estaria sempre cheio). O endereço é o da
+conexão; `X-Forwarded-For` só vale atrás de MYLLE_TRUSTED_PROXY_HOPS proxies. O turno roda num pool de threads, porque o pipeline faz I/O
+bloqueante (SQLite e HTTP do Gemini); o loop do ASGI só lê e escreve. As
+conexões do chat_history.db vêm de um SQLitePool, o LearningEngine é um por
+thread e o HTTP do Gemini usa a sessão keep-alive do processo. Os efeitos de
+"visualizado"/"digitando" do app ficam desligados.
+
+Uso:
+    python chat_api.py serve [porta] [processos]   # uvicorn; padrão 8503, 1 processo
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import chatbot
+from db_pool import SQLitePool
+from rate_limiter import client_ip, network_of
+
+logger = logging.getLogger(__name__)
+# Sem sessão do Streamlit, cada cache_resource lido nas threads do pool avisaria isso
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+API_WORKERS = int(os.getenv("MYLLE_API_WORKERS", "32"))  # turnos simultâneos por processo
+MAX_BODY_BYTES = 16 * 1024
+SESSION_CACHE_SIZE = 5000
+HISTORY_LIMIT = 20
+STREAM_CHUNK_WORDS = 4
+
+
+class HeadlessApiService(chatbot.ApiService):
+    """ApiService sem a encenação de digitação (não há tela para mostrar)."""
+    def _typing_status(self):
+        return None
+
+    def _typing_pause(self, seconds: float) -> None:
+        pass
+
+    def _simulate_typing(self) -> None:
+        pass
+
+
+class SessionStates:
+    """Estado de cada conversa da API (o equivalente ao session_state), em LRU.
+
+    Na primeira mensagem de uma sessão o histórico vem do chat_history.db;
+    o lock serializa turnos simultâneos da mesma conversa.
+    """
+    def __init__(self, pool: SQLitePool, size: int = SESSION_CACHE_SIZE):
+        self.pool = pool
+        self.size = size
+        self._states: "OrderedDict[Tuple[str, str], Tuple[threading.Lock, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, session_id: str) -> Tuple[threading.Lock, Dict]:
+        key = (user_id, session_id)
+        with self._lock:
+            entry = self._states.get(key)
+            if entry is not None:
+                self._states.move_to_end(key)
+                return entry
+        with self.pool.connection() as conn:
+            messages = chatbot.DatabaseService.load_messages(conn, user_id, session_id, limit=HISTORY_LIMIT)
+            # Posição da primeira mensagem carregada na conversa (o resumo conta desde o início)
+            offset = chatbot.DatabaseService.count_messages(conn, user_id, session_id) - len(messages)
+        state = {"session_id": session_id, "messages": messages, "history_offset": offset,
+                 "request_count": sum(1 for m in messages if m["role"] == "user")}
+        with self._lock:
+            entry = self._states.setdefault(key, (threading.Lock(), state))
+            if len(self._states) > self.size:
+                self._states.popitem(last=False)
+        return entry
+
+
+class ChatEngine:
+    """Um turno de conversa fora do Streamlit, com o mesmo fluxo do ChatService."""
+    def __init__(self):
+        self.pool = SQLitePool(chatbot.DatabaseService.init_db, chatbot.Config.DB_POOL_SIZE)
+        self.sessions = SessionStates(self.pool)
+        self._local = threading.local()
+
+    def _learning_engine(self) -> chatbot.LearningEngine:
+        engine = getattr(self._local, "learning_engine", None)
+        if engine is None:
+            engine = self._local.learning_engine = chatbot.LearningEngine()
+        return engine
+
+    def turn(self, message: str, token: Optional[str], session_id: Optional[str], fingerprint: str,
+             network: str = "") -> Tuple[int, Dict]:
+        """(status HTTP, corpo) de uma mensagem do usuário."""
+        signer = chatbot.get_identity_signer()
+        user_id = signer.verify(token)
+        bucket_id = None
+        if user_id is None:
+            user_id, token = signer.new_identity()
+            bucket_id = f"novo:{network or fingerprint}"
+        session_id = session_id if session_id and len(session_id) <= 64 else str(uuid.uuid4())
+        chatbot.bind_log_context(session=session_id, turn=None)
+        chatbot.get_metrics().sessions.touch(session_id)
+        identity = {"token": token, "session_id": session_id}
+
+        cleaned_input = re.sub(r'<[^>]*>', '', message)[:500]
+        session_lock, state = self.sessions.get(user_id, session_id)
+        with session_lock:
+            allowed, retry_after = chatbot.check_rate_limit(user_id, state["request_count"], fingerprint, network,
+                                                            bucket_id)
+            if not allowed:
+                payload = dict(chatbot.ChatService.LIMIT_RESPONSE, source="limite", **identity)
+                if retry_after is not None:  # cota da sessão esgotada: esperar não adianta
+                    payload["retry_after"] = max(1, math.ceil(retry_after))
+                return 429, payload
+
+            trace = chatbot.TurnTrace()
+            sentiment = chatbot.EmotionalIntelligence.analyze(cleaned_input)
+            state["messages"].append({"role": "user", "content": cleaned_input})
+            with trace.span("db_mensagem_usuario"), self.pool.connection() as conn:
+                chatbot.DatabaseService.save_message(conn, user_id, session_id, "user", cleaned_input,
+                                                     sentiment.polarity, sentiment.label)
+            chatbot.record_engagement(user_id, cleaned_input)
+            state["request_count"] += 1
+
+            api_service = HeadlessApiService(state, self._learning_engine())
+            resposta = api_service.get_intelligent_response(cleaned_input, user_id, state["messages"],
+                                                            sentiment=sentiment, trace=trace)
+            if isinstance(resposta, str):
+                resposta = {"text": resposta, "cta": {"show": False}}
+            elif "text" not in resposta:
+                resposta = {"text": str(resposta), "cta": {"show": False}}
+            if resposta.get("cta", {}).get("show"):
+                chatbot.get_metrics().cta.inc(event="shown")
+                api_service.cta_engine.mark_cta_shown()
+
+            state["messages"].append({"role": "assistant", "content": json.dumps(resposta)})
+            trimmed = len(state["messages"]) - HISTORY_LIMIT * 2
+            if trimmed > 0:
+                del state["messages"][:trimmed]
+                state["history_offset"] += trimmed
+            with trace.span("db_mensagem_resposta"), self.pool.connection() as conn:
+                chatbot.DatabaseService.save_message(conn, user_id, session_id, "assistant", json.dumps(resposta))
+            trace.finish()
+        return 200, dict(resposta, source=api_service.response_source, **identity)
+
+
+def _chunks(text: str, words: int = STREAM_CHUNK_WORDS) -> List[str]:
+    tokens = re.findall(r"\S+\s*", text)
+    return ["".join(tokens[i:i + words]) for i in range(0, len(tokens), words)]
+
+
+def _sse(event: str, data: Dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+class ChatApp:
+    """App ASGI (sem framework): roteamento das três rotas e leitura do corpo."""
+    def __init__(self, workers: int = API_WORKERS):
+        self.workers = workers
+        self._engine: Optional[ChatEngine] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _start(self) -> None:
+        if self._engine is None:
+            chatbot.setup_logging()
+            self._engine = ChatEngine()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="chat-api")
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        self._start()
+        path, method = scope["path"], scope["method"]
+        if path == "/health" and method == "GET":
+            await self._json(send, 200, {"status": "ok", "db_pool": self._engine.pool.stats()})
+        elif path in ("/chat", "/chat/stream") and method == "POST":
+            await self._chat(scope, receive, send, stream=path.endswith("/stream"))
+        elif path in ("/chat", "/chat/stream", "/health"):
+            await self._json(send, 405, {"error": "método não permitido"})
+        else:
+            await self._json(send, 404, {"error": "não encontrado"})
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._executor:
+                    self._executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _read_body(receive) -> Optional[bytes]:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY_BYTES:
+                return None
+            if not message.get("more_body"):
+                return body
+
+    @staticmethod
+    async def _json(send, status: int, payload: Dict, headers: Optional[List] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode())] + (headers or [])})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def _client(scope) -> Tuple[str, str]:
+        """(impressão digital, rede de origem) da requisição."""
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        ip = client_ip((scope.get("client") or ("",))[0], headers.get("x-forwarded-for", ""),
+                       chatbot.Config.TRUSTED_PROXY_HOPS)
+        return (chatbot.fingerprint_of(ip, headers.get("user-agent", ""), headers.get("accept-language", "")),
+                network_of(ip))
+
+    async def _chat(self, scope, receive, send, stream: bool) -> None:
+        body = await self._read_body(receive)
+        try:
+            request = json.loads(body) if body else None
+        except ValueError:
+            request = None
+        if body is None or not isinstance(request, dict) or not isinstance(request.get("message"), str) \
+                or not request["message"].strip():
+            await self._json(send, 400, {"error": "corpo JSON com \"message\" (texto) obrigatório"})
+            return
+        for field in ("token", "session_id"):
+            if request.get(field) is not None and not isinstance(request[field], str):
+                await self._json(send, 400, {"error": f"\"{field}\" deve ser texto"})
+                return
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._engine.turn, request["message"],
+                                      request.get("token"), request.get("session_id"), *self._client(scope))
+        if not stream:
+            try:
+                status, payload = await future
+            except Exception as e:
+                logger.error(f"Erro no turno da API: {e}")
+                status, payload = 500, {"error": "erro interno"}
+            retry_after = payload.get("retry_after") if status == 429 else None
+            await self._json(send, status, payload,
+                             [(b"retry-after", str(retry_after).encode("ascii"))] if retry_after else None)
+            return
+
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                                (b"cache-control", b"no-cache")]})
+        await send({"type": "http.response.body", "body": _sse("typing", {}), "more_body": True})
+        try:
+            status, payload = await future
+        except Exception as e:
+            logger.error(f"Erro no turno da API: {e}")
+            status, payload = 500, {"error": "erro interno"}
+        if status == 200:
+            for chunk in _chunks(payload.get("text", "")):
+                await send({"type": "http.response.body", "body": _sse("delta", {"text": chunk}), "more_body": True})
+        await send({"type": "http.response.body", "body": _sse("done", dict(payload, status=status))})
+
+
+app = ChatApp()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "serve":
+        import uvicorn  # servidor ASGI (já vem com o Streamlit recente; senão, pip install uvicorn)
+
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 8503
+        processes = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+        uvicorn.run("chat_api:app", host=os.getenv("MYLLE_API_HOST", "127.0.0.1"), port=port,
+                    workers=processes, log_level="warning", app_dir=os.path.dirname(os.path.abspath(__file__)),
+                    proxy_headers=False)  # o X-Forwarded-For é tratado em _client (proxies confiáveis)
+    else:
+        print(__doc__)
+        sys.exit(2)
@@ -1,41 +1,76 @@
 # ======================
 # IMPORTAÇÕES
 # ======================
+import time
+_MODULE_STARTED_AT = time.perf_counter()
+
 import streamlit as st
 import requests
 import json
-import time
+import os
+import sys
 import random
 import sqlite3
 import re
+import string
+import textwrap
 import uuid
 import logging
+import threading
+import hmac
+import math
 from datetime import datetime, timedelta
 from functools import lru_cache
-from typing import Dict, List, Optional, Tuple
-from collections import defaultdict
-from hashlib import md5
-from textblob import TextBlob # Adicionado para análise de sentimentos
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+from collections import Counter, OrderedDict, defaultdict, deque
+from hashlib import blake2b, md5
+from audio_assets import get_audio_store, format_duration
+from image_assets import get_image_store, image_presets
+from memory_index import get_memory_index
+from intent_model import DecisionLog, get_intent_model
+from response_cache import SemanticResponseCache, jsonl_quality_hook
+from response_pools import GREETING_SLOT, get_response_pools, pool_key
+from metrics import ActivityTracker, Histogram, MetricsRegistry, start_http_server
+from app_logging import AsyncLogging, bind as bind_log_context, setup_async_logging
+from sampling_profiler import SamplingProfiler
+from rate_limiter import TokenBucketLimiter, client_ip, create_store, network_of
+import identity
+from db_pool import SQLitePool
+from session_store import create_store as create_session_store
+from text_utils import WORD_RE, extract_message_text, fold_text
 
 # ======================
 # CONFIGURAÇÃO INICIAL
 # ======================
-st.set_page_config(
-    page_title="Mylle Alves Premium",
-    page_icon="🔥",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+# O TextBlob/NLTK, o léxico de sentimento (NumPy) e o Pillow são carregados
+# no primeiro uso; a configuração da página, o logging e o CSS rodam em main().
+STARTUP_PROFILE = os.getenv("MYLLE_STARTUP_PROFILE", "") not in ("", "0")
+
+@st.cache_resource(show_spinner=False)
+def setup_logging() -> AsyncLogging:
+    """Configura o logging uma vez por processo (o script é reexecutado a cada rerun).
+
+    A thread da sessão só enfileira; arquivo (JSON, rotativo) e console são
+    escritos por uma thread de fundo.
+    """
+    return setup_async_logging(
+        path=os.getenv("MYLLE_LOG_FILE", "app.log"),
+        level=getattr(logging, os.getenv("MYLLE_LOG_LEVEL", "INFO").upper(), logging.INFO),
+        max_bytes=int(os.getenv("MYLLE_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backups=int(os.getenv("MYLLE_LOG_BACKUPS", "5")),
+        json_file=os.getenv("MYLLE_LOG_FORMAT", "json") == "json",
+    )
+
+def configure_page() -> None:
+    """Configuração da página e CSS global; deve ser o primeiro comando st do rerun."""
+    st.set_page_config(
+        page_title="Mylle Alves Premium",
+        page_icon="🔥",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(hide_streamlit_style, unsafe_allow_html=True)
+
 logger = logging.getLogger(__name__)
 
 # Estilos CSS (mantidos, com pequenas melhorias)
@@ -141,7 +176,6 @@ hide_streamlit_style = """
     }
 </style>
 """
-st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 # ======================
 # CONSTANTES E CONFIGURAÇÕES
@@ -156,7 +190,53 @@ class Config:
     CHECKOUT_MOLHADINHA = "https://app.pushinpay.com.br/#/service/pay/9FACD1E6-0EFD-4E3E-9F9D-BA0C1A2D7E7A"
     CHECKOUT_SAFADINHA = "https://app.pushinpay.com.br/#/service/pay/9FACD395-EE65-458E-9F7E-FED750CC9CA9"
     MAX_REQUESTS_PER_SESSION = 150 # Aumentado
+    # Token bucket entre sessões: RATE_LIMIT_MESSAGES por RATE_LIMIT_WINDOW s por usuário
+    # (a impressão digital do cliente tem RATE_LIMIT_FINGERPRINT_FACTOR vezes isso)
+    RATE_LIMIT_MESSAGES = int(os.getenv("MYLLE_RATE_LIMIT_MESSAGES", "100"))
+    RATE_LIMIT_WINDOW = int(os.getenv("MYLLE_RATE_LIMIT_WINDOW", "3600"))
+    RATE_LIMIT_FINGERPRINT_FACTOR = float(os.getenv("MYLLE_RATE_LIMIT_FINGERPRINT_FACTOR", "3"))
+    # ... e a rede de origem (IPv4 ou /64 do IPv6), RATE_LIMIT_NETWORK_FACTOR vezes
+    RATE_LIMIT_NETWORK_FACTOR = float(os.getenv("MYLLE_RATE_LIMIT_NETWORK_FACTOR", "10"))
+    # Proxies confiáveis na frente do app; só essas entradas do X-Forwarded-For valem
+    TRUSTED_PROXY_HOPS = int(os.getenv("MYLLE_TRUSTED_PROXY_HOPS", "0"))
+    # Arquivo SQLite (um nó) ou redis://... (vários nós)
+    RATE_LIMIT_STORE = os.getenv("MYLLE_RATE_LIMIT_STORE", "rate_limits.db")
     REQUEST_TIMEOUT = 45 # Aumentado
+    # Orçamento de tokens do contexto da conversa enviado a cada turno
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("MYLLE_CONTEXT_TOKENS", "400"))
+    CONTEXT_MAX_MESSAGES = 12        # mesmo com orçamento sobrando
+    CONTEXT_PREFERENCE_TOKENS = 80   # teto para as preferências conhecidas
+    SUMMARY_TOKEN_BUDGET = 120       # teto do resumo das mensagens antigas
+    SUMMARY_REFRESH_MIN = 4          # mensagens fora da janela antes de refazer o resumo
+    SUMMARY_MAX_SESSIONS = 2000      # resumos mantidos em memória (LRU por sessão)
+    CONTEXT_MEMORY_TOKENS = 80       # teto para lembranças de conversas anteriores
+    MEMORY_TOP_K = 3
+    # Confiança mínima do classificador local para responder sem o Gemini
+    INTENT_CONFIDENCE = float(os.getenv("MYLLE_INTENT_CONFIDENCE", "0.95"))
+    # ...e só quando a mensagem não traz mais que isso de palavras alheias à intenção
+    INTENT_MAX_EXTRA_WORDS = int(os.getenv("MYLLE_INTENT_MAX_EXTRA_WORDS", "2"))
+    # Cache de respostas por similaridade (Jaccard de trigramas; 0 desativa)
+    RESPONSE_CACHE_THRESHOLD = float(os.getenv("MYLLE_RESPONSE_CACHE_THRESHOLD", "0.8"))
+    RESPONSE_CACHE_SAMPLE_RATE = float(os.getenv("MYLLE_RESPONSE_CACHE_SAMPLE", "0.05"))
+    RESPONSE_CACHE_SAMPLES_FILE = os.getenv("MYLLE_RESPONSE_CACHE_SAMPLES", "response_cache_samples.jsonl")
+    # Endpoint de métricas do Prometheus (0 desativa)
+    METRICS_PORT = int(os.getenv("MYLLE_METRICS_PORT", "9464"))
+    METRICS_HOST = os.getenv("MYLLE_METRICS_HOST", "127.0.0.1")
+    METRICS_SESSION_WINDOW = 300  # segundos sem atividade para a sessão deixar de contar como ativa
+    METRICS_DB_REFRESH = 300      # intervalo da contagem de linhas dos bancos
+    # Estado persistente das sessões: arquivo SQLite (um nó) ou redis://... (vários nós)
+    SESSION_STORE = os.getenv("MYLLE_SESSION_STORE", "session_data.db")
+    DB_POOL_SIZE = int(os.getenv("MYLLE_DB_POOL_SIZE", "16"))  # conexões ociosas do chat_history.db
+    HTTP_POOL_SIZE = int(os.getenv("MYLLE_HTTP_POOL_SIZE", "32"))  # conexões simultâneas com o Gemini
+    # Segredo que assina o id do usuário (?uid=); o mesmo em todas as réplicas.
+    # Vazio: gerado uma vez em .identity_secret (só este nó)
+    IDENTITY_SECRET = os.getenv("MYLLE_IDENTITY_SECRET", "")
+    # Senha das funções de administração (vazia = desativadas)
+    ADMIN_TOKEN = os.getenv("MYLLE_ADMIN_TOKEN", "")
+    # Profiler por amostragem: MYLLE_PROFILE=1 liga na partida; ?profile=1&token=... liga/desliga em execução
+    PROFILE = os.getenv("MYLLE_PROFILE", "") not in ("", "0")
+    PROFILE_INTERVAL = float(os.getenv("MYLLE_PROFILE_INTERVAL", "0.01"))
+    PROFILE_WINDOW = float(os.getenv("MYLLE_PROFILE_WINDOW", "60"))
     IMG_PROFILE = "https://i.ibb.co/bMynqzM/BY-Admiregirls-su-Admiregirls-su-156.jpg"
     IMG_PREVIEW = "https://i.ibb.co/fGqCCyHL/preview-exclusive.jpg"
     PACK_IMAGES = {
@@ -202,41 +282,246 @@ class Config:
     
     }
     
+    # Intenção e períodos do dia de cada áudio (sem "periods" = qualquer horário)
+    AUDIO_TAGS = {
+        "claro_tenho_amostra_gratis": {"intent": "amostra"},
+        "imagina_ela_bem_rosinha": {"intent": "provocacao", "periods": ["noite", "madrugada"]},
+        "o_que_achou_amostras": {"intent": "amostra"},
+        "oi_meu_amor_tudo_bem": {"intent": "saudacao"},
+        "pq_nao_faco_chamada": {"intent": "chamada"},
+        "ver_nua_tem_que_comprar": {"intent": "venda"},
+        "eu_tenho_uns_conteudos_que_vai_amar": {"intent": "venda"},
+        "nao_sou_fake_nao": {"intent": "fake"},
+        "vida_to_esperando_voce_me_responder_gatinho": {"intent": "follow_up"},
+    }
+    
     # Padrões de detecção de fake com pontuação (melhorados)
+    # (termos, pontuação[, modo]): modo "all" exige todos os termos, "any" basta um.
+    # Termos podem ter várias palavras; acentos são ignorados na comparação.
+    # Um arquivo JSON em MYLLE_FAKE_PATTERNS_FILE substitui esta tabela.
     FAKE_DETECTION_PATTERNS = [
-        (["fake", "falsa", "bot", "robô", "ia", "inteligencia artificial"], 0.9),
+        (["fake", "falsa", "bot", "robô", "ia", "inteligencia artificial"], 0.9, "any"),
         (["não", "é", "real"], 0.7),
         (["é", "você", "mesmo"], 0.9),
         (["vc", "é", "real"], 0.9),
         (["duvido", "que", "seja"], 0.8),
-        (["mentira", "farsa"], 0.7),
-        (["verdadeira", "autêntica"], -0.5),
+        (["mentira", "farsa"], 0.7, "any"),
+        (["verdadeira", "autêntica"], -0.5, "any"),
         (["pessoa", "de", "verdade"], 0.6),
         (["não", "acredito"], 0.5),
         (["programa", "automático"], 0.7),
         (["isso", "é", "gravado"], 0.6),
     ]
+    FAKE_PATTERNS_FILE = os.getenv("MYLLE_FAKE_PATTERNS_FILE", "")
+
+    # Motor de sentimento: "lexico" (português, gírias e emojis) ou "textblob" (inglês)
+    SENTIMENT_BACKEND = os.getenv("MYLLE_SENTIMENT_BACKEND", "lexico")
+
+# ======================
+# REGISTRO DE ÁUDIOS
+# ======================
+DAY_PERIODS = ("manha", "tarde", "noite", "madrugada")
+
+def get_day_period(hour: int) -> str:
+    """Período do dia usado pelas personas e pelos áudios."""
+    if 6 <= hour < 12:
+        return "manha"
+    elif 12 <= hour < 18:
+        return "tarde"
+    elif 18 <= hour < 24:
+        return "noite"
+    return "madrugada"
+
+class AudioRegistry:
+    """Índice dos áudios por chave, intenção e período, com remapeamento de chaves inválidas."""
+    def __init__(self, audios: Dict[str, str], tags: Dict[str, Dict], max_remaps: int = 1024):
+        self.keys = frozenset(audios)
+        self.intent_of: Dict[str, str] = {}
+        self.by_intent_period: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        self._tokens = {key: frozenset(key.split("_")) for key in audios}
+        # LRU das chaves inventadas: o Gemini pode gerar chaves novas sem fim
+        self.max_remaps = max_remaps
+        self._remap_cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        self.remaps = Counter()
+
+        for key in audios:
+            meta = tags.get(key, {})
+            intent = meta.get("intent", "geral")
+            self.intent_of[key] = intent
+            for period in meta.get("periods", DAY_PERIODS):
+                self.by_intent_period[(intent, period)].append(key)
+
+        for key in set(tags) - self.keys:
+            logger.error(f"AUDIO_TAGS referencia áudio inexistente: {key}")
+
+    def for_intent(self, intent: str, hour: Optional[int] = None) -> Optional[str]:
+        """Sorteia um áudio da intenção, preferindo o período do dia atual."""
+        period = get_day_period(datetime.now().hour if hour is None else hour)
+        candidates = self.by_intent_period.get((intent, period))
+        if not candidates:
+            candidates = [key for key, key_intent in self.intent_of.items() if key_intent == intent]
+        return random.choice(candidates) if candidates else None
+
+    def _nearest(self, key: str) -> Optional[str]:
+        """Áudio válido com mais palavras em comum com a chave desconhecida."""
+        tokens = frozenset(key.lower().split("_"))
+        best_key, best_score = None, 0.0
+        for candidate in sorted(self.keys):
+            candidate_tokens = self._tokens[candidate]
+            score = len(tokens & candidate_tokens) / len(tokens | candidate_tokens)
+            if score > best_score:
+                best_key, best_score = candidate, score
+        return best_key
+
+    def _remap(self, key: str, intent: Optional[str] = None) -> Optional[str]:
+        """Remapeia uma chave desconhecida, com memo LRU; não mexe nos contadores."""
+        with self._lock:
+            if key in self._remap_cache:
+                self._remap_cache.move_to_end(key)
+                return self._remap_cache[key]
+        resolved = self._nearest(key) or (self.for_intent(intent) if intent else None)
+        if resolved:
+            logger.warning(f"Chave de áudio desconhecida '{key}' remapeada para '{resolved}'")
+        else:
+            logger.warning(f"Chave de áudio desconhecida '{key}' descartada (sem áudio próximo)")
+        with self._lock:
+            self._remap_cache[key] = resolved
+            if len(self._remap_cache) > self.max_remaps:
+                old_key, old_resolved = self._remap_cache.popitem(last=False)
+                self.remaps.pop((old_key, old_resolved), None)
+        return resolved
+
+    def resolve(self, key: Optional[str], intent: Optional[str] = None) -> Optional[str]:
+        """Valida a chave emitida numa resposta nova; chaves desconhecidas vão para o áudio mais próximo.
+
+        Chamado uma vez por resposta gerada (a chave resolvida é a que fica no histórico),
+        então os contadores refletem as chaves emitidas, não os reruns da tela. A intenção
+        do turno desempata quando nenhuma chave tem palavras em comum.
+        """
+        if not key:
+            return None
+        self.counters["lookups"] += 1
+        if key in self.keys:
+            self.counters["hits"] += 1
+            return key
+
+        resolved = self._remap(key, intent)
+        self.counters["remapped" if resolved else "dropped"] += 1
+        with self._lock:
+            if key in self._remap_cache:
+                self.remaps[(key, resolved)] += 1
+        return resolved
+
+    def validate_references(self, keys, where: str) -> List[str]:
+        """Verifica chaves usadas no código na inicialização; retorna as inválidas."""
+        invalid = sorted({key for key in keys if key not in self.keys})
+        for key in invalid:
+            logger.error(f"{where} usa áudio inexistente '{key}' (será remapeado para '{self._remap(key)}')")
+        return invalid
+
+    def stats(self) -> Dict:
+        return {
+            **{name: self.counters[name] for name in ("lookups", "hits", "remapped", "dropped")},
+            "top_remaps": [
+                {"from": src, "to": dst, "count": count} for (src, dst), count in self.remaps.most_common(10)
+            ],
+        }
+
+@st.cache_resource
+def get_audio_registry() -> AudioRegistry:
+    """Registro de áudios compartilhado pelo processo, validado na inicialização."""
+    registry = AudioRegistry(Config.AUDIOS, Config.AUDIO_TAGS)
+    registry.validate_references(ApiService.CONTEXTUAL_AUDIOS.values(), "ApiService.CONTEXTUAL_AUDIOS")
+    registry.validate_references(
+        [r["audio"] for r in ApiService.FAKE_RESPONSES + ChatService.FOLLOW_UP_MESSAGES
+         + [r for pool in ApiService.INTENT_RESPONSES.values() for r in pool] if r.get("audio")],
+        "respostas prontas",
+    )
+    pools = get_response_pools()
+    if pools is not None:
+        registry.validate_references(pools.audio_references(), "pools de respostas")
+    for intent in ("saudacao", "fake", "follow_up"):
+        if not registry.for_intent(intent):
+            logger.error(f"Nenhum áudio cadastrado para a intenção '{intent}'")
+    return registry
 
 # ======================
 # NOVOS SISTEMAS DE HUMANIZAÇÃO
 # ======================
 
+class SentimentResult(NamedTuple):
+    """Sentimento de uma mensagem, calculado uma vez e repassado pelo pipeline."""
+    polarity: float
+    subjectivity: float
+    label: str
+
+class SentimentMemo:
+    """Memo LRU limitado de sentimentos, indexado pelo hash do conteúdo da mensagem."""
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[bytes, SentimentResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, text: str, compute: Callable[[], SentimentResult]) -> SentimentResult:
+        key = blake2b(text.strip().encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            result = self._items.get(key)
+            if result is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+        result = compute()
+        with self._lock:
+            self._items[key] = result
+            if len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"entries": len(self._items), "hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0}
+
+@st.cache_resource
+def get_sentiment_memo() -> SentimentMemo:
+    """Memo de sentimentos compartilhado pelo processo."""
+    return SentimentMemo()
+
 class EmotionalIntelligence:
     """Analisa e gerencia o estado emocional do usuário."""
+    @staticmethod
+    def analyze(text: str) -> SentimentResult:
+        """Sentimento completo da mensagem; textos repetidos ("oi", "kkkk") saem do memo."""
+        def compute() -> SentimentResult:
+            polarity, subjectivity = EmotionalIntelligence.analyze_sentiment(text)
+            return SentimentResult(polarity, subjectivity, EmotionalIntelligence.get_emotional_state(polarity))
+        return get_sentiment_memo().get_or_compute(text, compute)
+
     @staticmethod
     def analyze_sentiment(text: str) -> Tuple[float, float]:
-        """Retorna a polaridade e a subjetividade do texto."""
+        """Retorna a polaridade e a subjetividade do texto pelo motor configurado."""
         try:
-            analysis = TextBlob(text)
-            # Traduz para inglês para análise de sentimento mais precisa da TextBlob
-            # Comentado para evitar dependência de tradutor, mas é uma opção
-            # translated = analysis.translate(to='en')
-            # return translated.sentiment.polarity, translated.sentiment.subjectivity
-            return analysis.sentiment.polarity, analysis.sentiment.subjectivity
+            return get_sentiment_backend()(text)
         except Exception as e:
             logger.warning(f"Análise de sentimento falhou: {e}")
             return 0.0, 0.0
 
+    @staticmethod
+    def textblob_sentiment(text: str) -> Tuple[float, float]:
+        """Motor anterior (léxico em inglês; quase sempre neutro em português)."""
+        from textblob import TextBlob  # importa NLTK; carregado só quando este motor é usado
+        analysis = TextBlob(text)
+        # Traduz para inglês para análise de sentimento mais precisa da TextBlob
+        # Comentado para evitar dependência de tradutor, mas é uma opção
+        # translated = analysis.translate(to='en')
+        # return translated.sentiment.polarity, translated.sentiment.subjectivity
+        return analysis.sentiment.polarity, analysis.sentiment.subjectivity
+
     @staticmethod
     def get_emotional_state(polarity: float) -> str:
         """Categoriza a emoção baseada na polaridade."""
@@ -251,38 +536,74 @@ class EmotionalIntelligence:
         else:
             return "Neutro"
 
+@st.cache_resource
+def get_sentiment_backend() -> Callable[[str], Tuple[float, float]]:
+    """Motor de sentimento do processo, escolhido por Config.SENTIMENT_BACKEND."""
+    from sentiment_pt import PortugueseSentiment
+    backends = {
+        "lexico": lambda: PortugueseSentiment().score,
+        "textblob": lambda: EmotionalIntelligence.textblob_sentiment,
+    }
+    name = Config.SENTIMENT_BACKEND
+    if name not in backends:
+        logger.error(f"Motor de sentimento desconhecido '{name}'; usando 'lexico'")
+        name = "lexico"
+    return backends[name]()
+
 class DynamicPersonality:
     """Define a personalidade da Mylle baseada em fatores dinâmicos."""
+    PERSONAS = {
+        "manha": "Mylle Manhã: Doce e carinhosa, acordando o dia com um toque de malícia.",
+        "tarde": "Mylle Tarde: Provocante e brincalhona, esquentando a tarde.",
+        "noite": "Mylle Noite: Safadinha e sedutora, pronta para realizar fantasias.",
+        "madrugada": "Mylle Madrugada: Íntima e confidencial, para conversas ao pé do ouvido.",
+    }
+    HUMORS = {
+        "fim_de_semana": "Humor de Fim de Semana: Mais relaxada, animada e pronta para a diversão.",
+        "normal": "Humor Normal: Equilibrada, carinhosa e atenta.",
+        "otimo": "Humor Ótimo: Especialmente animada, criativa e provocante hoje.",
+        "carente": "Humor Carente: Um pouco mais manhosa e buscando atenção.",
+    }
+
     @staticmethod
     def get_current_persona() -> Tuple[str, str]:
         """Retorna a persona e o humor da Mylle baseados na hora e em um fator aleatório."""
         now = datetime.now()
         hour = now.hour
         day_of_week = now.weekday()
+        personas = DynamicPersonality.PERSONAS
+        humors = DynamicPersonality.HUMORS
 
         # Define a persona pelo horário
         if 6 <= hour < 12:
-            persona = "Mylle Manhã: Doce e carinhosa, acordando o dia com um toque de malícia."
+            persona = personas["manha"]
         elif 12 <= hour < 18:
-            persona = "Mylle Tarde: Provocante e brincalhona, esquentando a tarde."
+            persona = personas["tarde"]
         elif 18 <= hour < 24:
-            persona = "Mylle Noite: Safadinha e sedutora, pronta para realizar fantasias."
+            persona = personas["noite"]
         else: # 0h-6h
-            persona = "Mylle Madrugada: Íntima e confidencial, para conversas ao pé do ouvido."
+            persona = personas["madrugada"]
 
         # Define um humor variável
         rand_val = random.random()
         if day_of_week >= 5: # Fim de semana
-            humor = "Humor de Fim de Semana: Mais relaxada, animada e pronta para a diversão."
+            humor = humors["fim_de_semana"]
         elif rand_val < 0.6:
-            humor = "Humor Normal: Equilibrada, carinhosa e atenta."
+            humor = humors["normal"]
         elif rand_val < 0.85:
-            humor = "Humor Ótimo: Especialmente animada, criativa e provocante hoje."
+            humor = humors["otimo"]
         else:
-            humor = "Humor Carente: Um pouco mais manhosa e buscando atenção."
+            humor = humors["carente"]
         
         return persona, humor
 
+    @staticmethod
+    def keys_for(persona: str, humor: str) -> Tuple[str, str]:
+        """Chaves curtas ("noite", "carente") da persona e do humor, usadas nos pools de respostas."""
+        persona_key = next((k for k, v in DynamicPersonality.PERSONAS.items() if v == persona), "noite")
+        humor_key = next((k for k, v in DynamicPersonality.HUMORS.items() if v == humor), "normal")
+        return persona_key, humor_key
+
 class RealisticTiming:
     """Simula delays e atividades humanas para maior realismo."""
     @staticmethod
@@ -319,30 +640,261 @@ class RealisticTiming:
 # ======================
 # FUNÇÕES AUXILIARES (Refatoradas e Melhoradas)
 # ======================
+@st.cache_resource
+def get_identity_signer() -> identity.IdentitySigner:
+    return identity.IdentitySigner(identity.load_secret(Config.IDENTITY_SECRET))
+
+def _identity_cookie() -> Optional[str]:
+    try:
+        value = st.context.cookies.get(identity.COOKIE)
+    except Exception:
+        return None
+    return value if isinstance(value, str) else None
+
+def resolve_user_id() -> str:
+    """Resolve o id do usuário a partir do token assinado (?uid= ou cookie) ou cria um novo.
+
+    Roda uma vez por sessão: confere uma assinatura HMAC e grava o token na URL,
+    para que o reload (ou outra réplica com o mesmo segredo) caia no mesmo usuário.
+    """
+    signer = get_identity_signer()
+    token = st.query_params.get(identity.PARAM) or _identity_cookie()
+    user_id = signer.verify(token)
+    if user_id is None:
+        if token:
+            logger.info("Token de identidade inválido; criando novo usuário")
+        user_id, token = signer.new_identity()
+    st.session_state.user_id = user_id
+    if st.query_params.get(identity.PARAM) != token:
+        st.query_params[identity.PARAM] = token
+    return user_id
+
 def get_user_id() -> str:
-    """Gera ou recupera um ID de usuário único e persistente."""
+    """ID persistente do usuário (resolvido na primeira chamada da sessão, depois só leitura)."""
     if 'user_id' not in st.session_state:
-        # Tenta obter de um cookie se possível (simulação)
-        # Em um app real, isso poderia usar st.experimental_get_query_params ou um cookie real
-        st.session_state.user_id = str(uuid.uuid4())
+        return resolve_user_id()
     return st.session_state.user_id
 
+def conversation_stage(history_len: int) -> str:
+    """Estágio da conversa pelo número de mensagens (usado como escopo de cache)."""
+    if history_len <= 4:
+        return "abertura"
+    if history_len <= 16:
+        return "aquecimento"
+    return "avancado"
+
+def profile_avatar() -> str:
+    """Avatar da Mylle em miniatura (cache local), em vez da imagem original em tamanho cheio."""
+    return get_image_store().src(Config.IMG_PROFILE, "avatar")
+
+class KeywordMatcher:
+    """Casa várias palavras-chave de uma vez, em uma passada sobre os tokens do texto.
+
+    As palavras casam inteiras (por token) e sem acentos; um `*` no fim marca
+    um radical ("molhad*" casa "molhada" e "molhadinho") e expressões com
+    várias palavras casam tokens consecutivos. Os índices são montados uma vez
+    e o resultado por token é memorizado, então o custo por mensagem é
+    proporcional ao número de tokens.
+    """
+    TOKEN_CACHE_SIZE = 50000
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(dict.fromkeys(keywords))
+        self.words: Dict[str, int] = {}
+        self.stems: Dict[str, int] = {}
+        self.phrase_starts: Dict[str, List[Tuple[Tuple[str, ...], int]]] = defaultdict(list)
+        for idx, keyword in enumerate(self.keywords):
+            tokens = tuple(WORD_RE.findall(fold_text(keyword.rstrip("*"))))
+            if len(tokens) > 1:
+                self.phrase_starts[tokens[0]].append((tokens[1:], idx))
+            elif keyword.endswith("*"):
+                self.stems[tokens[0]] = idx
+            else:
+                self.words[tokens[0]] = idx
+        self.stem_lengths = sorted({len(stem) for stem in self.stems})
+        self._token_cache: Dict[str, Tuple[int, ...]] = {}
+
+    def _match_token(self, token: str) -> Tuple[int, ...]:
+        ids = [self.words[token]] if token in self.words else []
+        for length in self.stem_lengths:
+            if len(token) < length:
+                break
+            idx = self.stems.get(token[:length])
+            if idx is not None:
+                ids.append(idx)
+        if len(self._token_cache) >= self.TOKEN_CACHE_SIZE:
+            self._token_cache.clear()
+        self._token_cache[token] = result = tuple(ids)
+        return result
+
+    def find_tokens(self, tokens: List[str]) -> Set[int]:
+        """Índices das palavras-chave presentes numa lista de tokens normalizados."""
+        found = set()
+        cache, phrase_starts = self._token_cache, self.phrase_starts
+        for i, token in enumerate(tokens):
+            ids = cache.get(token)
+            if ids is None:
+                ids = self._match_token(token)
+            if ids:
+                found.update(ids)
+            if token in phrase_starts:
+                for rest, idx in phrase_starts[token]:
+                    if tuple(tokens[i + 1:i + 1 + len(rest)]) == rest:
+                        found.add(idx)
+        return found
+
+    def find(self, folded_text: str) -> Set[int]:
+        """Índices das palavras-chave presentes num texto já normalizado por `fold_text`."""
+        return self.find_tokens(WORD_RE.findall(folded_text))
+
+class CTAWindow:
+    """Últimas mensagens da sessão com contagem incremental de palavras quentes.
+
+    Cada mensagem é normalizada e casada uma única vez quando entra na janela;
+    ao sair, suas contagens são subtraídas.
+    """
+    def __init__(self, size: int = 6):
+        self.size = size
+        self.items = deque()
+        self.hot_totals: Dict[int, int] = {}
+        self.ask_total = 0
+        self.fed = 0
+
+    def push(self, hot_ids: Set[int], has_ask: bool) -> None:
+        totals = self.hot_totals
+        self.items.append((hot_ids, has_ask))
+        for idx in hot_ids:
+            totals[idx] = totals.get(idx, 0) + 1
+        self.ask_total += has_ask
+        if len(self.items) > self.size:
+            old_hot, old_ask = self.items.popleft()
+            for idx in old_hot:
+                if totals[idx] == 1:
+                    del totals[idx]
+                else:
+                    totals[idx] -= 1
+            self.ask_total -= old_ask
+
+    def sync(self, history: List[Dict], hot_matcher: KeywordMatcher, ask_matcher: KeywordMatcher) -> None:
+        """Alimenta a janela apenas com as mensagens novas do histórico."""
+        if len(history) < self.fed:  # histórico limpo ou recarregado
+            self.__init__(self.size)
+        start = max(self.fed, len(history) - self.size)
+        for msg in history[start:]:
+            tokens = WORD_RE.findall(fold_text(extract_message_text(msg["content"])))
+            self.push(hot_matcher.find_tokens(tokens), bool(ask_matcher.find_tokens(tokens)))
+        self.fed = len(history)
+
+    @property
+    def hot_count(self) -> int:
+        """Número de palavras quentes distintas nas últimas mensagens."""
+        return len(self.hot_totals)
+
+    @property
+    def has_direct_ask(self) -> bool:
+        return self.ask_total > 0
+
+class FakeQuestionDetector:
+    """Detector de dúvidas sobre autenticidade com índice invertido termo -> padrões.
+
+    Os termos (inclusive expressões como "inteligencia artificial") são
+    indexados pela primeira palavra já sem acento, então a pontuação sai de uma
+    única passada pelos tokens da mensagem, independente do tamanho da tabela.
+    """
+    # Palavras muito comuns não contam como indício isolado de desconfiança
+    INDICATOR_STOPWORDS = frozenset({"e", "que", "de", "nao", "isso", "vc", "voce", "seja"})
+
+    def __init__(self, patterns: List[Dict]):
+        self.scores: List[float] = []
+        self.full_masks: List[int] = []
+        self.indicator_masks: List[int] = []
+        self.require_all: List[bool] = []
+        # primeira palavra -> [(resto da expressão, id do padrão, bit do termo)]
+        self.index: Dict[str, List[Tuple[Tuple[str, ...], int, int]]] = defaultdict(list)
+
+        for pattern_id, pattern in enumerate(patterns):
+            indicator_mask = 0
+            for slot, term in enumerate(pattern["terms"]):
+                tokens = tuple(WORD_RE.findall(fold_text(term)))
+                self.index[tokens[0]].append((tokens[1:], pattern_id, 1 << slot))
+                if not (len(tokens) == 1 and tokens[0] in self.INDICATOR_STOPWORDS):
+                    indicator_mask |= 1 << slot
+            self.scores.append(float(pattern["score"]))
+            self.full_masks.append((1 << len(pattern["terms"])) - 1)
+            self.indicator_masks.append(indicator_mask)
+            self.require_all.append(pattern.get("mode", "all") == "all")
+
+    @staticmethod
+    def normalize_patterns(raw_patterns) -> List[Dict]:
+        """Aceita tuplas (termos, pontuação[, modo]) ou dicts {"terms", "score", "mode"}.
+
+        Entradas inválidas (sem termos, termo sem palavras, pontuação não
+        numérica, modo desconhecido) são descartadas com um aviso.
+        """
+        patterns = []
+        for raw in raw_patterns if isinstance(raw_patterns, (list, tuple)) else []:
+            try:
+                if isinstance(raw, dict):
+                    terms, score, mode = raw["terms"], raw["score"], raw.get("mode", "all")
+                else:
+                    terms, score, mode = raw[0], raw[1], raw[2] if len(raw) > 2 else "all"
+                if isinstance(terms, str) or not isinstance(terms, (list, tuple)) or not terms:
+                    raise ValueError("termos devem ser uma lista não vazia")
+                if not all(isinstance(term, str) and WORD_RE.search(fold_text(term)) for term in terms):
+                    raise ValueError("termo sem palavras")
+                if isinstance(score, bool) or not isinstance(score, (int, float)):
+                    raise ValueError("pontuação não numérica")
+                if mode not in ("all", "any"):
+                    raise ValueError(f"modo desconhecido: {mode!r}")
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logger.warning(f"Padrão de fake ignorado ({raw!r}): {e}")
+                continue
+            patterns.append({"terms": list(terms), "score": score, "mode": mode})
+        return patterns
+
+    @classmethod
+    def from_config(cls) -> "FakeQuestionDetector":
+        patterns = []
+        if Config.FAKE_PATTERNS_FILE:
+            try:
+                with open(Config.FAKE_PATTERNS_FILE, encoding="utf-8") as f:
+                    patterns = cls.normalize_patterns(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.error(f"Falha ao carregar padrões de fake de {Config.FAKE_PATTERNS_FILE}: {e}")
+            if not patterns:
+                logger.error(f"Nenhum padrão válido em {Config.FAKE_PATTERNS_FILE}; usando a tabela padrão")
+        return cls(patterns or cls.normalize_patterns(Config.FAKE_DETECTION_PATTERNS))
+
+    def score(self, text: str) -> float:
+        tokens = WORD_RE.findall(fold_text(text))
+        matched: Dict[int, int] = {}
+        index = self.index
+        for i, token in enumerate(tokens):
+            entries = index.get(token)
+            if not entries:
+                continue
+            for rest, pattern_id, bit in entries:
+                if rest and tuple(tokens[i + 1:i + 1 + len(rest)]) != rest:
+                    continue
+                matched[pattern_id] = matched.get(pattern_id, 0) | bit
+
+        probability = 0.0
+        indicator_count = 0
+        for pattern_id, mask in matched.items():
+            if mask == self.full_masks[pattern_id] or not self.require_all[pattern_id]:
+                probability += self.scores[pattern_id]
+            if mask & self.indicator_masks[pattern_id]:
+                indicator_count += 1
+
+        # Aumentar probabilidade se houver múltiplos indicadores
+        if indicator_count > 1:
+            probability += 0.2 * (indicator_count - 1)
+
+        return min(1.0, max(0.0, probability))
+
 def detect_fake_question(text: str) -> float:
     """Detecta se o texto contém dúvidas sobre autenticidade com pontuação."""
-    text = text.lower()
-    words = set(re.findall(r'\w+', text))
-    probability = 0.0
-    
-    for pattern, score in Config.FAKE_DETECTION_PATTERNS:
-        if all(p in words for p in pattern):
-            probability += score
-            
-    # Aumentar probabilidade se houver múltiplos indicadores
-    indicator_count = sum(1 for pattern, _ in Config.FAKE_DETECTION_PATTERNS if any(p in words for p in pattern))
-    if indicator_count > 1:
-        probability += 0.2 * (indicator_count - 1)
-        
-    return min(1.0, max(0.0, probability))
+    return get_fake_detector().score(text)
 
 def generate_conversation_hash(messages: List[Dict], current_input: str) -> str:
     """Gera hash único baseado no histórico recente e input atual."""
@@ -371,19 +923,306 @@ def get_fallback_response(user_input: str, conversation_history: List[Dict]) ->
     
     return random.choice(fallbacks)
 
-def adjust_rate_limiting(user_id: str, current_count: int) -> bool:
-    """Define limites dinâmicos baseados no engajamento (simplificado para focar na lógica principal)."""
-    # A lógica complexa de DB foi removida para simplificar, mas pode ser re-integrada
-    # A ideia é que usuários mais engajados tenham mais interações.
-    return current_count < Config.MAX_REQUESTS_PER_SESSION
+class StageStats:
+    """Histogramas de latência (segundos) por etapa do turno, compartilhados pelo processo."""
+    LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    REPORT_EVERY = 50
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self.turns = 0
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram(self.LATENCY_BUCKETS))
+        histogram.observe(seconds)
+
+    def record_turn(self, spans: List[Tuple[str, float]], total: float) -> None:
+        for stage, seconds in spans:
+            self.observe(stage, seconds)
+        self.observe("turno_total", total)
+        with self._lock:
+            self.turns += 1
+            report = self.turns % self.REPORT_EVERY == 0
+        if report:
+            slowest = sorted(self.histograms.items(), key=lambda item: -item[1].sum)[:6]
+            logger.info(f"Latência por etapa ({self.turns} turnos, p50/p95 em ms): " + ", ".join(
+                f"{stage} {h.quantile(0.5) * 1000:g}/{h.quantile(0.95) * 1000:g}" for stage, h in slowest))
+
+    def stats(self) -> Dict:
+        return {stage: h.snapshot() for stage, h in sorted(self.histograms.items())}
+
+@st.cache_resource
+def get_stage_stats() -> StageStats:
+    """Latência por etapa compartilhada pelo processo."""
+    return StageStats()
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: "TurnTrace", name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.spans.append((self.name, time.perf_counter() - self.started))
+        return False
+
+class TurnTrace:
+    """Cronômetro de um turno: `with trace.span("7_prompt"): ...` mede cada etapa.
+
+    As durações vão para os histogramas de StageStats em finish(); o detalhamento
+    do turno só é formatado quando o log está em DEBUG.
+    """
+    def __init__(self, stats: Optional[StageStats] = None):
+        self.stats = stats
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+        self.finished = False
+        self.turn_id = uuid.uuid4().hex[:12]
+        bind_log_context(turn=self.turn_id)  # registros deste turno levam o id no app.log
+
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def add(self, name: str, seconds: float) -> None:
+        """Registra uma etapa medida fora do trace (ex.: antes de o turno existir)."""
+        self.spans.append((name, seconds))
+
+    def finish(self) -> float:
+        if self.finished:
+            return 0.0
+        self.finished = True
+        total = time.perf_counter() - self.started
+        (self.stats or get_stage_stats()).record_turn(self.spans, total)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Turno {total * 1000:.1f} ms: " + " | ".join(
+                f"{name} {seconds * 1000:.1f}" for name, seconds in self.spans))
+        return total
+
+class AppMetrics:
+    """Métricas do app no formato do Prometheus (`/metrics` numa thread própria).
+
+    Contadores e histogramas são atualizados no caminho do turno; latência por
+    etapa, tokens e caches são lidos dos stats existentes só na coleta.
+    """
+    GEMINI_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 45.0)
+    DATABASES = {"chat": "chat_history.db", "learning": "learning_data.db", "session": Config.SESSION_STORE,
+                 "rate_limit": Config.RATE_LIMIT_STORE}
+    COMMIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.responses = r.counter("mylle_responses_total",
+                                   "Respostas por origem (gemini, gemini_texto, cache, local, fake, fallback)", ("source",))
+        self.gemini_seconds = r.histogram("mylle_gemini_request_seconds", "Latência HTTP das chamadas ao Gemini",
+                                          self.GEMINI_BUCKETS)
+        self.gemini_requests = r.counter("mylle_gemini_requests_total",
+                                         "Chamadas ao Gemini por código HTTP (ou timeout/conexao)", ("code",))
+        self.cta = r.counter("mylle_cta_total", "CTAs de venda no chat por evento (shown, clicked)", ("event",))
+        self.sqlite_commit_seconds = r.histogram("mylle_sqlite_commit_seconds", "Latência dos commits no SQLite",
+                                                 self.COMMIT_BUCKETS, ("db",))
+        self.rate_limited = r.counter("mylle_rate_limited_total", "Mensagens recusadas pelo limitador de taxa")
+        self.sessions = ActivityTracker(Config.METRICS_SESSION_WINDOW)
+        # Tamanho e linhas dos bancos: contados numa thread a cada METRICS_DB_REFRESH s, nunca na coleta
+        self.db_bytes = r.gauge("mylle_db_bytes", "Tamanho do arquivo SQLite", ("db",))
+        self.db_rows = r.gauge("mylle_db_rows", "Linhas por tabela", ("db", "table"))
+        self._db_refresh = threading.Event()
+        threading.Thread(target=self._refresh_db_stats, name="metrics-db", daemon=True).start()
+        r.add_collector("app", self._collect)
+        self.server = None
+        if Config.METRICS_PORT:
+            self.server = start_http_server(r, Config.METRICS_PORT, Config.METRICS_HOST)
+
+    def _refresh_db_stats(self) -> None:
+        while True:
+            for db, path in self.DATABASES.items():
+                try:
+                    self.db_bytes.set(os.path.getsize(path), db=db)
+                    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+                    try:
+                        tables = [row[0] for row in conn.execute(
+                            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+                        for table in tables:
+                            self.db_rows.set(conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0],
+                                             db=db, table=table)
+                    finally:
+                        conn.close()
+                except (OSError, sqlite3.Error):
+                    continue  # banco ainda não criado neste diretório
+            self._db_refresh.wait(Config.METRICS_DB_REFRESH)
+            self._db_refresh.clear()
+
+    def request_db_refresh(self) -> None:
+        """Antecipa a próxima contagem dos bancos (botão da página de admin)."""
+        self._db_refresh.set()
+
+    def _collect(self):
+        stages = get_stage_stats()
+        yield "mylle_turns_total", "counter", "Turnos de conversa respondidos", [({}, stages.turns)]
+        yield ("mylle_stage_seconds", "histogram", "Latência por etapa do turno",
+               [({"stage": stage}, h) for stage, h in sorted(stages.histograms.items())])
+        yield ("mylle_active_sessions", "gauge", f"Sessões com atividade nos últimos {Config.METRICS_SESSION_WINDOW}s",
+               [({}, self.sessions.active())])
+        yield ("mylle_prompt_input_tokens", "histogram", "Tokens de entrada por chamada ao Gemini",
+               [({}, get_prompt_stats().input_tokens_hist)])
+
+        # (consultas, acertos) de cada cache
+        caches = {}
+        response_cache = get_response_cache()
+        if response_cache:
+            stats = response_cache.stats()
+            caches["respostas"] = (stats["lookups"], stats["hits"])
+        stats = get_sentiment_memo().stats()
+        caches["sentimento"] = (stats["hits"] + stats["misses"], stats["hits"])
+        stats = get_memory_index().stats()
+        caches["memoria"] = (stats["searches"], max(0, stats["searches"] - stats["loads"]))
+        yield ("mylle_cache_lookups_total", "counter", "Consultas por cache",
+               [({"cache": name}, lookups) for name, (lookups, _) in caches.items()])
+        yield ("mylle_cache_hits_total", "counter", "Acertos por cache",
+               [({"cache": name}, hits) for name, (_, hits) in caches.items()])
+        yield ("mylle_cache_hit_ratio", "gauge", "Taxa de acerto por cache",
+               [({"cache": name}, hits / lookups if lookups else 0.0) for name, (lookups, hits) in caches.items()])
+
+@st.cache_resource
+def get_metrics() -> AppMetrics:
+    """Métricas do processo; sobe o endpoint HTTP na primeira chamada."""
+    return AppMetrics()
+
+@st.cache_resource
+def get_profiler() -> SamplingProfiler:
+    """Profiler por amostragem do processo (desligado até ser ativado)."""
+    return SamplingProfiler(interval=Config.PROFILE_INTERVAL, window=Config.PROFILE_WINDOW)
+
+def is_admin_token(token: Optional[str]) -> bool:
+    return bool(Config.ADMIN_TOKEN and token) and hmac.compare_digest(str(token), Config.ADMIN_TOKEN)
+
+def update_profiler() -> None:
+    """Liga/desliga o profiler (env ou ?profile=1|0&token=...) e inclui a thread deste rerun.
+
+    O pedido manual vale para o processo até o próximo pedido manual (o
+    MYLLE_PROFILE não religa o que um admin desligou). `profile` e `token`
+    saem da URL assim que lidos, para a senha não ficar no histórico do
+    navegador nem nos logs de proxy.
+    """
+    profiler = get_profiler()
+    params = st.query_params
+    if "profile" in params or "token" in params:
+        requested, token = params.get("profile"), params.get("token")
+        for key in ("profile", "token"):
+            if key in params:
+                del params[key]
+        if requested is not None and is_admin_token(token):
+            profiler.set_override(requested not in ("0", "off"))
+    if Config.PROFILE and profiler.override is None and not profiler.running:
+        profiler.start()
+    if profiler.running:
+        profiler.watch_current_thread()
+
+def timed_commit(conn: sqlite3.Connection, db: str) -> None:
+    """commit() com a latência registrada em mylle_sqlite_commit_seconds."""
+    started = time.perf_counter()
+    conn.commit()
+    get_metrics().sqlite_commit_seconds.observe(time.perf_counter() - started, db=db)
+
+@st.cache_resource
+def get_rate_limiter() -> TokenBucketLimiter:
+    """Limitador do processo; o estado dos baldes fica no SQLite ou no Redis."""
+    return TokenBucketLimiter(create_store(Config.RATE_LIMIT_STORE), Config.RATE_LIMIT_MESSAGES,
+                              Config.RATE_LIMIT_WINDOW, Config.RATE_LIMIT_FINGERPRINT_FACTOR,
+                              Config.RATE_LIMIT_NETWORK_FACTOR)
+
+def fingerprint_of(ip: str, user_agent: str, language: str) -> str:
+    """Hash do IP de origem, user agent e idioma ("" se não houver nenhum)."""
+    parts = [part for part in (ip, user_agent, language) if isinstance(part, str)]
+    return blake2b("|".join(parts).encode("utf-8"), digest_size=12).hexdigest() if any(parts) else ""
+
+def client_identity() -> Tuple[str, str]:
+    """(impressão digital do navegador, rede de origem) desta sessão, calculadas uma vez por sessão.
+
+    O IP é o da conexão (`st.context.ip_address`, None em localhost); o
+    X-Forwarded-For só conta atrás de Config.TRUSTED_PROXY_HOPS proxies.
+    """
+    if "client_fingerprint" not in st.session_state:
+        try:
+            headers = st.context.headers
+            peer = st.context.ip_address
+            ip = client_ip(peer if isinstance(peer, str) else "127.0.0.1",
+                           headers.get("X-Forwarded-For", ""), Config.TRUSTED_PROXY_HOPS)
+            fingerprint = fingerprint_of(ip, headers.get("User-Agent", ""), headers.get("Accept-Language", ""))
+            network = network_of(ip)
+        except Exception:
+            fingerprint, network = "", ""
+        st.session_state.client_fingerprint = fingerprint
+        st.session_state.client_network = network
+    return st.session_state.client_fingerprint, st.session_state.client_network
+
+def check_rate_limit(user_id: str, current_count: int, fingerprint: Optional[str] = None,
+                     network: Optional[str] = None, bucket_id: Optional[str] = None) -> Tuple[bool, Optional[float]]:
+    """Limite da sessão e token bucket por usuário/cliente, antes de qualquer chamada ao Gemini.
+
+    Retorna (permitido, segundos até a próxima ficha); o tempo é None quando
+    o que acabou foi a cota da sessão, que esperar não renova.
+
+    As duas cotas do usuário são multiplicadas pelo fator de engajamento
+    (QuotaEngine): mais mensagens para quem demonstra intenção de compra.
+    `bucket_id` troca a chave do balde do usuário (ex.: um id recém-criado
+    cobrado no balde do endereço que o pediu).
+    """
+    try:
+        factor = get_quota_engine().factor(user_id)
+    except Exception as e:
+        logger.warning(f"Motor de cotas indisponível: {e}")
+        factor = 1.0
+    if current_count >= Config.MAX_REQUESTS_PER_SESSION * factor:
+        return False, None
+    try:
+        if fingerprint is None:
+            fingerprint, network = client_identity()
+        decision = get_rate_limiter().take(bucket_id or user_id, fingerprint, network=network,
+                                           capacity=Config.RATE_LIMIT_MESSAGES * factor)
+    except Exception as e:
+        # Falha do armazenamento não derruba o chat; o limite da sessão continua valendo
+        logger.warning(f"Limitador de taxa indisponível: {e}")
+        return True, 0.0
+    if not decision.allowed:
+        get_metrics().rate_limited.inc()
+        logger.info(f"Limite de taxa atingido (nova ficha em {decision.retry_after:.0f} s)")
+    return decision.allowed, decision.retry_after
+
+def adjust_rate_limiting(user_id: str, current_count: int, fingerprint: Optional[str] = None,
+                         network: Optional[str] = None, bucket_id: Optional[str] = None) -> bool:
+    """`check_rate_limit` só com a decisão."""
+    return check_rate_limit(user_id, current_count, fingerprint, network, bucket_id)[0]
 
 # ======================
 # APRENDIZADO DE MÁQUINA E MEMÓRIA (Ultra Avançado)
 # ======================
 class LearningEngine:
+    # Agregado emocional por usuário: média móvel exponencial, contagem por
+    # rótulo e os últimos estados num anel compacto (um caractere por estado)
+    MOOD_EWMA_ALPHA = 0.3
+    MOOD_RING_SIZE = 20
+    MOOD_CODES = {"Muito Positivo": "P", "Positivo": "p", "Neutro": "0", "Negativo": "n", "Muito Negativo": "N"}
+    MOOD_COLUMNS = {"Muito Positivo": "n_muito_positivo", "Positivo": "n_positivo", "Neutro": "n_neutro",
+                    "Negativo": "n_negativo", "Muito Negativo": "n_muito_negativo"}
+    MOOD_SCORES = {"P": 2, "p": 1, "0": 0, "n": -1, "N": -2}
+    # Linhas brutas mantidas por usuário após a compactação (o agregado guarda o resto)
+    EMOTIONAL_HISTORY_KEEP = 50
+    EMOTIONAL_COMPACT_PROBABILITY = 0.02
+
     def __init__(self, db_path='learning_data.db'):
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # um LearningEngine por thread na API HTTP
         self.create_tables()
 
     def create_tables(self):
@@ -404,12 +1243,31 @@ class LearningEngine:
         c.execute('''CREATE TABLE IF NOT EXISTS emotional_history
                      (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, 
                       sentiment_label TEXT, polarity REAL, subjectivity REAL, timestamp DATETIME)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_emotional_history_user
+                     ON emotional_history (user_id, id)''')
+
+        # Agregado emocional incremental (uma linha por usuário)
+        label_columns = ", ".join(f"{col} INTEGER DEFAULT 0" for col in self.MOOD_COLUMNS.values())
+        c.execute(f'''CREATE TABLE IF NOT EXISTS emotional_aggregates
+                     (user_id TEXT PRIMARY KEY, ewma_polarity REAL, message_count INTEGER,
+                      {label_columns}, recent TEXT, updated_at DATETIME)''')
 
         # Tabela para marcos da conversa
         c.execute('''CREATE TABLE IF NOT EXISTS conversation_milestones
                      (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, 
                       milestone_description TEXT, timestamp DATETIME)''')
-        self.conn.commit()
+
+        # Posição de cada usuário na permutação de cada pool de respostas
+        c.execute('''CREATE TABLE IF NOT EXISTS response_pool_positions
+                     (user_id TEXT, pool_key TEXT, version INTEGER, position INTEGER,
+                      PRIMARY KEY (user_id, pool_key))''')
+
+        # Sinais de engajamento já decaídos até updated_at (cota de mensagens)
+        c.execute('''CREATE TABLE IF NOT EXISTS engagement_signals
+                     (user_id TEXT PRIMARY KEY, messages REAL, cta_clicks REAL,
+                      purchase_intents REAL, updated_at REAL)''')
+        timed_commit(self.conn, "learning")
+        self._backfill_emotional_aggregates()
 
     def save_user_profile(self, user_id: str, **kwargs):
         c = self.conn.cursor()
@@ -426,7 +1284,7 @@ class LearningEngine:
             cols = ", ".join(kwargs.keys())
             placeholders = ", ".join(['?'] * len(kwargs))
             c.execute(f'INSERT INTO user_profile ({cols}) VALUES ({placeholders})', list(kwargs.values()))
-        self.conn.commit()
+        timed_commit(self.conn, "learning")
 
     def get_user_profile(self, user_id: str) -> Optional[Dict]:
         c = self.conn.cursor()
@@ -443,7 +1301,7 @@ class LearningEngine:
                      (user_id, preference_type, preference_value, strength, timestamp)
                      VALUES (?, ?, ?, ?, ?)
                   ''', (user_id, pref_type, pref_value, strength, datetime.now()))
-        self.conn.commit()
+        timed_commit(self.conn, "learning")
 
     def get_user_preferences(self, user_id: str) -> Dict:
         c = self.conn.cursor()
@@ -457,19 +1315,127 @@ class LearningEngine:
 
     def save_emotional_state(self, user_id: str, sentiment_label: str, polarity: float, subjectivity: float):
         c = self.conn.cursor()
+        now = datetime.now()
         c.execute('''INSERT INTO emotional_history 
                      (user_id, sentiment_label, polarity, subjectivity, timestamp) 
                      VALUES (?, ?, ?, ?, ?)
-                  ''', (user_id, sentiment_label, polarity, subjectivity, datetime.now()))
-        self.conn.commit()
+                  ''', (user_id, sentiment_label, polarity, subjectivity, now))
+        self._update_emotional_aggregate(c, user_id, sentiment_label, polarity, now)
+        timed_commit(self.conn, "learning")
+        if random.random() < self.EMOTIONAL_COMPACT_PROBABILITY:
+            self.compact_emotional_history(user_id)
+
+    def _update_emotional_aggregate(self, c: sqlite3.Cursor, user_id: str, sentiment_label: str,
+                                    polarity: float, timestamp) -> None:
+        """Atualiza o agregado do usuário em O(1) com um único UPSERT atômico."""
+        column = self.MOOD_COLUMNS.get(sentiment_label, "n_neutro")
+        code = self.MOOD_CODES.get(sentiment_label, "0")
+        alpha = self.MOOD_EWMA_ALPHA
+        c.execute(f'''INSERT INTO emotional_aggregates
+                     (user_id, ewma_polarity, message_count, {column}, recent, updated_at)
+                     VALUES (?, ?, 1, 1, ?, ?)
+                     ON CONFLICT(user_id) DO UPDATE SET
+                         ewma_polarity = ewma_polarity * (1 - {alpha}) + excluded.ewma_polarity * {alpha},
+                         message_count = message_count + 1,
+                         {column} = {column} + 1,
+                         recent = substr(recent || excluded.recent, -{self.MOOD_RING_SIZE}),
+                         updated_at = excluded.updated_at
+                  ''', (user_id, polarity, code, timestamp))
+
+    def _backfill_emotional_aggregates(self) -> None:
+        """Migração: monta os agregados a partir do histórico bruto quando a tabela é nova."""
+        c = self.conn.cursor()
+        if c.execute('SELECT 1 FROM emotional_aggregates LIMIT 1').fetchone():
+            return
+        rows = c.execute('''SELECT user_id, sentiment_label, polarity, timestamp
+                             FROM emotional_history ORDER BY id''').fetchall()
+        if not rows:
+            return
+        for user_id, label, polarity, timestamp in rows:
+            self._update_emotional_aggregate(c, user_id, label, polarity or 0.0, timestamp)
+        timed_commit(self.conn, "learning")
+        logger.info(f"Agregados emocionais reconstruídos a partir de {len(rows)} registros")
+
+    def get_mood(self, user_id: str) -> Optional[Dict]:
+        """Tendência emocional do usuário com uma única leitura por chave primária."""
+        c = self.conn.cursor()
+        c.execute('SELECT * FROM emotional_aggregates WHERE user_id = ?', (user_id,))
+        row = c.fetchone()
+        if not row:
+            return None
+        data = dict(zip([desc[0] for desc in c.description], row))
+        recent = data["recent"] or ""
+        labels = {code: label for label, code in self.MOOD_CODES.items()}
+        # Tendência: últimos 3 estados vs. os anteriores do anel
+        scores = [self.MOOD_SCORES[code] for code in recent]
+        trend = "estável"
+        if len(scores) >= 6:
+            delta = sum(scores[-3:]) / 3 - sum(scores[:-3]) / len(scores[:-3])
+            if delta >= 0.75:
+                trend = "melhorando"
+            elif delta <= -0.75:
+                trend = "piorando"
+        return {
+            "ewma_polarity": data["ewma_polarity"],
+            "label": EmotionalIntelligence.get_emotional_state(data["ewma_polarity"]),
+            "trend": trend,
+            "message_count": data["message_count"],
+            "counts": {label: data[col] for label, col in self.MOOD_COLUMNS.items()},
+            "recent": [labels[code] for code in recent],
+        }
 
     def get_emotional_history(self, user_id: str, limit: int = 5) -> List[Dict]:
         c = self.conn.cursor()
         c.execute('''SELECT sentiment_label, polarity, timestamp FROM emotional_history
-                     WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?''', (user_id, limit))
+                     WHERE user_id = ? ORDER BY id DESC LIMIT ?''', (user_id, limit))
         history = [{'sentiment': label, 'polarity': pol, 'time': ts} for label, pol, ts in c.fetchall()]
         return list(reversed(history))
 
+    def compact_emotional_history(self, user_id: Optional[str] = None, keep: Optional[int] = None) -> int:
+        """Apaga o histórico bruto antigo, mantendo os últimos `keep` registros por usuário."""
+        keep = self.EMOTIONAL_HISTORY_KEEP if keep is None else keep
+        c = self.conn.cursor()
+        if user_id is not None:
+            c.execute('''DELETE FROM emotional_history WHERE user_id = ? AND id <= COALESCE(
+                             (SELECT id FROM emotional_history WHERE user_id = ?
+                              ORDER BY id DESC LIMIT 1 OFFSET ?), -1)''', (user_id, user_id, keep))
+        else:
+            c.execute('''DELETE FROM emotional_history WHERE id IN (
+                             SELECT id FROM (SELECT id, ROW_NUMBER() OVER
+                                 (PARTITION BY user_id ORDER BY id DESC) AS rn FROM emotional_history)
+                             WHERE rn > ?)''', (keep,))
+        timed_commit(self.conn, "learning")
+        return c.rowcount
+
+    def next_pool_position(self, user_id: str, key: str, version: int) -> int:
+        """Avança a posição do usuário no pool (recomeça do zero quando o arquivo de pools muda)."""
+        c = self.conn.cursor()
+        c.execute('''INSERT INTO response_pool_positions (user_id, pool_key, version, position)
+                     VALUES (?, ?, ?, 0)
+                     ON CONFLICT(user_id, pool_key) DO UPDATE SET
+                         position = CASE WHEN version = excluded.version THEN position + 1 ELSE 0 END,
+                         version = excluded.version''', (user_id, key, version))
+        c.execute('SELECT position FROM response_pool_positions WHERE user_id = ? AND pool_key = ?',
+                  (user_id, key))
+        position = c.fetchone()[0]
+        timed_commit(self.conn, "learning")
+        return position
+
+    def get_engagement(self, user_id: str) -> Optional[Tuple[float, float, float, float]]:
+        """(mensagens, cliques no CTA, intenções de compra, updated_at) do usuário."""
+        c = self.conn.cursor()
+        c.execute('''SELECT messages, cta_clicks, purchase_intents, updated_at
+                     FROM engagement_signals WHERE user_id = ?''', (user_id,))
+        return c.fetchone()
+
+    def save_engagement(self, user_id: str, messages: float, cta_clicks: float,
+                        purchase_intents: float, updated_at: float):
+        c = self.conn.cursor()
+        c.execute('''INSERT OR REPLACE INTO engagement_signals
+                     (user_id, messages, cta_clicks, purchase_intents, updated_at)
+                     VALUES (?, ?, ?, ?, ?)''', (user_id, messages, cta_clicks, purchase_intents, updated_at))
+        timed_commit(self.conn, "learning")
+
     def extract_and_save_info(self, user_id: str, text: str):
         """Extrai informações do texto e salva no perfil e preferências."""
         # Extrair nome
@@ -491,31 +1457,165 @@ class LearningEngine:
                 interest = interest_match.group(1).strip()
                 self.save_user_preference(user_id, 'gosto', interest)
 
+class QuotaEngine:
+    """Fator da cota de mensagens por usuário a partir de sinais de engajamento.
+
+    Mensagens, cliques no CTA e pedidos de compra são contadores com meia-vida
+    (a recência entra pelo decaimento). Cada evento atualiza a linha do usuário
+    em memória e no banco e o fator é recalculado na hora, sem ler o histórico.
+    Quem pede preço e clica nas ofertas ganha até MAX_FACTOR vezes a cota;
+    quem só conversa, depois do aquecimento, cai para MIN_FACTOR.
+
+    Para o usuário não inflar a própria cota, conta no máximo um pedido de
+    compra por INTENT_WINDOW e um clique por CTA efetivamente exibido
+    (`offer_cta` registra a exibição; `accept_click` a consome).
+    """
+    HALF_LIFE = 24 * 3600
+    INTENT_WINDOW = 3600      # repetir "quanto custa" na mesma hora não soma de novo
+    OFFERED_PER_USER = 5      # CTAs exibidos ainda clicáveis por usuário
+    WARMUP_MESSAGES = 10      # mensagens (decaídas) antes de cobrar sinal de compra
+    CTA_WEIGHT = 2.0          # um clique vale dois pedidos de compra
+    BUYER_SCALE = 3.0         # sinal de compra para chegar a ~63% do bônus
+    MIN_FACTOR = 0.5
+    MAX_FACTOR = 3.0
+    CACHE_SIZE = 10000
+
+    def __init__(self, learning_engine: Optional[LearningEngine] = None):
+        self.learning_engine = learning_engine or LearningEngine()
+        self._signals: "OrderedDict[str, List[float]]" = OrderedDict()
+        # user_id -> [instante do último pedido de compra contado, ids dos CTAs exibidos]
+        self._guards: "OrderedDict[str, List]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def compute_factor(cls, messages: float, cta_clicks: float, purchase_intents: float) -> float:
+        buyer = cta_clicks * cls.CTA_WEIGHT + purchase_intents
+        factor = cls.MIN_FACTOR + (cls.MAX_FACTOR - cls.MIN_FACTOR) * (1 - math.exp(-buyer / cls.BUYER_SCALE))
+        if messages < cls.WARMUP_MESSAGES:
+            factor = max(factor, 1.0)
+        return factor
+
+    def _decayed(self, user_id: str, now: float) -> List[float]:
+        """[mensagens, cliques, intenções, agora] do usuário, decaídos até `now` (lock já adquirido)."""
+        signals = self._signals.get(user_id)
+        if signals is None:
+            row = self.learning_engine.get_engagement(user_id)
+            signals = list(row) if row else [0.0, 0.0, 0.0, now]
+            self._signals[user_id] = signals
+            if len(self._signals) > self.CACHE_SIZE:
+                self._signals.popitem(last=False)
+        else:
+            self._signals.move_to_end(user_id)
+        decay = 0.5 ** (max(0.0, now - signals[3]) / self.HALF_LIFE)
+        signals[:] = [signals[0] * decay, signals[1] * decay, signals[2] * decay, now]
+        return signals
+
+    def _guard(self, user_id: str) -> List:
+        """Estado anti-abuso do usuário (lock já adquirido)."""
+        guard = self._guards.get(user_id)
+        if guard is None:
+            guard = self._guards[user_id] = [0.0, []]
+            if len(self._guards) > self.CACHE_SIZE:
+                self._guards.popitem(last=False)
+        else:
+            self._guards.move_to_end(user_id)
+        return guard
+
+    def accept_intent(self, user_id: str, now: Optional[float] = None) -> bool:
+        """True (e marca) se o último pedido de compra contado já saiu da janela."""
+        now = now or time.time()
+        with self._lock:
+            guard = self._guard(user_id)
+            if now - guard[0] < self.INTENT_WINDOW:
+                return False
+            guard[0] = now
+            return True
+
+    def offer_cta(self, user_id: str, cta_id: str) -> None:
+        """Registra um CTA exibido ao usuário (só ele pode contar um clique)."""
+        with self._lock:
+            offered = self._guard(user_id)[1]
+            if cta_id not in offered:
+                offered.append(cta_id)
+                del offered[:-self.OFFERED_PER_USER]
+
+    def accept_click(self, user_id: str, cta_id: str) -> bool:
+        """True (e consome) se o CTA foi exibido e ainda não teve clique contado."""
+        with self._lock:
+            offered = self._guard(user_id)[1]
+            if cta_id not in offered:
+                return False
+            offered.remove(cta_id)
+            return True
+
+    def factor(self, user_id: str, now: Optional[float] = None) -> float:
+        with self._lock:
+            messages, cta_clicks, purchase_intents, _ = self._decayed(user_id, now or time.time())
+        return self.compute_factor(messages, cta_clicks, purchase_intents)
+
+    def record(self, user_id: str, messages: int = 0, cta_clicks: int = 0, purchase_intents: int = 0,
+               now: Optional[float] = None) -> float:
+        """Soma os eventos do turno e devolve o novo fator."""
+        with self._lock:
+            signals = self._decayed(user_id, now or time.time())
+            signals[0] += messages
+            signals[1] += cta_clicks
+            signals[2] += purchase_intents
+            snapshot = tuple(signals)
+            # A conexão do learning_engine é compartilhada entre as threads: grava sob o lock
+            try:
+                self.learning_engine.save_engagement(user_id, *snapshot)
+            except sqlite3.Error as e:
+                logger.warning(f"Falha ao salvar engajamento: {e}")
+        return self.compute_factor(*snapshot[:3])
+
+@st.cache_resource
+def get_quota_engine() -> QuotaEngine:
+    """Motor de cotas do processo (sinais em memória, persistidos no learning_data.db)."""
+    return QuotaEngine()
+
+def cta_id_of(message_content: str) -> str:
+    """Id do CTA de uma resposta (o JSON salvo no histórico)."""
+    return md5(message_content.encode("utf-8")).hexdigest()[:16]
+
+def record_cta_shown(user_id: str, message_content: str) -> None:
+    try:
+        get_quota_engine().offer_cta(user_id, cta_id_of(message_content))
+    except Exception as e:
+        logger.warning(f"Motor de cotas indisponível: {e}")
+
+def record_engagement(user_id: str, text: str = "", cta_id: Optional[str] = None) -> None:
+    """Atualiza os sinais de engajamento: mensagem (com ou sem pedido de compra) ou clique no CTA `cta_id`."""
+    try:
+        engine = get_quota_engine()
+        purchase_intents = cta_clicks = 0
+        if text:
+            _, ask_matcher = get_cta_matchers()
+            purchase_intents = int(bool(ask_matcher.find(fold_text(text))) and engine.accept_intent(user_id))
+        if cta_id:
+            cta_clicks = int(engine.accept_click(user_id, cta_id))
+        if text or cta_clicks:
+            engine.record(user_id, messages=int(bool(text)), cta_clicks=cta_clicks,
+                          purchase_intents=purchase_intents)
+    except Exception as e:
+        logger.warning(f"Motor de cotas indisponível: {e}")
+
 # ======================
 # PERSISTÊNCIA DE SESSÃO (Novo)
 # ======================
-class PersistentState:
-    """Gerencia o estado da sessão em um banco de dados para persistência real entre recarregamentos."""
-    def __init__(self, db_path='session_data.db'):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.c = self.conn.cursor()
-        self.c.execute('''CREATE TABLE IF NOT EXISTS session_state
-                         (user_id TEXT PRIMARY KEY, state_json TEXT, last_updated DATETIME)''')
-        self.conn.commit()
-
-    def save_state(self, user_id: str, state: Dict):
-        state_json = json.dumps(state, default=str)
-        self.c.execute('''INSERT OR REPLACE INTO session_state (user_id, state_json, last_updated)
-                         VALUES (?, ?, ?)
-                      ''', (user_id, state_json, datetime.now()))
-        self.conn.commit()
-
-    def load_state(self, user_id: str) -> Optional[Dict]:
-        self.c.execute('SELECT state_json FROM session_state WHERE user_id = ?', (user_id,))
-        row = self.c.fetchone()
-        if row:
-            return json.loads(row[0])
-        return None
+@st.cache_resource
+def get_session_store():
+    """Store do estado das sessões (compartilhado pelos workers no modo scale-out)."""
+    return create_session_store(Config.SESSION_STORE, on_commit=lambda conn: timed_commit(conn, "session"))
+
+# Chaves do session_state que sobrevivem ao reload e à troca de worker
+# session_id acompanha messages: a conversa restaurada continua na mesma sessão
+# (banco, resumo e memória de conversas anteriores se referem a ela)
+PERSISTENT_KEYS = [
+    'age_verified', 'session_id', 'messages', 'history_offset', 'request_count', 'connection_complete',
+    'chat_started', 'current_page', 'preview_shown', 'conversation_stage',
+    'last_interaction_time', 'user_info_collected', 'audio_count'
+]
 
 # ======================
 # MODELOS DE DADOS E PERSONA (Atualizado)
@@ -535,51 +1635,199 @@ class Persona:
     7.  **Uso de Mídia:** Use áudios estrategicamente (cerca de 15% das vezes) para aumentar o realismo, especialmente para responder a desconfianças ou em momentos mais íntimos.
     """
 
-# ... (Restante do código será adicionado nas próximas etapas)
+    # Instruções fixas de toda resposta (vão no systemInstruction junto com MYLLE_BASE)
+    RESPONSE_RULES = """
+    [INSTRUÇÕES DE RESPOSTA]
+    - Adapte seu tom ao estado emocional do usuário
+    - Se ele estiver triste/negativo, seja mais carinhosa e empática
+    - Se ele estiver feliz/positivo, seja mais brincalhona e provocante
+    - Use as informações do perfil para personalizar a resposta
+    - Mantenha a resposta curta (máximo 2-3 frases)
+    - Inclua uma pergunta ou provocação para manter o engajamento
+    - Seja natural, humana e envolvente
+    - Use o nome do usuário se souber
+    - Responda em JSON no formato: {{"text": "sua resposta", "audio": "chave_do_audio_opcional", "cta": {{"show": true/false, "label": "texto do botão", "target": "página"}}}}
+    - Áudios disponíveis (use somente estas chaves): {audio_keys}
+    """
 
+    # Parte variável de cada turno
+    STATE_TEMPLATE = """
+    [ESTADO ATUAL]
+    {persona}
+    {humor}
+    Estado emocional do usuário: {emotional_state}
 
+    [INFORMAÇÕES DO USUÁRIO]
+    {user_info}
+    """
 
-    @staticmethod
-    def get_dynamic_persona(persona: str, humor: str, emotional_state: str, user_profile: Dict) -> str:
-        """Constrói a persona dinâmica baseada em múltiplos fatores."""
-        dynamic_instructions = f"""
-        {Persona.MYLLE_BASE}
+    TURN_TEMPLATE = """
+    {dynamic_persona}
 
-        [ESTADO ATUAL]
-        {persona}
-        {humor}
-        Estado emocional do usuário: {emotional_state}
+    {conversation_context}
 
-        [INFORMAÇÕES DO USUÁRIO]
-        """
+    Última mensagem do cliente: "{user_input}"
+
+    [NESTA RESPOSTA]
+    - {cta_instruction}
+    - {audio_instruction}
+    """
+
+    @staticmethod
+    def get_dynamic_persona(persona: str, humor: str, emotional_state: str, user_profile: Dict,
+                            mood: Optional[Dict] = None) -> str:
+        """Constrói o bloco dinâmico da persona (a parte fixa vai no systemInstruction)."""
+        user_info = []
+        if mood and mood["message_count"] > 1:
+            user_info.append(f"Humor ao longo da conversa: {mood['label']} ({mood['trend']})")
         
         if user_profile:
             if user_profile.get('name'):
-                dynamic_instructions += f"Nome: {user_profile['name']} (use o nome dele ocasionalmente para criar intimidade)\n"
+                user_info.append(f"Nome: {user_profile['name']} (use o nome dele ocasionalmente para criar intimidade)")
             if user_profile.get('location'):
-                dynamic_instructions += f"Localização: {user_profile['location']} (faça referências regionais quando apropriado)\n"
-        
-        dynamic_instructions += """
-        [INSTRUÇÕES ESPECÍFICAS PARA ESTA RESPOSTA]
-        - Adapte seu tom ao estado emocional do usuário
-        - Se ele estiver triste/negativo, seja mais carinhosa e empática
-        - Se ele estiver feliz/positivo, seja mais brincalhona e provocante
-        - Use as informações do perfil para personalizar a resposta
-        - Mantenha a resposta curta (máximo 2-3 frases)
-        - Inclua uma pergunta ou provocação para manter o engajamento
-        """
+                user_info.append(f"Localização: {user_profile['location']} (faça referências regionais quando apropriado)")
         
-        return dynamic_instructions
+        return get_prompt_templates().state.render(
+            persona=persona, humor=humor, emotional_state=emotional_state,
+            user_info="\n".join(user_info) or "Nada conhecido ainda",
+        )
+
+class PromptTemplate:
+    """Template compilado uma vez: trechos fixos já formatados + slots preenchidos a cada turno."""
+    def __init__(self, template: str, **static_slots):
+        self.pieces: List[Tuple[str, Optional[str]]] = []
+        literal = []
+        for text, field, _, _ in string.Formatter().parse(textwrap.dedent(template).strip()):
+            literal.append(text)
+            if field is None:
+                continue
+            if field in static_slots:
+                literal.append(str(static_slots[field]))
+                continue
+            self.pieces.append(("".join(literal), field))
+            literal = []
+        self.pieces.append(("".join(literal), None))
+        self.slots = frozenset(field for _, field in self.pieces if field)
+        self.static_bytes = sum(len(text.encode("utf-8")) for text, _ in self.pieces)
+
+    @property
+    def is_static(self) -> bool:
+        return not self.slots
+
+    def render(self, **slots) -> str:
+        missing = self.slots - slots.keys()
+        if missing:
+            raise KeyError(f"Slots sem valor: {', '.join(sorted(missing))}")
+        parts = []
+        for text, field in self.pieces:
+            parts.append(text)
+            if field:
+                parts.append(str(slots[field]))
+        return "".join(parts)
+
+class PromptTemplates(NamedTuple):
+    system: str
+    state: PromptTemplate
+    turn: PromptTemplate
+
+@st.cache_resource
+def get_prompt_templates() -> PromptTemplates:
+    """Compila os templates uma vez por processo; o systemInstruction é texto fixo."""
+    system = PromptTemplate(Persona.MYLLE_BASE + Persona.RESPONSE_RULES,
+                            audio_keys=", ".join(sorted(Config.AUDIOS)))
+    if not system.is_static:
+        raise ValueError(f"systemInstruction com slots dinâmicos: {sorted(system.slots)}")
+    return PromptTemplates(system.render(), PromptTemplate(Persona.STATE_TEMPLATE),
+                           PromptTemplate(Persona.TURN_TEMPLATE))
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa local de tokens (~4 caracteres por token em português)."""
+    return (len(text) + 3) // 4
+
+class PromptStats:
+    """Bytes e tokens de entrada por requisição ao Gemini (estimados e reportados pela API)."""
+    TOKEN_BUCKETS = (64, 128, 256, 384, 512, 768, 1024, 1536, 2048, 4096)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.system_bytes = 0
+        self.turn_bytes = 0
+        self.estimated_tokens = 0
+        self.reported_tokens = 0
+        self.reported_requests = 0
+        # Distribuição do tamanho do prompt (tokens estimados do turno e do contexto,
+        # e tokens de entrada totais reportados pela API)
+        self.turn_tokens_hist = Histogram(self.TOKEN_BUCKETS)
+        self.context_tokens_hist = Histogram(self.TOKEN_BUCKETS)
+        self.input_tokens_hist = Histogram(self.TOKEN_BUCKETS)
+
+    def record(self, system_bytes: int, turn_bytes: int, estimated_tokens: int,
+               reported_tokens: Optional[int] = None, turn_tokens: int = 0, context_tokens: int = 0) -> None:
+        with self._lock:
+            self.requests += 1
+            self.system_bytes += system_bytes
+            self.turn_bytes += turn_bytes
+            self.estimated_tokens += estimated_tokens
+            if reported_tokens:
+                self.reported_tokens += reported_tokens
+                self.reported_requests += 1
+        self.turn_tokens_hist.observe(turn_tokens)
+        self.context_tokens_hist.observe(context_tokens)
+        self.input_tokens_hist.observe(reported_tokens or estimated_tokens)
+        if self.requests % 50 == 0:
+            logger.info(f"Tamanho do prompt ({self.requests} req): contexto p50/p95 "
+                        f"{self.context_tokens_hist.quantile(0.5)}/{self.context_tokens_hist.quantile(0.95)} tokens, "
+                        f"entrada p50/p95 {self.input_tokens_hist.quantile(0.5)}/{self.input_tokens_hist.quantile(0.95)} tokens")
+
+    def stats(self) -> Dict:
+        n = self.requests or 1
+        return {
+            "requests": self.requests,
+            "avg_system_bytes": self.system_bytes / n,
+            "avg_turn_bytes": self.turn_bytes / n,
+            "avg_estimated_tokens": self.estimated_tokens / n,
+            "avg_input_tokens": self.reported_tokens / self.reported_requests if self.reported_requests else 0.0,
+            "turn_tokens": self.turn_tokens_hist.snapshot(),
+            "context_tokens": self.context_tokens_hist.snapshot(),
+            "input_tokens": self.input_tokens_hist.snapshot(),
+        }
+
+@st.cache_resource
+def get_prompt_stats() -> PromptStats:
+    """Estatísticas de prompt compartilhadas pelo processo."""
+    return PromptStats()
 
 class CTAEngine:
     """Motor de Call-to-Action inteligente e contextual."""
-    def __init__(self):
-        self.learning_engine = LearningEngine()
+    # Palavras que indicam interesse sexual/compra ("*" = radical)
+    HOT_WORDS = [
+        "buceta", "peito*", "fuder", "gozar", "gostosa", "delicia", "molhad*", "xereca", 
+        "pau", "piroca", "transar", "foto*", "video*", "mostra", "ver", "quero", "tesão", 
+        "foda", "nude*", "seios", "bunda", "rabuda", "gata", "pack*", 
+        "conteúdo*", "comprar", "quanto", "valor", "preço", "custa", "safada", "tarada"
+    ]
+    
+    # Perguntas diretas sobre compra/acesso
+    DIRECT_ASKS = [
+        "mostra", "quero ver", "me manda", "como assinar", "como comprar", 
+        "como ter acesso", "onde vejo", "quero comprar", "quero conteúdo", 
+        "quanto custa", "qual valor", "mostra mais", "me mostra", "tem desconto"
+    ]
+
+    def __init__(self, state: Optional[Dict] = None, learning_engine: Optional["LearningEngine"] = None):
+        self._state = state
+        self.learning_engine = learning_engine or LearningEngine()
         self.cta_priority = {
             "offers": 3,    # Alta prioridade (venda)
             "gallery": 2,   # Média prioridade (engajamento)
             "social": 1     # Baixa prioridade (redes sociais)
         }
+
+    @property
+    def state(self):
+        """Estado da conversa: o session_state do Streamlit ou o dict da API headless."""
+        return st.session_state if self._state is None else self._state
     
     def should_show_cta(self, conversation_history: List[Dict], user_emotional_state: str, cta_type: str = "offers") -> bool:
         """Decide se deve mostrar um CTA baseado no contexto emocional e da conversa."""
@@ -591,41 +1839,20 @@ class CTAEngine:
             return False
 
         # Verificar se já mostrou um CTA recentemente
-        if 'last_cta_time' in st.session_state:
-            elapsed = time.time() - st.session_state.last_cta_time
+        if 'last_cta_time' in self.state:
+            elapsed = time.time() - self.state['last_cta_time']
             if elapsed < 90:  # Reduzido para ser mais agressivo
                 return False
 
-        # Análise do contexto da conversa
-        last_msgs = []
-        for msg in conversation_history[-6:]:
-            content = msg["content"]
-            if content.startswith('{"text"'):
-                try:
-                    content = json.loads(content).get("text", content)
-                except:
-                    pass
-            last_msgs.append(f"{msg['role']}: {content.lower()}")
-        
-        context = " ".join(last_msgs)
+        # Análise incremental do contexto: só as mensagens novas passam pelo matcher
+        window = self.state.get('cta_window')
+        if window is None:
+            window = self.state['cta_window'] = CTAWindow()
+        hot_matcher, ask_matcher = get_cta_matchers()
+        window.sync(conversation_history, hot_matcher, ask_matcher)
         
-        # Palavras que indicam interesse sexual/compra
-        hot_words = [
-            "buceta", "peito", "fuder", "gozar", "gostosa", "delicia", "molhad", "xereca", 
-            "pau", "piroca", "transar", "foto", "video", "mostra", "ver", "quero", "tesão", 
-            "molhada", "foda", "nude", "seios", "bunda", "rabuda", "gata", "pack", 
-            "conteúdo", "comprar", "quanto", "valor", "preço", "custa", "safada", "tarada"
-        ]
-        
-        # Perguntas diretas sobre compra/acesso
-        direct_asks = [
-            "mostra", "quero ver", "me manda", "como assinar", "como comprar", 
-            "como ter acesso", "onde vejo", "quero comprar", "quero conteúdo", 
-            "quanto custa", "qual valor", "mostra mais", "me mostra", "tem desconto"
-        ]
-        
-        hot_count = sum(1 for word in hot_words if word in context)
-        has_direct_ask = any(ask in context for ask in direct_asks)
+        hot_count = window.hot_count
+        has_direct_ask = window.has_direct_ask
         
         # Lógica de decisão mais inteligente
         if user_emotional_state in ["Muito Positivo", "Positivo"] and (hot_count >= 2 or has_direct_ask):
@@ -637,15 +1864,19 @@ class CTAEngine:
         
         return False
 
+    def mark_cta_shown(self) -> None:
+        """Registra o CTA exibido agora; o próximo espera a pausa de `should_show_cta`."""
+        self.state['last_cta_time'] = time.time()
+
     def should_show_preview(self) -> bool:
         """Decide se deve mostrar uma prévia."""
-        if 'preview_shown' in st.session_state and st.session_state.preview_shown:
+        if self.state.get('preview_shown'):
             return False
             
         # Aumenta a chance se o usuário está engajado
-        chance = 0.35 if len(st.session_state.get('messages', [])) > 5 else 0.25
+        chance = 0.35 if len(self.state.get('messages', [])) > 5 else 0.25
         if random.random() < chance:
-            st.session_state.preview_shown = True
+            self.state['preview_shown'] = True
             return True
         return False
 
@@ -656,11 +1887,11 @@ class CTAEngine:
             return True
         
         # Usar áudio em momentos estratégicos
-        if 'audio_count' not in st.session_state:
-            st.session_state.audio_count = 0
+        if 'audio_count' not in self.state:
+            self.state['audio_count'] = 0
             
         # Aumentar chance de áudio se o usuário está muito engajado
-        base_chance = 0.20 if len(st.session_state.get('messages', [])) > 8 else 0.15
+        base_chance = 0.20 if len(self.state.get('messages', [])) > 8 else 0.15
         
         # Aumentar chance para certas palavras-chave
         audio_triggers = ["amostra", "gratis", "nua", "fake", "real", "voz"]
@@ -669,13 +1900,71 @@ class CTAEngine:
             
         return random.random() < base_chance
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Sessão HTTP do processo: conexões TLS com o Gemini reaproveitadas (keep-alive)."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=Config.HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_fake_detector() -> FakeQuestionDetector:
+    """Detector de fake compilado uma vez por processo."""
+    return FakeQuestionDetector.from_config()
+
+@st.cache_resource
+def get_response_cache() -> Optional[SemanticResponseCache]:
+    """Cache semântico de respostas compartilhado entre usuários (None se desativado)."""
+    if Config.RESPONSE_CACHE_THRESHOLD <= 0:
+        return None
+    cache = SemanticResponseCache(threshold=Config.RESPONSE_CACHE_THRESHOLD,
+                                  sample_rate=Config.RESPONSE_CACHE_SAMPLE_RATE)
+    if Config.RESPONSE_CACHE_SAMPLES_FILE:
+        cache.add_quality_hook(jsonl_quality_hook(Config.RESPONSE_CACHE_SAMPLES_FILE))
+    return cache
+
+def pick_pool_response(user_id: str, intent: str, persona: Optional[str] = None, humor: Optional[str] = None,
+                       learning_engine: Optional["LearningEngine"] = None) -> Optional[Dict]:
+    """Próxima resposta pré-gerada do pool (persona, humor, intenção), sem repetir para o usuário."""
+    pools = get_response_pools()
+    if pools is None:
+        return None
+    if persona is None or humor is None:
+        persona, humor = DynamicPersonality.get_current_persona()
+    key = pool_key(*DynamicPersonality.keys_for(persona, humor), intent)
+    if not pools.size(key):
+        return None
+    try:
+        position = (learning_engine or LearningEngine()).next_pool_position(user_id, key, pools.version)
+    except sqlite3.Error as e:
+        logger.warning(f"Posição do pool indisponível ({key}): {e}")
+        return None
+    return pools.pick(key, user_id, position)
+
+@st.cache_resource
+def get_intent_decision_log() -> DecisionLog:
+    """Log de decisões do classificador de intenção (para revisão e retreino)."""
+    return DecisionLog()
+
+@st.cache_resource
+def get_cta_matchers() -> Tuple[KeywordMatcher, KeywordMatcher]:
+    """Matchers de palavras quentes e pedidos diretos, compilados uma vez por processo."""
+    return KeywordMatcher(CTAEngine.HOT_WORDS), KeywordMatcher(CTAEngine.DIRECT_ASKS)
+
 # ======================
 # SERVIÇOS DE BANCO DE DADOS (Melhorados)
 # ======================
+@st.cache_resource
+def get_chat_db_pool() -> SQLitePool:
+    """Conexões do chat_history.db reaproveitadas entre sessões e reruns."""
+    return SQLitePool(DatabaseService.init_db, Config.DB_POOL_SIZE)
+
 class DatabaseService:
     @staticmethod
     def init_db() -> sqlite3.Connection:
-        conn = sqlite3.connect('chat_history.db', check_same_thread=False)
+        conn = sqlite3.connect('chat_history.db', timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")  # vários workers gravando no mesmo arquivo
         c = conn.cursor()
         c.execute('''CREATE TABLE IF NOT EXISTS conversations
                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -698,9 +1987,25 @@ class DatabaseService:
                 INSERT INTO conversations (user_id, session_id, timestamp, role, content, sentiment_polarity, sentiment_label)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (user_id, session_id, datetime.now(), role, content, sentiment_polarity, sentiment_label))
-            conn.commit()
+            timed_commit(conn, "chat")
         except sqlite3.Error as e:
             logger.error(f"Erro ao salvar mensagem: {e}")
+            return
+        try:
+            get_memory_index().add(user_id, session_id, role, content)
+        except OSError as e:
+            logger.warning(f"Erro ao indexar mensagem na memória: {e}")
+
+    @staticmethod
+    def count_messages(conn: sqlite3.Connection, user_id: str, session_id: str) -> int:
+        """Total de mensagens da sessão no banco (as carregadas são só as últimas)."""
+        try:
+            row = conn.execute("SELECT COUNT(*) FROM conversations WHERE user_id = ? AND session_id = ?",
+                               (user_id, session_id)).fetchone()
+            return row[0]
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao contar mensagens: {e}")
+            return 0
 
     @staticmethod
     def load_messages(conn: sqlite3.Connection, user_id: str, session_id: str, limit: int = 50) -> List[Dict]:
@@ -738,79 +2043,326 @@ class DatabaseService:
         except sqlite3.Error as e:
             logger.error(f"Erro ao limpar mensagens antigas: {e}")
 
+# ======================
+# RESUMO DA CONVERSA (fora do caminho da resposta)
+# ======================
+class ConversationSummarizer:
+    """Resumo contínuo, por sessão, das mensagens que saíram da janela de contexto.
+
+    O resumo é refeito em segundo plano; o turno atual usa o resumo que já
+    estiver pronto e nunca espera pela API. As posições são contadas desde o
+    início da conversa: quem só guarda as últimas mensagens informa quantas
+    cortou (`offset`).
+    """
+    SUMMARY_PROMPT = textwrap.dedent("""
+        Resuma em português, em no máximo 60 palavras, o que importa lembrar desta conversa
+        entre a Mylle e um cliente: fatos sobre o cliente (nome, cidade, gostos), o que ele
+        pediu ou recusou, e em que ponto da venda a conversa está. Responda só com o resumo.
+
+        Resumo anterior: {previous}
+
+        Novas mensagens:
+        {messages}
+    """).strip()
+
+    def __init__(self, max_workers: int = 2, max_sessions: int = Config.SUMMARY_MAX_SESSIONS):
+        from concurrent.futures import ThreadPoolExecutor
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mylle-summary")
+        self._lock = threading.Lock()
+        self.max_sessions = max_sessions
+        # sessão -> (mensagens cobertas, resumo); as sessões menos usadas saem primeiro
+        self._summaries: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._pending: Set[str] = set()
+        self.refreshes = 0
+        self.failures = 0
+
+    def get(self, session_id: str, history_len: int) -> Tuple[int, str]:
+        """Resumo atual e quantas mensagens do início da conversa ele cobre."""
+        with self._lock:
+            covered, summary = self._summaries.get(session_id, (0, ""))
+            if session_id in self._summaries:
+                self._summaries.move_to_end(session_id)
+        if covered > history_len:  # histórico reiniciado (nova conversa)
+            return 0, ""
+        return covered, summary
+
+    def schedule(self, session_id: str, history: List[Dict], folded_until: int, offset: int = 0) -> None:
+        """Agenda a atualização quando houver mensagens suficientes fora da janela.
+
+        `history` são as mensagens a partir da posição `offset` da conversa e
+        `folded_until` é relativo a ela.
+        """
+        covered, previous = self.get(session_id, offset + len(history))
+        folded_until += offset
+        if folded_until - covered < Config.SUMMARY_REFRESH_MIN:
+            return
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        new_messages = [dict(m) for m in history[max(0, covered - offset):folded_until - offset]]
+        self._executor.submit(self._refresh, session_id, previous, new_messages, folded_until)
+
+    def _refresh(self, session_id: str, previous: str, messages: List[Dict], folded_until: int) -> None:
+        try:
+            lines = "\n".join(
+                f"{'Cliente' if m['role'] == 'user' else 'Mylle'}: {extract_message_text(m['content'])}"
+                for m in messages
+            )
+            try:
+                summary = self._summarize_remote(previous, lines)
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Resumo via API falhou, usando resumo local: {e}")
+                summary = self._summarize_local(previous, messages)
+            with self._lock:
+                self._summaries[session_id] = (folded_until, summary)
+                self._summaries.move_to_end(session_id)
+                if len(self._summaries) > self.max_sessions:
+                    self._summaries.popitem(last=False)
+                self.refreshes += 1
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
+
+    def _summarize_remote(self, previous: str, lines: str) -> str:
+        data = {
+            "contents": [{"role": "user", "parts": [{"text": self.SUMMARY_PROMPT.format(
+                previous=previous or "nenhum", messages=lines)}]}],
+            "generationConfig": {"temperature": 0.2, "maxOutputTokens": Config.SUMMARY_TOKEN_BUDGET},
+        }
+        response = get_http_session().post(Config.API_URL, json=data, timeout=Config.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        text = response.json()["candidates"][0]["content"]["parts"][0]["text"].strip()
+        if not text:
+            raise ValueError("resumo vazio")
+        return text
+
+    @staticmethod
+    def _summarize_local(previous: str, messages: List[Dict]) -> str:
+        """Resumo extrativo: mensagens do cliente mais recentes que cabem no orçamento."""
+        budget = Config.SUMMARY_TOKEN_BUDGET * 4
+        parts = [previous] if previous else []
+        user_lines = [extract_message_text(m["content"]) for m in messages if m["role"] == "user"]
+        summary = " ".join(parts + [f"Cliente disse: {'; '.join(user_lines)}"])
+        if len(summary) > budget:
+            summary = "…" + summary[-budget:].split(" ", 1)[-1]
+        return summary
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"sessions": len(self._summaries), "pending": len(self._pending),
+                    "refreshes": self.refreshes, "failures": self.failures}
+
+@st.cache_resource
+def get_conversation_summarizer() -> ConversationSummarizer:
+    """Resumidor compartilhado pelo processo (pool de threads próprio)."""
+    return ConversationSummarizer()
+
 # ======================
 # SERVIÇOS DE API (Ultra Melhorados)
 # ======================
 class ApiService:
-    def __init__(self):
-        self.cta_engine = CTAEngine()
-        self.learning_engine = LearningEngine()
+    FAKE_RESPONSES = [
+        {
+            "text": "Não sou fake não, amor! Ouça minha voz... 😘",
+            "audio": "nao_sou_fake_nao",
+            "cta": {"show": False}
+        },
+        {
+            "text": "Sério que você tá duvidando de mim? 😤 Escuta minha voz e vê se sou robô...",
+            "audio": "nao_sou_fake_nao", 
+            "cta": {"show": False}
+        },
+        {
+            "text": "Ai que ofensa! 😢 Sou real sim, escuta aqui...",
+            "audio": "nao_sou_fake_nao",
+            "cta": {"show": False}
+        }
+    ]
+
+    # Respostas prontas para as intenções comuns (classificador local)
+    INTENT_RESPONSES = {
+        "saudacao": [
+            {"text": "Oi amor! Tudo bem com você? 😘", "audio": "oi_meu_amor_tudo_bem", "cta": {"show": False}},
+            {"text": "Oiii gato, que bom que apareceu... tudo bem contigo? 😏", "cta": {"show": False}},
+            {"text": "Oi delícia! Me conta, o que você tá aprontando hoje? 🔥", "cta": {"show": False}},
+            {"text": "Hmm, olha quem chegou... oi meu bem 😈", "cta": {"show": False}},
+        ],
+        "preco": [
+            {"text": "Meus packs começam bem acessíveis, amor... dá uma olhada nas opções que separei pra você 😏",
+             "cta": {"show": True, "label": "🎁 Ver Packs VIP", "target": "offers"}},
+            {"text": "Tenho três packs, cada um mais quente que o outro 🔥 Vem ver os valores e escolhe o seu",
+             "audio": "eu_tenho_uns_conteudos_que_vai_amar",
+             "cta": {"show": True, "label": "💰 Ver Valores", "target": "offers"}},
+            {"text": "Hoje tá com desconto especial, amor... mas só até acabar as vagas 😈",
+             "cta": {"show": True, "label": "🔥 Aproveitar Desconto", "target": "offers"}},
+        ],
+        "amostra": [
+            {"text": "Claro que tenho um gostinho pra você, amor... dá uma espiada 😘", "audio": "claro_tenho_amostra_gratis",
+             "cta": {"show": True, "label": "📸 Ver Amostras", "target": "gallery"}},
+            {"text": "Separei umas prévias só pra você... depois me diz o que achou 😏", "audio": "o_que_achou_amostras",
+             "cta": {"show": True, "label": "👀 Ver Prévias", "target": "gallery"}},
+            {"text": "Um pouquinho eu mostro... o resto é só pra quem é VIP 😈",
+             "cta": {"show": True, "label": "📸 Galeria", "target": "gallery"}},
+        ],
+    }
+    # Variantes sem botão para quando o CTAEngine segura o CTA: o texto não pode
+    # mandar o cliente "ver" ou "dar uma olhada" em algo que não aparece
+    INTENT_RESPONSES_NO_CTA = {
+        "preco": [
+            {"text": "Tenho três packs, do mais levinho ao mais ousado... qual estilo te chama mais, amor? 😏",
+             "cta": {"show": False}},
+            {"text": "Meus packs são bem acessíveis, gato... mas antes me conta o que você mais gosta 🔥",
+             "cta": {"show": False}},
+            {"text": "Tem pack pra todo gosto e todo bolso... me fala o que você curte que eu te digo qual combina 😘",
+             "cta": {"show": False}},
+        ],
+        "amostra": [
+            {"text": "Amostra eu tenho sim, amor... mas primeiro me conta o que você quer ver 😏",
+             "cta": {"show": False}},
+            {"text": "Um gostinho eu até mostro... mas só pra quem conversa comigo direitinho 😘",
+             "cta": {"show": False}},
+            {"text": "Tenho umas prévias guardadas, gato... me diz do que você gosta que eu escolho a certa 🔥",
+             "cta": {"show": False}},
+        ],
+    }
+
+    # Mapeamento contextual de áudios
+    CONTEXTUAL_AUDIOS = {
+        ("amostra", "gratis", "grátis", "sample", "free"): "claro_tenho_amostra_gratis",
+        ("oi", "olá", "hello", "hey"): "oi_meu_amor_tudo_bem",
+        ("nua", "nude", "pelada"): "ver_nua_tem_que_comprar",
+        ("rosinha", "rosa", "buceta"): "imagina_ela_bem_rosinha",
+        ("fake", "falsa", "bot", "robô"): "nao_sou_fake_nao",
+        ("esperando", "demora", "cadê"): "vida_to_esperando_voce_me_responder_gatinho"
+    }
+
+    # Rótulos do classificador de intenção com outro nome nas AUDIO_TAGS
+    AUDIO_INTENTS = {"preco": "venda"}
+
+    def __init__(self, state: Optional[Dict] = None, learning_engine: Optional[LearningEngine] = None):
+        self.last_call_from_api = False
+        self.response_source = "fallback"
+        self.context_personalized = False
+        self.turn_intent: Optional[str] = None
+        self.trace: Optional[TurnTrace] = None
+        self._state = state
+        self.learning_engine = learning_engine or LearningEngine()
+        self.cta_engine = CTAEngine(state, self.learning_engine)
         self.emotional_ai = EmotionalIntelligence()
         self.personality = DynamicPersonality()
         self.timing = RealisticTiming()
     
-    def get_intelligent_response(self, user_input: str, user_id: str, conversation_history: List[Dict]) -> Dict:
+    @property
+    def state(self):
+        """Estado da conversa: o session_state do Streamlit ou o dict da API headless."""
+        return st.session_state if self._state is None else self._state
+
+    def get_intelligent_response(self, user_input: str, user_id: str, conversation_history: List[Dict],
+                                 sentiment: Optional[SentimentResult] = None,
+                                 trace: Optional[TurnTrace] = None) -> Dict:
         """Gera uma resposta inteligente usando todos os sistemas de humanização."""
+        # Sem trace do ChatService, o turno é medido e fechado aqui mesmo
+        owns_trace = trace is None
+        self.trace = trace or TurnTrace()
+        try:
+            return self._run_pipeline(user_input, user_id, conversation_history, sentiment)
+        finally:
+            if owns_trace:
+                self.trace.finish()
+
+    def _run_pipeline(self, user_input: str, user_id: str, conversation_history: List[Dict],
+                      sentiment: Optional[SentimentResult]) -> Dict:
+        trace = self.trace
+        self.turn_intent = None
         
-        # 1. Análise emocional do input do usuário
-        polarity, subjectivity = self.emotional_ai.analyze_sentiment(user_input)
-        emotional_state = self.emotional_ai.get_emotional_state(polarity)
+        # 1. Análise emocional do input do usuário (reaproveita a do ChatService quando disponível)
+        with trace.span("1_sentimento"):
+            if sentiment is None:
+                sentiment = self.emotional_ai.analyze(user_input)
+            polarity, subjectivity, emotional_state = sentiment
         
         # 2. Salvar estado emocional
-        self.learning_engine.save_emotional_state(user_id, emotional_state, polarity, subjectivity)
+        with trace.span("2_estado_emocional"):
+            self.learning_engine.save_emotional_state(user_id, emotional_state, polarity, subjectivity)
         
         # 3. Extrair e salvar informações do usuário
-        self.learning_engine.extract_and_save_info(user_id, user_input)
+        with trace.span("3_extracao_info"):
+            self.learning_engine.extract_and_save_info(user_id, user_input)
         
-        # 4. Obter perfil e preferências do usuário
-        user_profile = self.learning_engine.get_user_profile(user_id) or {}
-        user_preferences = self.learning_engine.get_user_preferences(user_id)
+        # 4. Obter perfil, preferências e tendência emocional do usuário
+        with trace.span("4_perfil_memoria"):
+            user_profile = self.learning_engine.get_user_profile(user_id) or {}
+            user_preferences = self.learning_engine.get_user_preferences(user_id)
+            mood = self.learning_engine.get_mood(user_id)
+            memories = get_memory_index().search(user_id, user_input, Config.MEMORY_TOP_K,
+                                                 exclude_session=self.state.get("session_id"))
         
         # 5. Obter persona e humor dinâmicos
-        persona, humor = self.personality.get_current_persona()
+        with trace.span("5_persona"):
+            persona, humor = self.personality.get_current_persona()
         
         # 6. Verificar se é pergunta sobre autenticidade
-        fake_probability = detect_fake_question(user_input)
+        with trace.span("6_fake"):
+            fake_probability = detect_fake_question(user_input)
         if fake_probability > 0.7:
+            self.response_source = "fake"
+            get_metrics().responses.inc(source="fake")
             return self._handle_fake_question(fake_probability)
         
+        # 6b. Intenção comum com alta confiança: resposta pronta, sem chamar o Gemini
+        with trace.span("6b_intencao_local"):
+            local_response = self._answer_locally(user_input, user_id, conversation_history, persona, humor,
+                                                  emotional_state)
+        if local_response:
+            self.response_source = "local"
+            get_metrics().responses.inc(source="local")
+            with trace.span("11_pos_processamento"):
+                return self._post_process_response(local_response, user_input, should_use_audio=False)
+        
         # 7. Construir prompt dinâmico
-        dynamic_persona = Persona.get_dynamic_persona(persona, humor, emotional_state, user_profile)
+        with trace.span("7_prompt"):
+            dynamic_persona = Persona.get_dynamic_persona(persona, humor, emotional_state, user_profile, mood)
         
         # 8. Preparar contexto da conversa
-        conversation_context = self._format_conversation_context(conversation_history, user_preferences)
+        with trace.span("8_contexto"):
+            session_id = self.state.get("session_id")
+            conversation_context = self._format_conversation_context(
+                conversation_history, user_preferences, f"{user_id}:{session_id}" if session_id else None, memories)
         
         # 9. Decidir sobre CTA e áudio
-        should_show_cta = self.cta_engine.should_show_cta(conversation_history, emotional_state)
-        should_use_audio = self.cta_engine.should_use_audio(user_input, fake_probability)
+        with trace.span("9_cta_audio"):
+            should_show_cta = self.cta_engine.should_show_cta(conversation_history, emotional_state)
+            should_use_audio = self.cta_engine.should_use_audio(user_input, fake_probability)
         
-        # 10. Chamar API do Gemini
-        response = self._call_gemini_api(dynamic_persona, conversation_context, user_input, should_show_cta, should_use_audio)
+        # 10. Chamar API do Gemini (ou reaproveitar a resposta de uma mensagem quase igual)
+        with trace.span("10_resposta"):
+            cache = get_response_cache()
+            cache_scope = (persona.split(':')[0], conversation_stage(len(conversation_history)),
+                           should_show_cta, should_use_audio)
+            response = cache.lookup(user_input, cache_scope) if cache else None
+            if response:
+                logger.debug("Resposta reaproveitada do cache semântico (%s)", cache_scope[1])
+                self._simulate_typing()
+                self.response_source = "cache"
+            else:
+                response = self._call_gemini_api(dynamic_persona, conversation_context, user_input, should_show_cta, should_use_audio)
+                if (cache and self.last_call_from_api and not self.context_personalized
+                        and self._is_generic(response, user_profile)):
+                    cache.store(user_input, cache_scope, response)
+        
+        get_metrics().responses.inc(source=self.response_source)
         
         # 11. Pós-processamento da resposta
-        response = self._post_process_response(response, user_input, should_use_audio)
+        with trace.span("11_pos_processamento"):
+            response = self._post_process_response(response, user_input, should_use_audio)
         
         return response
 
     def _handle_fake_question(self, fake_probability: float) -> Dict:
         """Lida com perguntas sobre autenticidade de forma mais humana."""
-        responses = [
-            {
-                "text": "Não sou fake não, amor! Ouça minha voz... 😘",
-                "audio": "nao_sou_fake_nao",
-                "cta": {"show": False}
-            },
-            {
-                "text": "Sério que você tá duvidando de mim? 😤 Escuta minha voz e vê se sou robô...",
-                "audio": "nao_sou_fake_nao", 
-                "cta": {"show": False}
-            },
-            {
-                "text": "Ai que ofensa! 😢 Sou real sim, escuta aqui...",
-                "audio": "nao_sou_fake_nao",
-                "cta": {"show": False}
-            }
-        ]
+        responses = [dict(r) for r in self.FAKE_RESPONSES]
         
         # Escolher resposta baseada na intensidade da dúvida
         if fake_probability > 0.9:
@@ -820,62 +2372,182 @@ class ApiService:
         else:
             return responses[0]  # Padrão
 
-    def _format_conversation_context(self, conversation_history: List[Dict], user_preferences: Dict) -> str:
-        """Formata o contexto da conversa incluindo preferências do usuário."""
-        context = "Histórico da conversa:\n"
+    def _answer_locally(self, user_input: str, user_id: str, conversation_history: List[Dict],
+                        persona: str, humor: str, emotional_state: str = "Neutro") -> Optional[Dict]:
+        """Classifica a intenção localmente e responde do pool quando a confiança é alta.
+
+        O CTA das respostas prontas passa pelo `CTAEngine`, como o do Gemini:
+        fora da pausa e com sinais de interesse; senão a resposta sai das
+        variantes sem botão da intenção.
+        """
+        model = get_intent_model()
+        if model is None:
+            return None
+        decision = model.predict(user_input)
+        self.turn_intent = decision.intent
+        response = None
+        if (decision.confidence >= Config.INTENT_CONFIDENCE
+                and model.covers(user_input, decision, Config.INTENT_MAX_EXTRA_WORDS)):
+            if decision.intent == "fake":
+                response = self._handle_fake_question(decision.confidence)
+            elif decision.intent in self.INTENT_RESPONSES:
+                response = pick_pool_response(user_id, decision.intent, persona, humor, self.learning_engine)
+            if response is None and decision.intent in self.INTENT_RESPONSES:
+                # Sem pool gerado
+                response = self._pick_unrepeated(self.INTENT_RESPONSES[decision.intent], conversation_history)
+        if response and response.get("cta", {}).get("show"):
+            if self.cta_engine.should_show_cta(conversation_history, emotional_state,
+                                               response["cta"].get("target", "offers")):
+                self.cta_engine.mark_cta_shown()
+            elif decision.intent in self.INTENT_RESPONSES_NO_CTA:
+                response = self._pick_unrepeated(self.INTENT_RESPONSES_NO_CTA[decision.intent], conversation_history)
+            else:
+                response = None  # o texto pronto depende do botão: o Gemini responde
+        get_intent_decision_log().write(user_input, decision, response is not None)
+        logger.debug("Intenção: %s (%.2f) -> %s", decision.intent, decision.confidence,
+                     "resposta local" if response else "Gemini")
+        if response:
+            self._simulate_typing()
+        return response
+
+    @staticmethod
+    def _pick_unrepeated(options: List[Dict], conversation_history: List[Dict]) -> Dict:
+        """Cópia de uma resposta pronta que ainda não apareceu nas últimas mensagens da conversa."""
+        recent = {extract_message_text(m["content"]) for m in conversation_history[-20:] if m["role"] == "assistant"}
+        pool = [r for r in options if r["text"] not in recent]
+        return json.loads(json.dumps(random.choice(pool or options)))
+
+    def _typing_status(self):
+        """Mostra "visualizado" e "digitando"; o container fica até a resposta ocupar a tela."""
+        status_container = st.empty()
+        self._show_status_effect(status_container, "viewed")
+        self._show_status_effect(status_container, "typing")
+        return status_container
+
+    def _typing_pause(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def _simulate_typing(self) -> None:
+        """Efeito de "visualizado"/"digitando" para respostas que não passam pelo Gemini."""
+        self._typing_status().empty()
+
+    @staticmethod
+    def _is_generic(response: Dict, user_profile: Dict) -> bool:
+        """Só respostas sem dados do usuário (nome, cidade) podem ser reaproveitadas por outros."""
+        text = response.get("text", "").lower()
+        return bool(text) and not any(
+            str(user_profile.get(field) or "").lower() in text
+            for field in ("name", "location") if user_profile.get(field)
+        )
+
+    def _format_conversation_context(self, conversation_history: List[Dict], user_preferences: Dict,
+                                     session_id: Optional[str] = None,
+                                     memories: Optional[List[Dict]] = None) -> str:
+        """Monta o contexto dentro de Config.CONTEXT_TOKEN_BUDGET.
+
+        Preferências fortes, lembranças de conversas anteriores e o resumo das
+        mensagens antigas entram primeiro (cada um com teto próprio); o restante
+        do orçamento é preenchido com as mensagens mais recentes. O que fica de
+        fora é resumido em segundo plano para os próximos turnos; enquanto o
+        resumo não fica pronto, as mensagens que ele ainda não cobre continuam
+        no contexto.
+        """
+        budget = Config.CONTEXT_TOKEN_BUDGET
         
-        # Últimas 8 mensagens para contexto
-        for msg in conversation_history[-8:]:
-            role = "Cliente" if msg["role"] == "user" else "Mylle"
-            content = msg["content"]
-            if content.startswith('{"text"'):
-                try:
-                    content = json.loads(content).get("text", content)
-                except:
-                    pass
-            context += f"{role}: {content}\n"
+        # Preferências conhecidas (apenas as fortes, mais fortes primeiro)
+        preference_block = ""
+        strong = sorted(
+            ((strength, pref_type, pref) for pref_type, prefs in (user_preferences or {}).items()
+             for pref, strength in prefs.items() if strength > 0.5),
+            reverse=True,
+        )
+        if strong:
+            lines = ["\nPreferências conhecidas do usuário:"]
+            used = estimate_tokens(lines[0])
+            for _, pref_type, pref in strong:
+                line = f"- {pref_type}: {pref}"
+                used += estimate_tokens(line)
+                if used > Config.CONTEXT_PREFERENCE_TOKENS:
+                    break
+                lines.append(line)
+            if len(lines) > 1:
+                preference_block = "\n".join(lines) + "\n"
+        
+        # Lembranças relevantes de conversas anteriores (índice BM25 do usuário)
+        memory_block = ""
+        if memories:
+            lines = ["Lembranças de conversas anteriores:"]
+            used = estimate_tokens(lines[0])
+            for memory in memories:
+                line = f"- {'Cliente' if memory['role'] == 'user' else 'Mylle'}: {memory['text']}"
+                used += estimate_tokens(line)
+                if used > Config.CONTEXT_MEMORY_TOKENS:
+                    break
+                lines.append(line)
+            if len(lines) > 1:
+                memory_block = "\n".join(lines) + "\n\n"
+        
+        # Resumo das mensagens que já saíram da janela
+        summarizer = get_conversation_summarizer() if session_id else None
+        offset = self.state.get("history_offset", 0)  # mensagens do início que não estão mais na lista
+        covered, summary = summarizer.get(session_id, offset + len(conversation_history)) if summarizer else (0, "")
+        covered = max(0, covered - offset)  # posição na lista atual
+        summary_block = f"Resumo da conversa até aqui: {summary}\n\n" if summary else ""
+        # Resposta escrita com dados do usuário não vai para o cache compartilhado
+        self.context_personalized = bool(preference_block or memory_block or summary_block)
         
-        # Adicionar preferências conhecidas
-        if user_preferences:
-            context += "\nPreferências conhecidas do usuário:\n"
-            for pref_type, prefs in user_preferences.items():
-                for pref, strength in prefs.items():
-                    if strength > 0.5:  # Apenas preferências fortes
-                        context += f"- {pref_type}: {pref}\n"
+        # Mensagens mais recentes que cabem no orçamento restante
+        remaining = (budget - estimate_tokens(preference_block) - estimate_tokens(memory_block)
+                     - estimate_tokens(summary_block))
+        def format_line(msg: Dict) -> str:
+            return f"{'Cliente' if msg['role'] == 'user' else 'Mylle'}: {extract_message_text(msg['content'])}\n"
+
+        recent = []
+        for msg in reversed(conversation_history):
+            line = format_line(msg)
+            cost = estimate_tokens(line)
+            if recent and (cost > remaining or len(recent) >= Config.CONTEXT_MAX_MESSAGES):
+                break
+            recent.append(line)
+            remaining -= cost
+        folded_until = len(conversation_history) - len(recent)
+        if summarizer and folded_until > covered:
+            summarizer.schedule(session_id, conversation_history, folded_until, offset)
+            # Fora da janela mas ainda sem resumo: fica no contexto até o resumo alcançá-las
+            # (com teto, caso o resumo demore)
+            start = max(covered, folded_until - 2 * Config.SUMMARY_REFRESH_MIN)
+            recent.extend(format_line(msg) for msg in reversed(conversation_history[start:folded_until]))
         
-        return context
+        return memory_block + summary_block + "Histórico da conversa:\n" + "".join(reversed(recent)) + preference_block
 
     def _call_gemini_api(self, dynamic_persona: str, conversation_context: str, user_input: str, 
                         should_show_cta: bool, should_use_audio: bool) -> Dict:
         """Chama a API do Gemini com o prompt otimizado."""
+        self.last_call_from_api = False
+        self.response_source = "fallback"
+        metrics = get_metrics()
         
         # Simular delay de digitação humano
         typing_delay = self.timing.get_typing_delay(user_input)
         
         # Mostrar efeito de "visualizado" e "digitando"
-        status_container = st.empty()
-        self._show_status_effect(status_container, "viewed")
-        self._show_status_effect(status_container, "typing")
-        
-        # Construir prompt final
-        prompt = f"""
-        {dynamic_persona}
-        
-        {conversation_context}
-        
-        Última mensagem do cliente: "{user_input}"
+        self._typing_status()
         
-        INSTRUÇÕES ESPECÍFICAS:
-        - Responda em JSON no formato: {{"text": "sua resposta", "audio": "chave_do_audio_opcional", "cta": {{"show": true/false, "label": "texto do botão", "target": "página"}}}}
-        - Mantenha a resposta curta (máximo 2-3 frases)
-        - {"Inclua um CTA de venda se apropriado" if should_show_cta else "Não inclua CTA desta vez"}
-        - {"Considere usar um áudio para maior realismo" if should_use_audio else "Não use áudio desta vez"}
-        - Seja natural, humana e envolvente
-        - Use o nome do usuário se souber
-        """
+        # Construir prompt: parte fixa no systemInstruction, turno com os slots dinâmicos
+        templates = get_prompt_templates()
+        prompt = templates.turn.render(
+            dynamic_persona=dynamic_persona,
+            conversation_context=conversation_context,
+            user_input=user_input,
+            cta_instruction="Inclua um CTA de venda se apropriado" if should_show_cta else "Não inclua CTA desta vez",
+            audio_instruction="Considere usar um áudio para maior realismo" if should_use_audio else "Não use áudio desta vez",
+        )
         
         headers = {'Content-Type': 'application/json'}
         data = {
+            "systemInstruction": {
+                "parts": [{"text": templates.system}]
+            },
             "contents": [
                 {
                     "role": "user",
@@ -889,16 +2561,32 @@ class ApiService:
                 "maxOutputTokens": 300
             }
         }
+        system_bytes = len(templates.system.encode("utf-8"))
+        turn_bytes = len(prompt.encode("utf-8"))
+        turn_tokens = estimate_tokens(prompt)
+        estimated_tokens = estimate_tokens(templates.system) + turn_tokens
         
         try:
             # Simular delay de digitação
-            time.sleep(typing_delay)
+            with self.trace.span("10a_digitacao"):
+                self._typing_pause(typing_delay)
             
-            logger.info(f"API call for user input: {user_input[:50]}...")
-            response = requests.post(Config.API_URL, headers=headers, json=data, timeout=Config.REQUEST_TIMEOUT)
+            logger.debug("API call for user input: %.50s...", user_input)
+            with self.trace.span("10b_gemini_http") as span:
+                response = get_http_session().post(Config.API_URL, headers=headers, json=data,
+                                                   timeout=Config.REQUEST_TIMEOUT)
+            metrics.gemini_seconds.observe(time.perf_counter() - span.started)
+            metrics.gemini_requests.inc(code=response.status_code)
             response.raise_for_status()
             
-            gemini_response = response.json().get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
+            payload = response.json()
+            input_tokens = payload.get("usageMetadata", {}).get("promptTokenCount")
+            get_prompt_stats().record(system_bytes, turn_bytes, estimated_tokens, input_tokens,
+                                      turn_tokens=turn_tokens, context_tokens=estimate_tokens(conversation_context))
+            logger.debug("Prompt: %d bytes (%d fixos + %d do turno), %d tokens de entrada%s",
+                         system_bytes + turn_bytes, system_bytes, turn_bytes, input_tokens or estimated_tokens,
+                         "" if input_tokens else " (estimado)")
+            gemini_response = payload.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
             
             # Processar resposta JSON
             try:
@@ -912,20 +2600,25 @@ class ApiService:
                 if not isinstance(resposta, dict) or "text" not in resposta:
                     raise ValueError("Resposta inválida do Gemini")
                 
+                self.last_call_from_api = True
+                self.response_source = "gemini"
                 return resposta
                 
             except (json.JSONDecodeError, ValueError) as e:
                 logger.warning(f"Erro ao processar JSON do Gemini: {e}")
                 # Fallback: extrair apenas o texto
                 clean_text = re.sub(r'```json|```', '', gemini_response).strip()
+                self.response_source = "gemini_texto"
                 return {"text": clean_text, "cta": {"show": False}}
                 
         except requests.exceptions.RequestException as e:
+            if e.response is None:  # sem resposta HTTP (as com código já foram contadas)
+                metrics.gemini_requests.inc(code="timeout" if isinstance(e, requests.exceptions.Timeout) else "conexao")
             logger.error(f"Erro na API do Gemini: {e}")
-            return get_fallback_response(user_input, st.session_state.get('messages', []))
+            return get_fallback_response(user_input, self.state.get('messages', []))
         except Exception as e:
             logger.error(f"Erro inesperado: {e}")
-            return get_fallback_response(user_input, st.session_state.get('messages', []))
+            return get_fallback_response(user_input, self.state.get('messages', []))
 
     def _post_process_response(self, response: Dict, user_input: str, should_use_audio: bool) -> Dict:
         """Pós-processa a resposta para adicionar imperfeições humanas e áudios contextuais."""
@@ -934,6 +2627,13 @@ class ApiService:
         if "text" in response:
             response["text"] = self.timing.simulate_human_imperfections(response["text"])
         
+        # Validar a chave de áudio (o Gemini pode inventar chaves)
+        if response.get("audio"):
+            intent = self.AUDIO_INTENTS.get(self.turn_intent, self.turn_intent)
+            response["audio"] = get_audio_registry().resolve(response["audio"], intent)
+            if not response["audio"]:
+                response.pop("audio")
+        
         # Adicionar áudio contextual se não foi especificado pelo Gemini
         if should_use_audio and not response.get("audio"):
             audio_key = self._select_contextual_audio(user_input, response.get("text", ""))
@@ -954,31 +2654,14 @@ class ApiService:
         lower_input = user_input.lower()
         lower_response = response_text.lower()
         
-        # Mapeamento contextual de áudios
-        audio_mapping = {
-            ("amostra", "gratis", "grátis", "sample", "free"): "claro_tenho_amostra_gratis",
-            ("oi", "olá", "hello", "hey"): "oi_meu_amor_tudo_bem",
-            ("nua", "nude", "pelada"): "ver_nua_tem_que_comprar",
-            ("rosinha", "rosa", "buceta"): "imagina_ela_bem_rosinha",
-            ("fake", "falsa", "bot", "robô"): "nao_sou_fake_nao",
-            ("esperando", "demora", "cadê"): "vida_to_esperando_voce_me_responder_gatinho"
-        }
-        
         # Verificar se alguma palavra-chave está presente
-        for keywords, audio_key in audio_mapping.items():
+        for keywords, audio_key in self.CONTEXTUAL_AUDIOS.items():
             if any(keyword in lower_input for keyword in keywords):
                 return audio_key
         
-        # Áudio baseado na hora do dia para cumprimentos
-        now = datetime.now()
-        hour = now.hour
+        # Áudio de saudação do período do dia para cumprimentos
         if any(greeting in lower_input for greeting in ["oi", "olá", "bom dia", "boa tarde", "boa noite"]):
-            if 6 <= hour < 12:
-                return "bom_dia_nao_sou_fake"
-            elif 12 <= hour < 18:
-                return "boa_tarde_nao_sou_fake"
-            elif 18 <= hour <= 23:
-                return "boa_noite_nao_sou_fake"
+            return get_audio_registry().for_intent("saudacao")
         
         return None
 
@@ -1023,7 +2706,11 @@ class ApiService:
 # INICIALIZAÇÃO E PERSISTÊNCIA DE SESSÃO
 # ======================
 def initialize_session():
-    """Inicializa a sessão com valores padrão e carrega dados persistentes."""
+    """Inicializa a sessão: dados persistentes do usuário (uma vez por sessão) e valores padrão."""
+    if 'persistent_loaded' not in st.session_state:
+        load_persistent_data()
+        st.session_state.persistent_loaded = True
+
     # Valores padrão da sessão
     default_values = {
         'age_verified': False,
@@ -1033,6 +2720,7 @@ def initialize_session():
         'chat_started': False,
         'current_page': 'home',
         'session_id': str(uuid.uuid4()),
+        'history_offset': 0,
         'last_cta_time': 0,
         'preview_shown': False,
         'conversation_stage': 'initial',
@@ -1047,51 +2735,47 @@ def initialize_session():
     for key, value in default_values.items():
         if key not in st.session_state:
             st.session_state[key] = value
-    
-    # Carregar dados persistentes
-    load_persistent_data()
 
 def load_persistent_data():
-    """Carrega dados persistentes do banco de dados."""
+    """Carrega dados persistentes do store de sessões."""
     user_id = get_user_id()
-    db = PersistentState()
-    saved_data = db.load_state(user_id) or {}
+    saved_data = get_session_store().load(user_id) or {}
     
     # Carregar apenas dados que fazem sentido persistir
-    persistent_keys = [
-        'age_verified', 'messages', 'request_count', 'connection_complete', 
-        'chat_started', 'current_page', 'preview_shown', 'conversation_stage',
-        'last_interaction_time', 'user_info_collected', 'audio_count'
-    ]
-    
-    for key in persistent_keys:
+    if saved_data.get('current_page') == "admin":
+        saved_data['current_page'] = "chat"  # gravado por versões antigas; o painel não é restaurado
+    if 'session_id' not in saved_data:
+        saved_data.pop('messages', None)  # gravado sem sessão: começa uma conversa nova
+    for key in PERSISTENT_KEYS:
         if key in saved_data and key not in st.session_state:
             st.session_state[key] = saved_data[key]
+    st.session_state.persisted_digests = {key: _state_digest(saved_data[key])
+                                          for key in PERSISTENT_KEYS if key in saved_data}
+
+def _state_digest(value) -> str:
+    return md5(json.dumps(value, default=str, sort_keys=True).encode("utf-8")).hexdigest()
 
 def save_persistent_data():
-    """Salva dados importantes da sessão no banco de dados."""
+    """Salva dados importantes da sessão no store, só quando algo mudou desde a última gravação."""
     user_id = get_user_id()
-    db = PersistentState()
-    
-    persistent_keys = [
-        'age_verified', 'messages', 'request_count', 'connection_complete',
-        'chat_started', 'current_page', 'preview_shown', 'conversation_stage',
-        'last_interaction_time', 'user_info_collected', 'audio_count'
-    ]
     
     # Preparar dados para salvar
     current_state = {}
-    for key in persistent_keys:
+    for key in PERSISTENT_KEYS:
         if key in st.session_state:
             current_state[key] = st.session_state[key]
+    if current_state.get('current_page') == "admin":
+        # O painel é só desta aba: a sessão guardada volta para a página de antes
+        current_state['current_page'] = st.session_state.get('admin_return_page', "chat")
     
-    # Salvar apenas se houver mudanças significativas
-    last_saved_state = db.load_state(user_id) or {}
-    changed_keys = [key for key in persistent_keys 
-                   if current_state.get(key) != last_saved_state.get(key)]
+    # Compara com os digests da última gravação desta sessão (sem ler o store de volta)
+    digests = {key: _state_digest(value) for key, value in current_state.items()}
+    last_saved = st.session_state.get('persisted_digests', {})
+    changed_keys = [key for key in PERSISTENT_KEYS if digests.get(key) != last_saved.get(key)]
     
     if changed_keys:
-        db.save_state(user_id, current_state)
+        get_session_store().save(user_id, current_state)
+        st.session_state.persisted_digests = digests
         logger.info(f"Saved persistent data for user {user_id}: {changed_keys}")
 
 # ======================
@@ -1101,13 +2785,18 @@ class UiService:
     @staticmethod
     def show_audio_player(audio_key: str) -> None:
         """Exibe um player de áudio com design melhorado."""
+        # A chave já foi resolvida quando a resposta foi gerada; chaves antigas inválidas não tocam
         if audio_key in Config.AUDIOS:
-            audio_url = Config.AUDIOS[audio_key]
+            # Servir do cache local quando disponível (origem própria, Range e cache longo)
+            store = get_audio_store()
+            audio_url = store.url_for(audio_key, Config.AUDIOS[audio_key])
+            meta = store.get(audio_key)
+            duration_label = f" • {format_duration(meta['duration'])}" if meta else ""
             st.markdown(f"""
             <div class="audio-message">
                 <span class="audio-icon">🎵</span>
-                <strong>Áudio da Mylle</strong>
-                <audio controls style="width: 100%; margin-top: 10px;">
+                <strong>Áudio da Mylle</strong>{duration_label}
+                <audio controls preload="{'none' if meta else 'metadata'}" style="width: 100%; margin-top: 10px;">
                     <source src="{audio_url}" type="audio/mpeg">
                     Seu navegador não suporta áudio.
                 </audio>
@@ -1132,11 +2821,7 @@ class UiService:
             border: 1px solid rgba(255, 102, 179, 0.3);
         ">
             <p style="color: #ff66b3; margin-bottom: 10px; font-weight: bold;">🎁 Preview Exclusivo</p>
-            <img src="{Config.IMG_PREVIEW}" style="
-                max-width: 200px;
-                border-radius: 10px;
-                box-shadow: 0 4px 15px rgba(255, 102, 179, 0.3);
-            ">
+            {get_image_store().picture_html(Config.IMG_PREVIEW, "preview", style="max-width: 200px; border-radius: 10px; box-shadow: 0 4px 15px rgba(255, 102, 179, 0.3);")}
             <p style="color: #aaa; margin-top: 10px; font-size: 0.9em;">Uma amostra do que te espera... 😈</p>
         </div>
         """, unsafe_allow_html=True)
@@ -1358,7 +3043,7 @@ class UiService:
             
             st.markdown(f"""
             <div class="sidebar-profile">
-                <img src="{Config.IMG_PROFILE}" alt="Mylle Alves">
+                {get_image_store().picture_html(Config.IMG_PROFILE, "profile", alt="Mylle Alves")}
                 <h3 style="color: #ff66b3; margin: 0;">Mylle Alves</h3>
                 <p style="color: #aaa; margin: 0; font-size: 0.9em;">
                     <span class="online-indicator"></span>Online agora
@@ -1438,7 +3123,7 @@ class UiService:
         cols = st.columns(3)
         for idx, col in enumerate(cols):
             with col:
-                st.image(Config.IMG_GALLERY[idx % len(Config.IMG_GALLERY)], 
+                st.image(get_image_store().src(Config.IMG_GALLERY[idx % len(Config.IMG_GALLERY)], "gallery"), 
                         use_container_width=True, 
                         caption=f"💎 Preview #{idx+1}")
                 st.markdown("""<div style="text-align:center; color: #ff66b3; margin-top: -10px;">✨ Exclusivo VIP</div>""", 
@@ -1493,6 +3178,8 @@ class UiService:
                     if st.button(label, key=f"shortcut_{action}", use_container_width=True):
                         st.session_state.messages = []
                         st.session_state.request_count = 0
+                        st.session_state.session_id = str(uuid.uuid4())  # conversa nova
+                        st.session_state.history_offset = 0
                         save_persistent_data()
                         st.rerun()
                 else:
@@ -1570,7 +3257,7 @@ class NewPages:
         col1, col2 = st.columns([1, 2])
         
         with col1:
-            st.image(Config.IMG_PROFILE, use_container_width=True)
+            st.image(get_image_store().src(Config.IMG_PROFILE, "gallery"), use_container_width=True)
             
             # Status dinâmico
             persona, humor = DynamicPersonality.get_current_persona()
@@ -1657,13 +3344,13 @@ class NewPages:
             previews = Config.IMG_HOME_PREVIEWS[:2]
             for idx, col in enumerate(preview_cols):
                 with col:
-                    st.image(previews[idx], use_container_width=True, caption=f"Preview {idx+1}")
+                    st.image(get_image_store().src(previews[idx], "gallery"), use_container_width=True, caption=f"Preview {idx+1}")
             
             preview_cols2 = st.columns(2)
             previews2 = Config.IMG_HOME_PREVIEWS[2:4]
             for idx, col in enumerate(preview_cols2):
                 with col:
-                    st.image(previews2[idx], use_container_width=True, caption=f"Preview {idx+3}")
+                    st.image(get_image_store().src(previews2[idx], "gallery"), use_container_width=True, caption=f"Preview {idx+3}")
 
         st.markdown("---")
         
@@ -1899,7 +3586,7 @@ class NewPages:
                     <div>
                         {'<div class="offer-tag offer-tag-highlight">{package["tag"]}</div>' if package.get("highlight") else f'<div class="offer-tag">{package["tag"]}</div>'}
                         
-                        <img src="{package['image']}">
+                        {get_image_store().picture_html(package['image'], "card", alt=package['name'])}
                         
                         <h3 style="color: {package['color']};">
                             {package['name']}
@@ -1960,10 +3647,119 @@ class NewPages:
             save_persistent_data()
             st.rerun()
 
+    @staticmethod
+    def show_admin_page() -> None:
+        """Painel de desempenho (?admin=1), protegido por MYLLE_ADMIN_TOKEN; lê só o registro de métricas."""
+        st.markdown("<h2 style='color: #ff66b3;'>🛠️ Desempenho</h2>", unsafe_allow_html=True)
+        if not Config.ADMIN_TOKEN:
+            st.warning("Defina MYLLE_ADMIN_TOKEN para habilitar o painel.")
+            return
+        if not st.session_state.get("admin_authenticated"):
+            password = st.text_input("Senha", type="password", key="admin_password")
+            if st.button("Entrar", key="admin_login", type="primary"):
+                if is_admin_token(password):
+                    st.session_state.admin_authenticated = True
+                    st.rerun()
+                st.error("Senha incorreta.")
+            return
+
+        metrics = get_metrics()
+        snapshot = metrics.registry.snapshot()
+
+        def series(name: str) -> List[Tuple[Dict, object]]:
+            return snapshot.get(name, [])
+
+        def total(name: str, **match) -> float:
+            return sum(v for labels, v in series(name) if all(labels.get(k) == w for k, w in match.items()))
+
+        stages = {labels["stage"]: h for labels, h in series("mylle_stage_seconds")}
+        turn = stages.get("turno_total")
+        gemini_calls = total("mylle_gemini_requests_total")
+        gemini_errors = gemini_calls - total("mylle_gemini_requests_total", code="200")
+        responses = total("mylle_responses_total")
+        cta_shown = total("mylle_cta_total", event="shown")
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Sessões ativas", int(total("mylle_active_sessions")))
+        col2.metric("Turnos", int(total("mylle_turns_total")))
+        col3.metric("Turno p50 / p95",
+                    f"{turn.quantile(0.5) * 1000:.0f} / {turn.quantile(0.95) * 1000:.0f} ms" if turn else "—")
+        col4.metric("Turno p99", f"{turn.quantile(0.99) * 1000:.0f} ms" if turn else "—")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Erros do Gemini", f"{gemini_errors / gemini_calls:.1%}" if gemini_calls else "—",
+                    help=f"{int(gemini_errors)} de {int(gemini_calls)} chamadas")
+        col2.metric("Fallback", f"{total('mylle_responses_total', source='fallback') / responses:.1%}" if responses else "—")
+        col3.metric("Respostas sem Gemini",
+                    f"{sum(total('mylle_responses_total', source=s) for s in ('cache', 'local', 'fake')) / responses:.1%}"
+                    if responses else "—")
+        col4.metric("Cliques no CTA", f"{total('mylle_cta_total', event='clicked') / cta_shown:.1%}" if cta_shown else "—",
+                    help=f"{int(cta_shown)} CTAs exibidos")
+
+        st.markdown("#### ⏱️ Latência por etapa")
+        stage_rows = [{"etapa": stage, "turnos": h.count, "p50 (ms)": round(h.quantile(0.5) * 1000, 1),
+                       "p95 (ms)": round(h.quantile(0.95) * 1000, 1), "média (ms)": round(h.sum / h.count * 1000, 1)}
+                      for stage, h in sorted(stages.items()) if h.count]
+        if stage_rows:
+            st.table(stage_rows)
+        else:
+            st.caption("Nenhum turno respondido neste processo ainda.")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("#### 🧠 Caches")
+            st.table([{"cache": labels["cache"], "acerto": f"{ratio:.1%}",
+                       "consultas": int(total("mylle_cache_lookups_total", cache=labels["cache"]))}
+                      for labels, ratio in series("mylle_cache_hit_ratio")])
+            commits = {labels["db"]: h for labels, h in series("mylle_sqlite_commit_seconds")}
+            if commits:
+                st.markdown("#### 💾 Commits no SQLite")
+                st.table([{"banco": db, "commits": h.count, "p50 (ms)": round(h.quantile(0.5) * 1000, 2),
+                           "p95 (ms)": round(h.quantile(0.95) * 1000, 2)} for db, h in sorted(commits.items())])
+        with col2:
+            st.markdown("#### 🗄️ Bancos")
+            sizes = {labels["db"]: size for labels, size in series("mylle_db_bytes")}
+            st.table([{"banco": labels["db"], "tabela": labels["table"], "linhas": int(rows),
+                       "arquivo (KB)": round(sizes.get(labels["db"], 0) / 1024)}
+                      for labels, rows in sorted(series("mylle_db_rows"), key=lambda item: tuple(item[0].values()))])
+            st.caption(f"Contagem em segundo plano a cada {Config.METRICS_DB_REFRESH} s.")
+            if st.button("Recontar agora", key="admin_db_refresh"):
+                metrics.request_db_refresh()
+
+        profiler = get_profiler()
+        st.caption(f"Profiler: {'ligado' if profiler.running else 'desligado'} · {profiler.stats()['samples']} amostras · "
+                   f"log: {setup_logging().stats()['dropped']} registros descartados")
+        col1, col2 = st.columns(2)
+        if col1.button("🔄 Atualizar", key="admin_refresh", use_container_width=True):
+            st.rerun()
+        if col2.button("💬 Voltar ao Chat", key="back_from_admin", use_container_width=True):
+            st.session_state.current_page = st.session_state.pop("admin_return_page", "chat")
+            st.rerun()
+
 # ======================
 # SERVIÇOS DE CHAT (Ultra Melhorados)
 # ======================
 class ChatService:
+    LIMIT_RESPONSE = {
+        "text": "Por hoje chega, gato 😘 Volto amanhã com mais safadeza pra você! Mas você pode ver meus packs enquanto isso...",
+        "cta": {"show": True, "label": "🎁 Ver Packs VIP", "target": "offers"}
+    }
+
+    FOLLOW_UP_MESSAGES = [
+        {
+            "text": "Vida, tô esperando você me responder gatinho... 😏 O que aconteceu?",
+            "audio": "vida_to_esperando_voce_me_responder_gatinho",
+            "cta": {"show": False}
+        },
+        {
+            "text": "Ei, sumido! Tô aqui esperando sua resposta... 😘",
+            "cta": {"show": False}
+        },
+        {
+            "text": "Oi amor, ainda tá aí? Me responde... 💋",
+            "cta": {"show": False}
+        }
+    ]
+
     @staticmethod
     def initialize_session(conn: sqlite3.Connection):
         """Inicializa a sessão do chat com melhorias."""
@@ -1979,6 +3775,8 @@ class ChatService:
             )
             if saved_messages:
                 st.session_state.messages = saved_messages
+                st.session_state.history_offset = DatabaseService.count_messages(
+                    conn, get_user_id(), st.session_state.session_id) - len(saved_messages)
 
         # Iniciar conversa automaticamente se for novo usuário
         if len(st.session_state.messages) == 0 and st.session_state.chat_started:
@@ -1997,20 +3795,22 @@ class ChatService:
         name_part = f", {user_profile['name']}" if user_profile and user_profile.get('name') else ""
         
         if 6 <= hour < 12:
-            greeting, audio_key = f"Bom dia{name_part}! ☀️", "bom_dia_nao_sou_fake"
+            greeting = f"Bom dia{name_part}! ☀️"
         elif 12 <= hour < 18:
-            greeting, audio_key = f"Boa tarde{name_part}! 🌅", "boa_tarde_nao_sou_fake"
+            greeting = f"Boa tarde{name_part}! 🌅"
         else:
-            greeting, audio_key = f"Boa noite{name_part}! 🌙", "boa_noite_nao_sou_fake"
+            greeting = f"Boa noite{name_part}! 🌙"
+        audio_key = get_audio_registry().for_intent("saudacao", hour)
         
-        opening_messages = [
+        pooled = pick_pool_response(user_id, "abertura", learning_engine=learning_engine)
+        opening_messages = [pooled["text"].replace(GREETING_SLOT, greeting)] if pooled else [
             f"{greeting} Finalmente chegou até mim! Como me achou, gostoso? 😈",
             f"{greeting} Que delícia te ver aqui... me conta seu nome, amor 😏",
             f"{greeting} Caiu direto na toca da raposa, hein? De onde você é? 👀"
         ]
         
         # MODIFICAÇÃO APLICADA: Simular gravação e digitação antes de enviar
-        with st.chat_message("assistant", avatar=Config.IMG_PROFILE):
+        with st.chat_message("assistant", avatar=profile_avatar()):
             UiService.show_recording_effect()
             ApiService()._show_status_effect(st.empty(), "typing")
         
@@ -2072,7 +3872,7 @@ class ChatService:
                     try:
                         content_data = json.loads(msg["content"])
                         if isinstance(content_data, dict):
-                            with st.chat_message("assistant", avatar=Config.IMG_PROFILE):
+                            with st.chat_message("assistant", avatar=profile_avatar()):
                                 st.markdown(f"""
                                 <div style="
                                     background: linear-gradient(45deg, #ff66b3, #ff1493);
@@ -2099,11 +3899,13 @@ class ChatService:
                                         # ===============================================
                                         # MODIFICAÇÃO APLICADA AQUI: Força o destino para a página de ofertas
                                         # ===============================================
+                                        get_metrics().cta.inc(event="clicked")
+                                        record_engagement(get_user_id(), cta_id=cta_id_of(msg["content"]))
                                         st.session_state.current_page = "offers"
                                         save_persistent_data()
                                         st.rerun()
                     except:
-                        with st.chat_message("assistant", avatar=Config.IMG_PROFILE):
+                        with st.chat_message("assistant", avatar=profile_avatar()):
                             st.markdown(f"""
                             <div style="
                                 background: linear-gradient(45deg, #ff66b3, #ff1493);
@@ -2144,7 +3946,9 @@ class ChatService:
     @staticmethod
     def process_user_input(conn: sqlite3.Connection) -> None:
         """Processa input do usuário com todas as melhorias de humanização."""
+        history_started = time.perf_counter()
         ChatService.display_chat_history()
+        history_seconds = time.perf_counter() - history_started
         
         # Verificar usuário inativo
         if ChatService.check_inactive_user():
@@ -2154,6 +3958,8 @@ class ChatService:
         user_input = st.chat_input("💬 Digite sua mensagem...", key="chat_input")
         
         if user_input:
+            trace = TurnTrace()
+            trace.add("render_historico", history_seconds)
             cleaned_input = re.sub(r'<[^>]*>', '', user_input)[:500]
             user_id = get_user_id()
             
@@ -2162,25 +3968,26 @@ class ChatService:
                 ChatService._send_limit_message(conn)
                 return
             
-            # Análise emocional do input
-            emotional_ai = EmotionalIntelligence()
-            polarity, subjectivity = emotional_ai.analyze_sentiment(cleaned_input)
-            emotional_state = emotional_ai.get_emotional_state(polarity)
+            # Análise emocional do input (uma vez por mensagem, repassada ao ApiService)
+            sentiment = EmotionalIntelligence.analyze(cleaned_input)
+            polarity, emotional_state = sentiment.polarity, sentiment.label
             
             # Salvar mensagem do usuário
             st.session_state.messages.append({"role": "user", "content": cleaned_input})
-            DatabaseService.save_message(
-                conn, user_id, st.session_state.session_id, 
-                "user", cleaned_input, polarity, emotional_state
-            )
+            with trace.span("db_mensagem_usuario"):
+                DatabaseService.save_message(
+                    conn, user_id, st.session_state.session_id, 
+                    "user", cleaned_input, polarity, emotional_state
+                )
             
             # Atualizar contadores e timestamps
+            record_engagement(user_id, cleaned_input)
             st.session_state.request_count += 1
             st.session_state.last_interaction_time = time.time()
             st.session_state.last_user_message_time = time.time()
             
             # Exibir mensagem do usuário
-            with st.chat_message("user", avatar="😎"):
+            with trace.span("render_usuario"), st.chat_message("user", avatar="😎"):
                 st.markdown(f"""
                 <div style="
                     background: rgba(255, 102, 179, 0.15);
@@ -2195,11 +4002,12 @@ class ChatService:
                 """, unsafe_allow_html=True)
             
             # Gerar resposta inteligente
-            with st.chat_message("assistant", avatar=Config.IMG_PROFILE):
+            with st.chat_message("assistant", avatar=profile_avatar()):
                 api_service = ApiService()
                 resposta = api_service.get_intelligent_response(
-                    cleaned_input, user_id, st.session_state.messages
+                    cleaned_input, user_id, st.session_state.messages, sentiment=sentiment, trace=trace
                 )
+                render_started = time.perf_counter()
                 
                 # Garantir formato correto da resposta
                 if isinstance(resposta, str):
@@ -2232,6 +4040,9 @@ class ChatService:
                 
                 # Exibir CTA se presente
                 if resposta.get("cta", {}).get("show"):
+                    get_metrics().cta.inc(event="shown")
+                    record_cta_shown(user_id, json.dumps(resposta))
+                    cta_engine.mark_cta_shown()
                     cta_data = resposta.get("cta", {})
                     if st.button(cta_data.get("label", "🎁 Ver Conteúdo"),
                                 key=f"chat_button_{time.time()}",
@@ -2240,40 +4051,31 @@ class ChatService:
                         # ===============================================
                         # MODIFICAÇÃO APLICADA AQUI: Força o destino para a página de ofertas
                         # ===============================================
+                        get_metrics().cta.inc(event="clicked")
+                        record_engagement(get_user_id(), cta_id=cta_id_of(json.dumps(resposta)))
                         st.session_state.current_page = "offers"
                         save_persistent_data()
                         st.rerun()
+                trace.add("render_resposta", time.perf_counter() - render_started)
             
             # Salvar resposta da assistente
             st.session_state.messages.append({"role": "assistant", "content": json.dumps(resposta)})
-            DatabaseService.save_message(
-                conn, user_id, st.session_state.session_id, 
-                "assistant", json.dumps(resposta)
-            )
-            save_persistent_data()
+            with trace.span("db_mensagem_resposta"):
+                DatabaseService.save_message(
+                    conn, user_id, st.session_state.session_id, 
+                    "assistant", json.dumps(resposta)
+                )
+            with trace.span("db_estado_persistente"):
+                save_persistent_data()
+            trace.finish()
 
     @staticmethod
     def _send_follow_up_message(conn: sqlite3.Connection):
         """Envia mensagem de follow-up para usuário inativo."""
-        follow_up_messages = [
-            {
-                "text": "Vida, tô esperando você me responder gatinho... 😏 O que aconteceu?",
-                "audio": "vida_to_esperando_voce_me_responder_gatinho",
-                "cta": {"show": False}
-            },
-            {
-                "text": "Ei, sumido! Tô aqui esperando sua resposta... 😘",
-                "cta": {"show": False}
-            },
-            {
-                "text": "Oi amor, ainda tá aí? Me responde... 💋",
-                "cta": {"show": False}
-            }
-        ]
-        
+        message = pick_pool_response(get_user_id(), "follow_up") or random.choice(ChatService.FOLLOW_UP_MESSAGES)
         follow_up_message = {
             "role": "assistant",
-            "content": json.dumps(random.choice(follow_up_messages))
+            "content": json.dumps(message)
         }
         
         st.session_state.messages.append(follow_up_message)
@@ -2290,10 +4092,7 @@ class ChatService:
         """Envia mensagem quando o limite de requisições é atingido."""
         limit_message = {
             "role": "assistant",
-            "content": json.dumps({
-                "text": "Por hoje chega, gato 😘 Volto amanhã com mais safadeza pra você! Mas você pode ver meus packs enquanto isso...",
-                "cta": {"show": True, "label": "🎁 Ver Packs VIP", "target": "offers"}
-            })
+            "content": json.dumps(ChatService.LIMIT_RESPONSE)
         }
         
         st.session_state.messages.append(limit_message)
@@ -2309,15 +4108,34 @@ class ChatService:
 # ======================
 def main():
     """Função principal da aplicação."""
+    configure_page()
+    setup_logging()
+    update_profiler()
+    run_started_at = time.perf_counter()
+    # Conexão do pool só durante este rerun: nada de recurso vivo no session_state
+    conn = get_chat_db_pool().acquire()
     try:
-        # Inicializar banco de dados
-        if 'db_conn' not in st.session_state:
-            st.session_state.db_conn = DatabaseService.init_db()
-        
-        conn = st.session_state.db_conn
+        # Registro de áudios (validado uma vez por processo) e cache local em segundo plano
+        get_audio_registry()
+        get_audio_store().sync_in_background(Config.AUDIOS)
+        get_image_store().sync_in_background(image_presets(Config))
         
         # Inicializar sessão
         initialize_session()
+        bind_log_context(session=st.session_state.session_id, turn=None)
+        get_metrics().sessions.touch(st.session_state.session_id)
+        
+        # Painel de desempenho (?admin=1), fora dos fluxos de idade e de chamada. O parâmetro sai da
+        # URL na entrada: senão cada rerun voltaria ao painel e o "Voltar ao Chat" não teria efeito
+        if "admin" in st.query_params:
+            del st.query_params["admin"]
+            if st.session_state.current_page != "admin":
+                st.session_state.admin_return_page = st.session_state.current_page
+            st.session_state.current_page = "admin"
+        if st.session_state.current_page == "admin":
+            NewPages.show_admin_page()
+            st.stop()
+        
         ChatService.initialize_session(conn)
         
         # Verificação de idade
@@ -2356,6 +4174,27 @@ def main():
     except Exception as e:
         logger.error(f"Erro na aplicação principal: {e}")
         st.error("Ocorreu um erro inesperado. Por favor, recarregue a página.")
+    finally:
+        get_chat_db_pool().release(conn)
+        if STARTUP_PROFILE:
+            report_startup_timing(run_started_at)
+
+@st.cache_resource(show_spinner=False)
+def _process_first_run() -> Dict:
+    """Marca o primeiro rerun do processo."""
+    return {"reported": False}
+
+def report_startup_timing(run_started_at: float) -> None:
+    """Modo MYLLE_STARTUP_PROFILE: tempo de carga do módulo e de renderização do rerun."""
+    now = time.perf_counter()
+    state = _process_first_run()
+    kind = "rerun" if state["reported"] else "primeira página"
+    state["reported"] = True
+    heavy = [name for name in ("textblob", "nltk", "numpy", "PIL") if name in sys.modules]
+    logger.info(
+        f"⏱️ {kind}: módulo {(run_started_at - _MODULE_STARTED_AT) * 1000:.1f} ms, "
+        f"render {(now - run_started_at) * 1000:.1f} ms; carregados: {', '.join(heavy) or 'nenhum pesado'}"
+    )
 
 # Função auxiliar para tela de início do chat
 def _show_chat_start_screen():
@@ -2368,12 +4207,7 @@ def _show_chat_start_screen():
         
         st.markdown(f"""
         <div style="text-align: center; margin: 50px 0;">
-            <img src="{Config.IMG_PROFILE}" width="140" style="
-                border-radius: 50%; 
-                border: 3px solid #ff66b3; 
-                box-shadow: 0 5px 15px rgba(255, 102, 179, 0.3);
-                animation: pulse 2s infinite;
-            ">
+            {get_image_store().picture_html(Config.IMG_PROFILE, "profile", attrs='width="140"', style="border-radius: 50%; border: 3px solid #ff66b3; box-shadow: 0 5px 15px rgba(255, 102, 179, 0.3); animation: pulse 2s infinite;")}
             <h2 style="color: #ff66b3; margin-top: 20px;">{persona_name}</h2>
             <p style="font-size: 1.1em; color: #aaa;">Especialista em conteúdo adulto premium 🔥</p>
             <p style="font-size: 0.9em; color: #666; margin-top: 10px;">Aqui eu comando - você obedece 😈</p>
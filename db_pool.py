@@ -0,0 +1,56 @@
+"""
+Pool de conexões SQLite compartilhado entre sessões e threads do processo.
+
+Cada rerun (ou requisição da API) pega uma conexão, usa e devolve; nenhuma
+conexão fica presa a uma sessão. Com o pool vazio abre uma conexão extra,
+fechada na devolução se já houver `size` ociosas, em vez de bloquear.
+"""
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+
+class SQLitePool:
+    """Conexões ociosas numa pilha (LIFO: a mais quente primeiro)."""
+    def __init__(self, factory: Callable[[], sqlite3.Connection], size: int = 16):
+        self._factory = factory
+        self.size = size
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.in_use = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._factory()
+            with self._lock:
+                self.created += 1
+        with self._lock:
+            self.in_use += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self.in_use -= 1
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() >= self.size:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"idle": self._idle.qsize(), "in_use": self.in_use, "created": self.created, "size": self.size}
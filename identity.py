@@ -0,0 +1,99 @@
+"""
+Identidade persistente do usuário: um id aleatório assinado com HMAC-SHA256.
+
+O token `<id>.<assinatura>` vai no parâmetro `?uid=` da URL (sobrevive ao
+reload e a links salvos) e também é aceito de um cookie `mylle_uid`, posto
+por um proxy ou por outra réplica. Réplicas com o mesmo segredo
+(MYLLE_IDENTITY_SECRET) reconhecem os mesmos tokens; sem ele o segredo é
+gerado uma vez e guardado em `.identity_secret`, válido só neste nó.
+
+Uso:
+    python identity.py sign <user_id>   # token para um id existente (ex.: migrar um usuário)
+    python identity.py verify <token>
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import sys
+import uuid
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PARAM = "uid"
+COOKIE = "mylle_uid"
+SECRET_FILE = os.getenv("MYLLE_IDENTITY_SECRET_FILE", ".identity_secret")
+SIGNATURE_BYTES = 16
+
+
+def load_secret(secret: str = "", path: str = SECRET_FILE) -> bytes:
+    """Segredo informado ou o do arquivo local (criado na primeira vez, modo 0600)."""
+    if secret:
+        return secret.encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            stored = f.read().strip()
+        if stored:
+            return stored
+    except OSError:
+        pass
+    stored = secrets.token_hex(32).encode("ascii")
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(stored)
+    except FileExistsError:
+        # Outro processo criou o arquivo primeiro: usa o dele
+        with open(path, "rb") as f:
+            return f.read().strip()
+    except OSError as e:
+        logger.warning(f"Segredo de identidade não persistido ({e}); ids valem só até reiniciar")
+    return stored
+
+
+class IdentitySigner:
+    """Assina e confere tokens `<id>.<assinatura>`."""
+    def __init__(self, secret: bytes):
+        self.secret = secret
+
+    def _signature(self, user_id: str) -> bytes:
+        digest = hmac.new(self.secret, user_id.encode("utf-8"), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+        return base64.urlsafe_b64encode(digest).rstrip(b"=")
+
+    def sign(self, user_id: str) -> str:
+        return f"{user_id}.{self._signature(user_id).decode('ascii')}"
+
+    def verify(self, token: Optional[str]) -> Optional[str]:
+        """Id do token se a assinatura confere; None se ausente, malformado ou adulterado."""
+        if not token or not isinstance(token, str):
+            return None
+        user_id, _, signature = token.rpartition(".")
+        # Compara bytes: com str, um link adulterado com acento ("abc.é") levantaria TypeError
+        try:
+            expected = self._signature(user_id)
+        except UnicodeEncodeError:  # surrogates soltos no id
+            return None
+        if not user_id or not hmac.compare_digest(signature.encode("utf-8", "replace"), expected):
+            return None
+        return user_id
+
+    def new_identity(self) -> Tuple[str, str]:
+        user_id = str(uuid.uuid4())
+        return user_id, self.sign(user_id)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    signer = IdentitySigner(load_secret(os.getenv("MYLLE_IDENTITY_SECRET", "")))
+    if command == "sign" and len(sys.argv) > 2:
+        print(signer.sign(sys.argv[2]))
+    elif command == "verify" and len(sys.argv) > 2:
+        user_id = signer.verify(sys.argv[2])
+        print(user_id or "❌ assinatura inválida")
+        sys.exit(0 if user_id else 1)
+    else:
+        print(__doc__)
+        sys.exit(2)
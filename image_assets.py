@@ -0,0 +1,288 @@
+"""
+Pipeline local de imagens da Mylle (perfil, galeria, prévias e packs).
+
+Baixa cada imagem de origem uma única vez, gera miniaturas no tamanho em que
+são exibidas (1x e 2x) em AVIF, WebP e JPEG, e grava tudo num cache em disco
+endereçado por conteúdo. As variantes são servidas pelo `media_server.py`
+com cache imutável e escolhidas pelo navegador via `<picture>`.
+
+Uso:
+    python image_assets.py sync      # baixa e gera todas as variantes
+    python image_assets.py list      # mostra o manifesto
+"""
+import hashlib
+import html
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+Image = ImageOps = features = None  # Pillow é importado só quando há imagens a processar
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_DIR = os.getenv("MYLLE_IMAGE_CACHE", os.path.join("media", "img"))
+MEDIA_BASE_URL = os.getenv("MYLLE_MEDIA_BASE_URL", "").rstrip("/")
+MANIFEST_NAME = "manifest.json"
+DOWNLOAD_TIMEOUT = 30
+
+# Largura CSS em que cada tipo de imagem é exibido (as variantes saem em 1x e 2x)
+PRESETS = {
+    "avatar": 48,     # bolhas do chat
+    "profile": 140,   # perfil da sidebar / tela de início
+    "preview": 200,   # prévia exclusiva no chat
+    "card": 360,      # cards dos packs
+    "gallery": 400,   # galeria e prévias da home
+}
+
+# Formatos em ordem de preferência: (extensão, MIME, formato do Pillow, opções)
+_FORMATS = [
+    ("avif", "image/avif", "AVIF", {"quality": 55}),
+    ("webp", "image/webp", "WEBP", {"quality": 78, "method": 6}),
+    ("jpg", "image/jpeg", "JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+]
+
+
+def _pillow_available() -> bool:
+    """Importa o Pillow sob demanda; False quando não está instalado."""
+    global Image, ImageOps, features
+    if Image is None:
+        try:
+            from PIL import Image, ImageOps, features
+        except ImportError:  # Pillow é opcional: sem ele o app usa as URLs originais
+            return False
+    return True
+
+
+def _supported_formats() -> List[tuple]:
+    if not _pillow_available():
+        return []
+    return [fmt for fmt in _FORMATS if fmt[2] == "JPEG" or features.check(fmt[0])]
+
+
+def _atomic_write(directory: str, name: str, data: bytes) -> None:
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+
+class ImageAssetStore:
+    """Baixa as imagens de origem e mantém as miniaturas em cache."""
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR, base_url: str = MEDIA_BASE_URL):
+        self.cache_dir = cache_dir
+        self.base_url = base_url
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+        self.manifest: Dict[str, Dict] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self) -> None:
+        _atomic_write(self.cache_dir, MANIFEST_NAME,
+                      json.dumps(self.manifest, indent=2, ensure_ascii=False).encode("utf-8"))
+
+    def _is_complete(self, url: str, presets: Iterable[str]) -> bool:
+        entry = self.manifest.get(url)
+        if not entry:
+            return False
+        return all(p in entry["variants"] for p in presets) and all(
+            os.path.isfile(os.path.join(self.cache_dir, v["file"]))
+            for variants in entry["variants"].values() for v in variants
+        )
+
+    def _fetch_source(self, url: str) -> bytes:
+        """Baixa a imagem de origem (uma vez) e guarda o original em disco."""
+        entry = self.manifest.get(url)
+        if entry:
+            path = os.path.join(self.cache_dir, entry["source_file"])
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    return f.read()
+        response = requests.get(url, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        data = response.content
+        Image.open(io.BytesIO(data)).verify()  # levanta erro se não for imagem
+        return data
+
+    def _render(self, image, width: int) -> List[Dict]:
+        """Gera as variantes de uma largura em todos os formatos suportados."""
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+        else:
+            resized = image
+        variants = []
+        for ext, mime, pil_format, options in _supported_formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            data = buffer.getvalue()
+            name = f"{hashlib.sha256(data).hexdigest()[:20]}.{ext}"
+            _atomic_write(self.cache_dir, name, data)
+            variants.append({"file": name, "mime": mime, "width": resized.width,
+                             "height": resized.height, "size": len(data)})
+        return variants
+
+    def _build(self, url: str, presets: Iterable[str]) -> Dict:
+        data = self._fetch_source(url)
+        digest = hashlib.sha256(data).hexdigest()
+        source_file = f"src-{digest[:20]}.{url.rsplit('.', 1)[-1].lower()[:4]}"
+        _atomic_write(self.cache_dir, source_file, data)
+
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB")
+        variants = {}
+        for preset in presets:
+            css_width = PRESETS[preset]
+            variants[preset] = self._render(image, css_width) + self._render(image, css_width * 2)
+        return {
+            "source_file": source_file,
+            "source_size": len(data),
+            "width": image.width,
+            "height": image.height,
+            "variants": variants,
+            "built_at": int(time.time()),
+        }
+
+    def sync(self, images: Dict[str, Iterable[str]], force: bool = False) -> Dict[str, Dict]:
+        """Garante as variantes de cada URL -> presets. Retorna o manifesto atualizado."""
+        if not _pillow_available():
+            logger.warning("Pillow não instalado; pipeline de imagens desativado")
+            return {}
+        with self._lock:
+            changed = False
+            for url, presets in images.items():
+                presets = sorted(set(presets))
+                if not force and self._is_complete(url, presets):
+                    continue
+                try:
+                    self.manifest[url] = self._build(url, presets)
+                    changed = True
+                    logger.info(f"Imagem processada: {url}")
+                except Exception as e:
+                    logger.warning(f"Falha ao processar imagem {url}: {e}")
+            if changed:
+                self._save_manifest()
+            return dict(self.manifest)
+
+    def sync_in_background(self, images: Dict[str, Iterable[str]]) -> None:
+        """Dispara o sync uma única vez por processo sem bloquear a página."""
+        if self._sync_thread is not None:
+            return
+        if all(self._is_complete(url, presets) for url, presets in images.items()):
+            return
+        if not _pillow_available():
+            return
+        self._sync_thread = threading.Thread(target=self.sync, args=(dict(images),), daemon=True)
+        self._sync_thread.start()
+
+    def variants(self, url: str, preset: str) -> List[Dict]:
+        entry = self.manifest.get(url)
+        return entry["variants"].get(preset, []) if entry else []
+
+    def _public_url(self, variant: Dict) -> str:
+        return f"{self.base_url}/img/{variant['file']}"
+
+    def src(self, url: str, preset: str) -> str:
+        """Melhor fonte única (WebP 2x) para `st.image`/avatar; cai para a URL original."""
+        candidates = [v for v in self.variants(url, preset) if v["mime"] in ("image/webp", "image/jpeg")]
+        if not candidates:
+            return url
+        best = max(candidates, key=lambda v: (v["width"], v["mime"] == "image/webp"))
+        if self.base_url:
+            return self._public_url(best)
+        return os.path.join(self.cache_dir, best["file"])
+
+    def picture_html(self, url: str, preset: str, alt: str = "", style: str = "", attrs: str = "") -> str:
+        """Gera `<picture>` com AVIF/WebP/JPEG em 1x e 2x, ou um `<img>` simples."""
+        alt = html.escape(alt, quote=True)
+        variants = self.variants(url, preset)
+        if not variants or not self.base_url:
+            return f'<img src="{url}" alt="{alt}" style="{style}" {attrs}>'
+
+        by_mime: Dict[str, List[Dict]] = {}
+        for v in variants:
+            by_mime.setdefault(v["mime"], []).append(v)
+        css_width = PRESETS[preset]
+        sources = []
+        for mime, items in by_mime.items():
+            srcset = ", ".join(f"{self._public_url(v)} {v['width']}w" for v in sorted(items, key=lambda v: v["width"]))
+            sources.append((mime, srcset))
+        fallback = min(by_mime.get("image/jpeg", variants), key=lambda v: v["width"])
+        source_tags = "".join(
+            f'<source type="{mime}" srcset="{srcset}" sizes="{css_width}px">'
+            for mime, srcset in sources if mime != "image/jpeg"
+        )
+        jpeg_srcset = next((s for m, s in sources if m == "image/jpeg"), "")
+        return (f'<picture>{source_tags}<img src="{self._public_url(fallback)}" srcset="{jpeg_srcset}" '
+                f'sizes="{css_width}px" alt="{alt}" loading="lazy" decoding="async" style="{style}" {attrs}></picture>')
+
+    def page_weight(self, url: str, preset: str) -> Dict[str, int]:
+        """Bytes do original vs. a maior variante do preset (para relatório)."""
+        entry = self.manifest.get(url)
+        variants = self.variants(url, preset)
+        if not entry or not variants:
+            return {"original": 0, "optimized": 0}
+        best = min((v for v in variants if v["width"] == max(x["width"] for x in variants)),
+                   key=lambda v: v["size"])
+        return {"original": entry["source_size"], "optimized": best["size"]}
+
+
+@lru_cache(maxsize=1)
+def get_image_store() -> ImageAssetStore:
+    """Instância única do cache de imagens por processo."""
+    return ImageAssetStore()
+
+
+def image_presets(config) -> Dict[str, List[str]]:
+    """Mapeia cada URL de imagem do `Config` para os presets em que é exibida."""
+    usage: Dict[str, set] = {}
+    usage.setdefault(config.IMG_PROFILE, set()).update({"avatar", "profile", "gallery"})
+    usage.setdefault(config.IMG_PREVIEW, set()).add("preview")
+    for url in config.PACK_IMAGES.values():
+        usage.setdefault(url, set()).add("card")
+    for url in list(config.IMG_GALLERY) + list(config.IMG_HOME_PREVIEWS):
+        usage.setdefault(url, set()).add("gallery")
+    return {url: sorted(presets) for url, presets in usage.items()}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else "sync"
+    store = get_image_store()
+    if command == "sync":
+        from chatbot import Config
+        wanted = image_presets(Config)
+        manifest = store.sync(wanted, force="--force" in sys.argv)
+        original = optimized = 0
+        for url, presets in wanted.items():
+            for preset in presets:
+                weight = store.page_weight(url, preset)
+                original += weight["original"]
+                optimized += weight["optimized"]
+        print(f"✅ {len(manifest)}/{len(wanted)} imagens em {store.cache_dir}")
+        if optimized:
+            print(f"📉 Peso: {original / 1024:.0f} KB -> {optimized / 1024:.0f} KB ({original / optimized:.1f}x menor)")
+        if len(manifest) < len(wanted):
+            sys.exit(1)
+    elif command == "list":
+        for url, entry in sorted(store.manifest.items()):
+            sizes = {p: len(v) for p, v in entry["variants"].items()}
+            print(f"{url}\n    {entry['width']}x{entry['height']} {entry['source_size']} B -> {sizes}")
+    else:
+        print(__doc__)
+        sys.exit(2)
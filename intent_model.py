@@ -0,0 +1,270 @@
+"""
+Classificador local de intenção das mensagens do cliente.
+
+Modelo linear (regressão logística multinomial) sobre features esparsas de
+palavras e bigramas normalizados, treinado offline a partir do corpus
+rotulado em `data/intents_seed.tsv` e das decisões revisadas do app
+(`intent_decisions.jsonl` com o campo "label" preenchido). A inferência é
+Python puro: soma os pesos das features ativas, sem dependências.
+
+Uso:
+    python intent_model.py train [--decisions intent_decisions.jsonl]
+    python intent_model.py eval                  # validação cruzada no corpus
+    python intent_model.py predict <mensagem>
+"""
+import json
+import logging
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from text_utils import NEGATION_WORDS, collapse_repeats, words
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SEED_FILE = os.path.join(DATA_DIR, "intents_seed.tsv")
+MODEL_FILE = os.getenv("MYLLE_INTENT_MODEL", os.path.join(DATA_DIR, "intent_model.json"))
+DECISIONS_FILE = os.getenv("MYLLE_INTENT_DECISIONS", "intent_decisions.jsonl")  # vazio desativa o log
+DECISIONS_MAX_BYTES = int(os.getenv("MYLLE_INTENT_DECISIONS_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Dados pessoais que não vão para o log de decisões
+_REDACTIONS = [
+    (re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE), "<link>"),
+    (re.compile(r"\S+@\S+\.\w+"), "<email>"),
+    (re.compile(r"@\w+"), "<usuario>"),
+    (re.compile(r"\+?\d[\d\s().-]{3,}\d"), "<numero>"),
+    (re.compile(r"\b(me chamo|meu nome (?:é|e)|pode me chamar de)\s+\w+", re.IGNORECASE), r"\1 <nome>"),
+]
+
+def normalize_tokens(text: str) -> List[str]:
+    """Minúsculas, sem acento e com letras repetidas colapsadas ("oiii" -> "oi")."""
+    return [collapse_repeats(t) for t in words(text)]
+
+
+def features(text: str) -> List[str]:
+    tokens = normalize_tokens(text)
+    feats = [f"w:{t}" for t in tokens]
+    feats += [f"b:{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+    if len(tokens) <= 2:
+        feats.append("len:curta")
+    if "?" in text:
+        feats.append("pergunta")
+    return feats
+
+
+class IntentDecision(NamedTuple):
+    intent: str
+    confidence: float
+
+
+class IntentModel:
+    """Softmax linear com pesos esparsos por feature."""
+    def __init__(self, labels: List[str], weights: Dict[str, List[float]], bias: List[float]):
+        self.labels = labels
+        self.weights = weights
+        self.bias = bias
+
+    def scores(self, text: str) -> List[float]:
+        logits = list(self.bias)
+        for feat in features(text):
+            w = self.weights.get(feat)
+            if w:
+                for i, value in enumerate(w):
+                    logits[i] += value
+        top = max(logits)
+        exps = [math.exp(v - top) for v in logits]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def predict(self, text: str) -> IntentDecision:
+        probs = self.scores(text)
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return IntentDecision(self.labels[best], round(probs[best], 4))
+
+    def extra_words(self, text: str, intent: str) -> List[str]:
+        """Palavras da mensagem que não puxam para `intent` (peso da palavra <= 0 ou desconhecida)."""
+        index = self.labels.index(intent)
+        zero = [0.0] * len(self.labels)
+        return [t for t in normalize_tokens(text) if self.weights.get(f"w:{t}", zero)[index] <= 0]
+
+    def covers(self, text: str, decision: IntentDecision, max_extra: int = 2) -> bool:
+        """A mensagem é só a intenção prevista: sem negação e com no máximo `max_extra` palavras de fora.
+
+        A confiança sozinha não basta: "não quero saber quanto custa" sai como
+        preço e "oi, meu nome é joão" como saudação, ambos com mais de 0.95.
+        """
+        if NEGATION_WORDS.intersection(normalize_tokens(text)):
+            return False
+        return len(self.extra_words(text, decision.intent)) <= max_extra
+
+    def to_dict(self) -> Dict:
+        return {"labels": self.labels, "bias": self.bias, "weights": self.weights,
+                "trained_at": int(time.time())}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "IntentModel":
+        return cls(data["labels"], data["weights"], data["bias"])
+
+    @classmethod
+    def load(cls, path: str = MODEL_FILE) -> Optional["IntentModel"]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Modelo de intenção indisponível ({path}): {e}")
+            return None
+
+    def save(self, path: str = MODEL_FILE) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+
+
+def train(samples: List[Tuple[str, str]], epochs: int = 40, lr: float = 0.3, l2: float = 1e-4,
+          seed: int = 13) -> IntentModel:
+    """SGD de regressão logística multinomial sobre features esparsas."""
+    labels = sorted({label for label, _ in samples})
+    index = {label: i for i, label in enumerate(labels)}
+    data = [(index[label], features(text)) for label, text in samples]
+    weights: Dict[str, List[float]] = {}
+    bias = [0.0] * len(labels)
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(data)
+        step = lr / (1 + epoch * 0.1)
+        for target, feats in data:
+            logits = list(bias)
+            for feat in feats:
+                w = weights.get(feat)
+                if w:
+                    for i, value in enumerate(w):
+                        logits[i] += value
+            top = max(logits)
+            exps = [math.exp(v - top) for v in logits]
+            total = sum(exps)
+            grads = [e / total - (1.0 if i == target else 0.0) for i, e in enumerate(exps)]
+            for i, g in enumerate(grads):
+                bias[i] -= step * g
+            for feat in feats:
+                w = weights.setdefault(feat, [0.0] * len(labels))
+                for i, g in enumerate(grads):
+                    w[i] -= step * (g + l2 * w[i])
+    # Poda de pesos irrelevantes para manter o arquivo pequeno
+    pruned = {f: [round(v, 4) for v in w] for f, w in weights.items() if max(abs(v) for v in w) > 1e-3}
+    return IntentModel(labels, pruned, [round(b, 4) for b in bias])
+
+
+def load_samples(seed_file: str = SEED_FILE, decisions_file: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Corpus rotulado + decisões do app revisadas (campo "label" preenchido)."""
+    samples = []
+    with open(seed_file, encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                label, text = line.rstrip("\n").split("\t", 1)
+                samples.append((label, text))
+    # O arquivo rotacionado (.1) também tem decisões revisadas
+    for path in ([decisions_file + ".1", decisions_file] if decisions_file else []):
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("label"):
+                    samples.append((record["label"], record["text"]))
+    return samples
+
+
+def redact(text: str) -> str:
+    """Texto sem links, e-mails, @usuários, números longos (telefone, documento) e o nome informado."""
+    for pattern, placeholder in _REDACTIONS:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+class DecisionLog:
+    """Registro JSONL de cada decisão do classificador, para revisão e retreino.
+
+    Guarda só o que o retreino usa, com o texto passado por `redact`. Ao
+    passar de `max_bytes` o arquivo vira `<path>.1` (substituindo o anterior),
+    então ocupa no máximo o dobro disso. Sem `path`, nada é gravado.
+    """
+    def __init__(self, path: str = DECISIONS_FILE, max_bytes: int = DECISIONS_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def write(self, text: str, decision: IntentDecision, answered_locally: bool) -> None:
+        if not self.path:
+            return
+        record = {"text": redact(text), "intent": decision.intent, "confidence": decision.confidence,
+                  "local": answered_locally, "label": None}
+        try:
+            with self._lock:
+                try:
+                    if os.path.getsize(self.path) >= self.max_bytes:
+                        os.replace(self.path, self.path + ".1")
+                except FileNotFoundError:
+                    pass
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"Falha ao registrar decisão de intenção: {e}")
+
+
+@lru_cache(maxsize=1)
+def get_intent_model() -> Optional[IntentModel]:
+    """Modelo carregado uma vez por processo (None se o arquivo não existir)."""
+    return IntentModel.load()
+
+
+def _cross_validate(samples: List[Tuple[str, str]], folds: int = 5) -> None:
+    rng = random.Random(3)
+    samples = samples[:]
+    rng.shuffle(samples)
+    right = total = 0
+    confident = confident_right = 0
+    for k in range(folds):
+        test = samples[k::folds]
+        train_set = [s for i, s in enumerate(samples) if i % folds != k]
+        model = train(train_set)
+        for label, text in test:
+            decision = model.predict(text)
+            total += 1
+            right += decision.intent == label
+            if decision.confidence >= 0.8:
+                confident += 1
+                confident_right += decision.intent == label
+    print(f"acurácia: {right / total:.1%} ({total} amostras, {folds} folds)")
+    if confident:
+        print(f"confiança >= 0.8: {confident / total:.1%} das mensagens, precisão {confident_right / confident:.1%}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    decisions = sys.argv[sys.argv.index("--decisions") + 1] if "--decisions" in sys.argv else None
+    if command == "train":
+        corpus = load_samples(decisions_file=decisions)
+        model = train(corpus)
+        model.save()
+        print(f"✅ {len(corpus)} amostras, {len(model.weights)} features -> {MODEL_FILE}")
+    elif command == "eval":
+        _cross_validate(load_samples(decisions_file=decisions))
+    elif command == "predict" and len(sys.argv) > 2:
+        model = get_intent_model()
+        if model is None:
+            sys.exit(1)
+        text = " ".join(sys.argv[2:])
+        print(model.predict(text), dict(zip(model.labels, (round(p, 3) for p in model.scores(text)))))
+    else:
+        print(__doc__)
+        sys.exit(2)
@@ -0,0 +1,177 @@
+"""
+Servidor de mídia estática da Mylle (áudios e imagens em cache local).
+
+Serve o diretório `media/` com suporte a requisições parciais (Range),
+ETag/If-None-Match e cabeçalhos de cache longo. Arquivos com o hash do
+conteúdo no nome são marcados como imutáveis; os demais (`manifest.json`)
+mudam sob o mesmo nome e são revalidados pelo ETag a cada uso.
+
+Uso:
+    python media_server.py --port 8502 --root media
+    # e configure MYLLE_MEDIA_BASE_URL=http://<host>:8502 no app
+"""
+import argparse
+import email.utils
+import logging
+import mimetypes
+import os
+import re
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+CACHE_CONTROL_REVALIDATE = "no-cache"
+# <clipe>.<hash>.mp3, <hash>.webp, src-<hash>.jpg
+_CONTENT_ADDRESSED_RE = re.compile(r"(?:^|[.-])[0-9a-f]{12,}\.\w+$")
+CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+mimetypes.add_type("audio/mpeg", ".mp3")
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+
+
+def cache_control(path: str) -> str:
+    """Cache longo só para nomes endereçados por conteúdo."""
+    if _CONTENT_ADDRESSED_RE.search(os.path.basename(path)):
+        return CACHE_CONTROL
+    return CACHE_CONTROL_REVALIDATE
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Converte um cabeçalho Range de intervalo único em (início, fim) inclusivo.
+
+    Retorna None quando o cabeçalho é inválido ou inclui vários intervalos
+    (nesses casos o arquivo inteiro é servido) e (-1, -1) quando o intervalo
+    não pode ser satisfeito.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # sufixo: últimos N bytes
+        length = int(last)
+        if length == 0:
+            return (-1, -1)
+        return (max(0, size - length), size - 1)
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return (-1, -1)
+    return (start, min(end, size - 1))
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    """Handler GET/HEAD com Range, ETag e cache longo."""
+    server_version = "MylleMedia/1.0"
+    protocol_version = "HTTP/1.1"
+    root = "media"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _resolve(self) -> Optional[str]:
+        path = self.path.split("?", 1)[0].split("#", 1)[0]
+        root = os.path.realpath(self.root)
+        full = os.path.realpath(os.path.join(root, path.lstrip("/")))
+        if not full.startswith(root + os.sep) or not os.path.isfile(full):
+            return None
+        return full
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool) -> None:
+        path = self._resolve()
+        if not path:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+        last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self._send_cache_headers(path, etag, last_modified)
+            self.end_headers()
+            return
+
+        byte_range = None
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (not if_range or if_range == etag):
+            byte_range = parse_range(range_header, size)
+
+        if byte_range == (-1, -1):
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if byte_range:
+            start, end = byte_range
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            start, end = 0, size - 1
+            self.send_response(HTTPStatus.OK)
+
+        length = end - start + 1
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self._send_cache_headers(path, etag, last_modified)
+        self.end_headers()
+
+        if not send_body:
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def _send_cache_headers(self, path: str, etag: str, last_modified: str) -> None:
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Cache-Control", cache_control(path))
+
+
+def run_server(root: str = "media", host: str = "0.0.0.0", port: int = 8502) -> None:
+    """Sobe o servidor de mídia (bloqueante)."""
+    handler = type("BoundMediaRequestHandler", (MediaRequestHandler,), {"root": root})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    logger.info(f"Servindo {os.path.abspath(root)} em http://{host}:{port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de mídia estática da Mylle")
+    parser.add_argument("--root", default="media")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run_server(args.root, args.host, args.port)
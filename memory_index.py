@@ -0,0 +1,211 @@
+"""
+Memória de longo prazo da Mylle: índice BM25 local, por usuário, sobre as
+conversas anteriores (tabela `conversations`).
+
+Cada usuário tem um log JSONL próprio em disco (`memory/<xx>/<hash>.jsonl`),
+atualizado a cada `save_message`. O índice invertido é montado em memória só
+quando o usuário volta a conversar (carga preguiçosa) e fica num LRU limitado.
+
+Uso:
+    python memory_index.py rebuild [chat_history.db]   # reconstrói a partir do SQLite
+    python memory_index.py search <user_id> <consulta>
+"""
+import json
+import logging
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Dict, List, Optional
+
+from text_utils import WORD_RE, extract_message_text, fold_text
+
+logger = logging.getLogger(__name__)
+
+MEMORY_DIR = os.getenv("MYLLE_MEMORY_DIR", "memory")
+MAX_LOADED_USERS = 2048
+MIN_TOKENS = 2  # mensagens curtas ("oi", "kkk") não viram lembrança
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a o e é de da do das dos em no na nos nas um uma uns umas que se com por para pra pro
+me te lhe eu tu ele ela nos vc voce voces isso isto esse essa este esta aqui ai la ja
+mas mais ou nao sim so muito tambem como quando onde qual quais meu minha seu sua teu
+tua ta to tá tô foi ser estar tem ter vai vou quero ne né entao ao aos as os oi ola
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Termos indexáveis: minúsculas, sem acento, sem stopwords e números soltos."""
+    return [t for t in WORD_RE.findall(fold_text(text)) if len(t) > 1 and t not in STOPWORDS and not t.isdigit()]
+
+
+class UserIndex:
+    """Índice BM25 em memória das mensagens de um usuário."""
+    __slots__ = ("docs", "postings", "doc_lengths", "total_length")
+
+    def __init__(self):
+        self.docs: List[Dict] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+
+    def add(self, doc: Dict, terms: List[str]) -> None:
+        doc_id = len(self.docs)
+        self.docs.append(doc)
+        self.doc_lengths.append(len(terms))
+        self.total_length += len(terms)
+        for term in terms:
+            bucket = self.postings.setdefault(term, {})
+            bucket[doc_id] = bucket.get(doc_id, 0) + 1
+
+    def search(self, terms: List[str], k: int, exclude_session: Optional[str] = None) -> List[Dict]:
+        n_docs = len(self.docs)
+        if not n_docs or not terms:
+            return []
+        avg_length = self.total_length / n_docs
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            bucket = self.postings.get(term)
+            if not bucket:
+                continue
+            idf = math.log(1 + (n_docs - len(bucket) + 0.5) / (len(bucket) + 0.5))
+            for doc_id, tf in bucket.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        results = []
+        for doc_id, score in ranked:
+            doc = self.docs[doc_id]
+            if exclude_session and doc["session"] == exclude_session:
+                continue
+            results.append(dict(doc, score=round(score, 4)))
+            if len(results) >= k:
+                break
+        return results
+
+
+class MemoryIndex:
+    """Logs por usuário em disco + índices carregados sob demanda (LRU)."""
+    def __init__(self, root: str = MEMORY_DIR, max_loaded: int = MAX_LOADED_USERS):
+        self.root = root
+        self.max_loaded = max_loaded
+        self._loaded: "OrderedDict[str, UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.searches = 0
+
+    def _path(self, user_id: str) -> str:
+        digest = blake2b(user_id.encode("utf-8"), digest_size=12).hexdigest()
+        return os.path.join(self.root, digest[:2], f"{digest}.jsonl")
+
+    def _load(self, user_id: str) -> UserIndex:
+        """Índice do usuário, lendo o log do disco na primeira vez."""
+        index = self._loaded.get(user_id)
+        if index is not None:
+            self._loaded.move_to_end(user_id)
+            return index
+        index = UserIndex()
+        try:
+            with open(self._path(user_id), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        doc = json.loads(line)
+                    except ValueError:
+                        continue  # linha truncada por queda no meio da escrita
+                    index.add(doc, tokenize(doc["text"]))
+        except FileNotFoundError:
+            pass
+        self.loads += 1
+        self._loaded[user_id] = index
+        if len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+        return index
+
+    def add(self, user_id: str, session_id: str, role: str, content: str,
+            timestamp: Optional[float] = None) -> bool:
+        """Indexa uma mensagem salva (append no log + atualização do índice carregado)."""
+        text = extract_message_text(content).strip()
+        terms = tokenize(text)
+        if len(terms) < MIN_TOKENS:
+            return False
+        doc = {"session": session_id, "role": role, "text": text, "ts": int(timestamp or time.time())}
+        path = self._path(user_id)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+            index = self._loaded.get(user_id)
+            if index is not None:
+                index.add(doc, terms)
+        return True
+
+    def search(self, user_id: str, query: str, k: int = 3, exclude_session: Optional[str] = None) -> List[Dict]:
+        """Top-k mensagens anteriores mais relevantes para a consulta."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            self.searches += 1
+            return self._load(user_id).search(terms, k, exclude_session)
+
+    def forget(self, user_id: str) -> None:
+        """Remove o log e o índice de um usuário."""
+        with self._lock:
+            self._loaded.pop(user_id, None)
+            try:
+                os.remove(self._path(user_id))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict:
+        return {"loaded_users": len(self._loaded), "loads": self.loads, "searches": self.searches}
+
+    def rebuild(self, db_path: str) -> int:
+        """Recria todos os logs a partir da tabela `conversations`."""
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("""SELECT user_id, session_id, role, content, timestamp
+                               FROM conversations ORDER BY id""").fetchall()
+        conn.close()
+        with self._lock:
+            self._loaded.clear()
+        for user_id in {row[0] for row in rows}:
+            try:
+                os.remove(self._path(user_id))
+            except FileNotFoundError:
+                pass
+        count = 0
+        for user_id, session_id, role, content, timestamp in rows:
+            try:
+                ts = time.mktime(time.strptime(str(timestamp)[:19], "%Y-%m-%d %H:%M:%S"))
+            except ValueError:
+                ts = None
+            count += self.add(user_id, session_id, role, content or "", ts)
+        return count
+
+
+@lru_cache(maxsize=1)
+def get_memory_index() -> MemoryIndex:
+    """Instância única do índice de memória por processo."""
+    return MemoryIndex()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    memory = get_memory_index()
+    if command == "rebuild":
+        db = sys.argv[2] if len(sys.argv) > 2 else "chat_history.db"
+        print(f"✅ {memory.rebuild(db)} mensagens indexadas em {memory.root}")
+    elif command == "search" and len(sys.argv) > 3:
+        for hit in memory.search(sys.argv[2], " ".join(sys.argv[3:]), k=5):
+            print(f"{hit['score']:6.2f}  [{hit['role']}] {hit['text']}")
+    else:
+        print(__doc__)
+        sys.exit(2)
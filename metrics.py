@@ -0,0 +1,286 @@
+"""
+Registro de métricas do chatbot exposto em HTTP no formato texto do Prometheus.
+
+Contadores, gauges e histogramas com rótulos, mais "coletores" que leem as
+estatísticas já mantidas pelos componentes (cache de respostas, memo de
+sentimento, latência por etapa) só no momento da coleta. O endpoint roda
+numa thread própria (`/metrics`), fora do ciclo de rerun do Streamlit.
+
+Uso:
+    python metrics.py scrape [url] [intervalo_s]   # coletor local: lê o endpoint e mostra as taxas
+"""
+import bisect
+import logging
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Dict[str, str]
+
+
+class Histogram:
+    """Histograma de buckets fixos com limites superiores inclusivos (estilo Prometheus)."""
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # último = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Limite superior do bucket que contém o quantil q (aproximado)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict:
+        cumulative = {}
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            cumulative[bound] = seen
+        return {"buckets": cumulative, "count": self.count, "sum": self.sum,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95)}
+
+
+# Uma família coletada: (nome, tipo, ajuda, [(rótulos, valor ou Histogram)])
+Series = List[Tuple[Labels, Union[float, Histogram]]]
+Family = Tuple[str, str, str, Series]
+Collector = Callable[[], Iterable[Family]]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def collect(self) -> Family:
+        with self._lock:
+            items = list(self._values.items())
+        return self.name, self.kind, self.help, [(dict(zip(self.labels, key)), value) for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class HistogramMetric(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        histogram = self._values.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._values.setdefault(key, Histogram(self.buckets))
+        histogram.observe(value)
+
+
+class ActivityTracker:
+    """Chaves (sessões) vistas na janela recente; o total é calculado na coleta."""
+    def __init__(self, window: float = 300.0):
+        self.window = window
+        self._last_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, key: str) -> None:
+        with self._lock:
+            self._last_seen[key] = time.time()
+
+    def active(self) -> int:
+        cutoff = time.time() - self.window
+        with self._lock:
+            for key in [k for k, seen in self._last_seen.items() if seen < cutoff]:
+                del self._last_seen[key]
+            return len(self._last_seen)
+
+
+class MetricsRegistry:
+    """Métricas nomeadas (registrar de novo devolve a mesma) e coletores por nome."""
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Collector] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...],
+                  labels: Tuple[str, ...] = ()) -> HistogramMetric:
+        return self._register(HistogramMetric(name, help_text, buckets, labels))
+
+    def add_collector(self, name: str, collector: Collector) -> None:
+        with self._lock:
+            self._collectors[name] = collector
+
+    def collect(self) -> List[Family]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        families = [metric.collect() for metric in metrics]
+        for name, collector in collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.warning(f"Coletor de métricas '{name}' falhou: {e}")
+        return families
+
+    def snapshot(self) -> Dict[str, Series]:
+        """Séries atuais por nome de métrica (para telas dentro do próprio app)."""
+        return {name: series for name, _, _, series in self.collect()}
+
+    def render(self) -> str:
+        return render(self.collect())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(families: Iterable[Family]) -> str:
+    """Formato de exposição texto 0.0.4 do Prometheus."""
+    lines = []
+    for name, kind, help_text, series in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if isinstance(value, Histogram):
+                for bound, count in value.snapshot()["buckets"].items():
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels(dict(labels, le=le))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def start_http_server(registry: MetricsRegistry, port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serve `GET /metrics` numa thread daemon; None se a porta não puder ser aberta."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        logger.warning(f"Endpoint de métricas indisponível em {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Métricas em http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def parse(text: str) -> Dict[str, float]:
+    """Amostras `nome{rótulos}` -> valor de uma exposição texto."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, _, value = line.rpartition(" ")
+            samples[key] = float(value)
+    return samples
+
+
+def _scrape_loop(url: str, interval: float) -> None:
+    import requests
+
+    previous, previous_at = None, None
+    while True:
+        samples = parse(requests.get(url, timeout=5).text)
+        now = time.time()
+        if previous is not None:
+            elapsed = now - previous_at
+            rates = {k: (v - previous.get(k, 0.0)) / elapsed for k, v in samples.items()
+                     if k.split("{")[0].endswith("_total") and v != previous.get(k, 0.0)}
+            print(time.strftime("%H:%M:%S"), " ".join(f"{k}={v:.2f}/s" for k, v in sorted(rates.items())) or "-")
+        previous, previous_at = samples, now
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "scrape":
+        target = sys.argv[2] if len(sys.argv) > 2 else "http://127.0.0.1:9464/metrics"
+        try:
+            _scrape_loop(target, float(sys.argv[3]) if len(sys.argv) > 3 else 5.0)
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(__doc__)
+        sys.exit(2)
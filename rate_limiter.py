@@ -0,0 +1,208 @@
+"""
+Limitador de mensagens por token bucket, compartilhado entre sessões.
+
+Cada mensagem gasta uma ficha de todos os baldes da requisição (usuário e
+impressão digital do cliente); os baldes se recarregam continuamente até a
+capacidade. Abrir outra aba ou limpar a conversa não devolve fichas, porque
+o estado fica fora da sessão do Streamlit:
+
+- `SQLiteBucketStore`: um nó (vários processos no mesmo disco), transação
+  BEGIN IMMEDIATE com leitura e escrita por chave primária;
+- `RedisBucketStore`: vários nós, script Lua atômico (requer o pacote `redis`).
+
+A consulta é O(1) por balde e tudo-ou-nada: se um balde nega, nenhum é debitado.
+
+O endereço do cliente vem da conexão; `X-Forwarded-For` só é lido até o
+número de proxies confiáveis na frente do app (contados da direita), porque
+o resto do cabeçalho é escrito pelo próprio cliente.
+"""
+import ipaddress
+import random
+import sqlite3
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from db_pool import SQLitePool
+
+# (chave, capacidade, fichas por segundo)
+Bucket = Tuple[str, float, float]
+
+
+def client_ip(peer: Optional[str], forwarded_for: str = "", trusted_hops: int = 0) -> str:
+    """IP do cliente: a conexão ou, atrás de `trusted_hops` proxies, a entrada que o mais externo anotou."""
+    chain = [part.strip() for part in (forwarded_for or "").split(",") if part.strip()]
+    if trusted_hops > 0 and chain:
+        return chain[-min(trusted_hops, len(chain))]
+    return peer or ""
+
+
+def network_of(ip: str) -> str:
+    """Chave da rede do cliente: o IPv4 inteiro ou o prefixo /64 do IPv6 ("" se inválido)."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return ""
+    if address.version == 6:
+        if address.ipv4_mapped:
+            return str(address.ipv4_mapped)
+        return str(ipaddress.ip_network(f"{address}/64", strict=False))
+    return str(address)
+
+
+class RateDecision(NamedTuple):
+    allowed: bool
+    remaining: float     # fichas no balde mais vazio após a decisão
+    retry_after: float   # segundos até haver fichas suficientes (0 se permitido)
+
+
+def _refill(tokens: Optional[float], updated: Optional[float], capacity: float, rate: float, now: float) -> float:
+    if tokens is None:
+        return capacity
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def _decide(levels: List[float], buckets: Sequence[Bucket], cost: float) -> RateDecision:
+    allowed = all(level >= cost for level in levels)
+    if allowed:
+        return RateDecision(True, min(level - cost for level in levels), 0.0)
+    retry = max((cost - level) / rate for level, (_, _, rate) in zip(levels, buckets) if level < cost)
+    return RateDecision(False, min(levels), retry)
+
+
+class SQLiteBucketStore:
+    """Baldes numa tabela SQLite (WAL); seguro entre threads e processos do mesmo nó.
+
+    As conexões vêm de um SQLitePool (cada rerun do Streamlit roda numa thread nova).
+    """
+    PRUNE_PROBABILITY = 0.001
+
+    def __init__(self, path: str = "rate_limits.db", pool_size: int = 16):
+        self.path = path
+        self._pool = SQLitePool(self._connect, pool_size)
+        with self._pool.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS rate_buckets
+                            (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)""")
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: as transações são abertas explicitamente
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def take(self, buckets: Sequence[Bucket], cost: float = 1.0, now: Optional[float] = None) -> RateDecision:
+        now = time.time() if now is None else now
+        with self._pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                levels = []
+                for key, capacity, rate in buckets:
+                    row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                    levels.append(_refill(row[0] if row else None, row[1] if row else None, capacity, rate, now))
+                decision = _decide(levels, buckets, cost)
+                spent = cost if decision.allowed else 0.0
+                conn.executemany("INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                                 [(key, level - spent, now) for (key, _, _), level in zip(buckets, levels)])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if random.random() < self.PRUNE_PROBABILITY:
+            self.prune(max((capacity / rate for _, capacity, rate in buckets), default=0.0), now)
+        return decision
+
+    def prune(self, full_after: float, now: Optional[float] = None) -> int:
+        """Apaga baldes que já estariam cheios de novo (equivalem a não existir)."""
+        now = time.time() if now is None else now
+        with self._pool.connection() as conn:
+            return conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - full_after,)).rowcount
+
+
+class RedisBucketStore:
+    """Baldes em hashes do Redis, atualizados por um script Lua (atômico no servidor)."""
+    SCRIPT = """
+    local cost = tonumber(ARGV[1])
+    local now = tonumber(ARGV[2])
+    local levels = {}
+    local allowed = 1
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[1 + i * 2])
+        local rate = tonumber(ARGV[2 + i * 2])
+        local state = redis.call('HMGET', key, 'tokens', 'updated')
+        local level = capacity
+        if state[1] then
+            level = math.min(capacity, tonumber(state[1]) + math.max(0, now - tonumber(state[2])) * rate)
+        end
+        levels[i] = level
+        if level < cost then allowed = 0 end
+    end
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[1 + i * 2])
+        local rate = tonumber(ARGV[2 + i * 2])
+        local level = levels[i] - cost * allowed
+        redis.call('HSET', key, 'tokens', level, 'updated', now)
+        redis.call('EXPIRE', key, math.ceil(capacity / rate))
+        levels[i] = tostring(levels[i])
+    end
+    return levels
+    """
+
+    def __init__(self, url: str, prefix: str = "mylle:rate:"):
+        import redis  # dependência opcional, só no modo com vários nós
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def take(self, buckets: Sequence[Bucket], cost: float = 1.0, now: Optional[float] = None) -> RateDecision:
+        now = time.time() if now is None else now
+        args = [cost, now]
+        for _, capacity, rate in buckets:
+            args += [capacity, rate]
+        levels = [float(v) for v in self._script(keys=[self.prefix + key for key, _, _ in buckets], args=args)]
+        return _decide(levels, buckets, cost)
+
+
+class TokenBucketLimiter:
+    """Baldes por usuário, por impressão digital do cliente e por rede.
+
+    O balde da impressão digital é maior (várias pessoas podem sair pelo mesmo
+    IP), mas segura quem troca de id de usuário a cada aba. O da rede só
+    depende do endereço, então trocar de user agent também não zera a conta.
+    """
+    def __init__(self, store, capacity: float, window: float, fingerprint_factor: float = 3.0,
+                 network_factor: float = 10.0):
+        self.store = store
+        self.capacity = capacity
+        self.rate = capacity / window
+        self.fingerprint_factor = fingerprint_factor
+        self.network_factor = network_factor
+        self.allowed = 0
+        self.denied = 0
+
+    def take(self, user_id: str, fingerprint: Optional[str] = None, cost: float = 1.0,
+             capacity: Optional[float] = None, network: Optional[str] = None) -> RateDecision:
+        """Debita `cost` fichas; `capacity` substitui a capacidade do balde do usuário."""
+        capacity = self.capacity if capacity is None else capacity
+        buckets: List[Bucket] = [(f"u:{user_id}", capacity, capacity / self.capacity * self.rate)]
+        if fingerprint:
+            fp_capacity = self.capacity * self.fingerprint_factor
+            buckets.append((f"f:{fingerprint}", fp_capacity, self.rate * self.fingerprint_factor))
+        if network:
+            buckets.append((f"n:{network}", self.capacity * self.network_factor, self.rate * self.network_factor))
+        decision = self.store.take(buckets, cost)
+        if decision.allowed:
+            self.allowed += 1
+        else:
+            self.denied += 1
+        return decision
+
+    def stats(self):
+        return {"allowed": self.allowed, "denied": self.denied}
+
+
+def create_store(url: str = ""):
+    """`redis://...` para vários nós; caso contrário, caminho do arquivo SQLite."""
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBucketStore(url)
+    return SQLiteBucketStore(url or "rate_limits.db")
@@ -0,0 +1,235 @@
+"""
+Cache de respostas por similaridade: reaproveita respostas do Gemini para
+mensagens quase iguais ("oi amor", "oii amor", "oi meu amor") de qualquer
+usuário, dentro do mesmo escopo (persona, estágio da conversa, decisão de CTA).
+
+A mensagem é normalizada (minúsculas, sem acento, sem emoji, letras repetidas
+colapsadas) e vira um conjunto de trigramas de caracteres. Assinaturas MinHash
+divididas em bandas (LSH) encontram candidatos sem varrer o cache; a
+similaridade de Jaccard exata dos candidatos decide o reaproveitamento. As
+negações ("não", "nunca", "nem"...) precisam ser as mesmas nas duas mensagens:
+"não quero" e "quero" diferem em poucos trigramas, mas não no sentido.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from text_utils import NEGATION_WORDS, collapse_repeats, fold_text
+
+logger = logging.getLogger(__name__)
+
+_PRIME = (1 << 31) - 1
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+
+# Palavras de preenchimento que não mudam o sentido da mensagem
+FILLER_WORDS = frozenset({"meu", "minha", "ne", "ai", "entao", "tipo", "assim", "mesmo", "so", "hein", "ein"})
+# Negações (NEGATION_WORDS): só casa com uma mensagem que tenha as mesmas
+
+QualityHook = Callable[[Dict], None]
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acento, sem emoji/pontuação, letras repetidas colapsadas."""
+    text = _NON_WORD_RE.sub(" ", fold_text(text)).replace("_", " ")
+    words = [collapse_repeats(w) for w in text.split()]
+    return " ".join(w for w in words if w not in FILLER_WORDS)
+
+
+def shingles(normalized: str, n: int = 3) -> FrozenSet[str]:
+    padded = f" {normalized} "
+    if len(padded) <= n:
+        return frozenset({padded})
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash com permutações universais (a*x + b mod 2^31-1), vetorizado com NumPy."""
+    def __init__(self, num_perm: int = 32, seed: int = 1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._a = self._b = None
+
+    def signature(self, grams: FrozenSet[str]) -> Tuple[int, ...]:
+        import numpy as np  # importado no primeiro uso (partida mais rápida)
+        if self._a is None:
+            self._a = np.array([a for a, _ in self.params], dtype=np.uint64)[:, None]
+            self._b = np.array([b for _, b in self.params], dtype=np.uint64)[:, None]
+        # 32 bits de um hash estável por trigrama; a*h cabe em 63 bits
+        hashes = np.fromiter((int.from_bytes(blake2b(g.encode("utf-8"), digest_size=4).digest(), "little")
+                              for g in grams), dtype=np.uint64, count=len(grams))
+        return tuple(((self._a * hashes + self._b) % _PRIME).min(axis=1).tolist())
+
+
+class _Entry:
+    __slots__ = ("query", "words", "grams", "response", "scope", "band_keys", "created", "hits")
+
+    def __init__(self, query, words, grams, response, scope, band_keys):
+        self.query = query
+        self.words = words
+        self.grams = grams
+        self.response = response
+        self.scope = scope
+        self.band_keys = band_keys
+        self.created = time.time()
+        self.hits = 0
+
+
+class SemanticResponseCache:
+    """Cache LRU com TTL e índice LSH por escopo.
+
+    Um candidato é reaproveitado se tem as mesmas palavras (normalizadas) ou
+    Jaccard de trigramas >= threshold, e em ambos os casos as mesmas negações.
+    """
+    MAX_CANDIDATES = 32  # Jaccard exato só nos candidatos com mais bandas em comum
+
+    def __init__(self, threshold: float = 0.8, max_entries: int = 5000, ttl: float = 6 * 3600,
+                 num_perm: int = 32, bands: int = 8, max_words: int = 12, sample_rate: float = 0.05):
+        if num_perm % bands:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_words = max_words
+        self.sample_rate = sample_rate
+        self.hasher = MinHasher(num_perm)
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._quality_hooks: List[QualityHook] = []
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+    # ---------- ganchos de qualidade ----------
+    def add_quality_hook(self, hook: QualityHook) -> None:
+        """Registra um gancho chamado para uma amostra (sample_rate) dos acertos."""
+        self._quality_hooks.append(hook)
+
+    def _sample_hit(self, record: Dict) -> None:
+        if not self._quality_hooks or random.random() >= self.sample_rate:
+            return
+        for hook in self._quality_hooks:
+            try:
+                hook(record)
+            except Exception as e:
+                logger.warning(f"Gancho de qualidade do cache falhou: {e}")
+
+    # ---------- índice ----------
+    def _prepare(self, text: str):
+        """(palavras, trigramas) da mensagem normalizada, ou (None, None) se não entra no cache."""
+        normalized = normalize(text)
+        words = normalized.split()
+        if not words or len(words) > self.max_words:
+            return None, None
+        return frozenset(words), shingles(normalized)
+
+    def _band_keys(self, scope: Hashable, grams: FrozenSet[str]) -> List[Tuple]:
+        sig = self.hasher.signature(grams)
+        return [(scope, band, sig[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        for key in entry.band_keys:
+            bucket = self._buckets.get(key)
+            if bucket:
+                try:
+                    bucket.remove(entry_id)
+                except ValueError:
+                    pass
+                if not bucket:
+                    del self._buckets[key]
+
+    def lookup(self, text: str, scope: Hashable) -> Optional[Dict]:
+        """Resposta de uma mensagem quase igual no mesmo escopo, ou None."""
+        words, grams = self._prepare(text)
+        with self._lock:
+            self.lookups += 1
+        if grams is None:
+            return None
+        band_keys = self._band_keys(scope, grams)
+        negations = words & NEGATION_WORDS
+        now = time.time()
+        with self._lock:
+            collisions: Dict[int, int] = {}
+            for key in band_keys:
+                for entry_id in self._buckets.get(key, ()):
+                    collisions[entry_id] = collisions.get(entry_id, 0) + 1
+            if len(collisions) > self.MAX_CANDIDATES:
+                candidates = sorted(collisions, key=collisions.get, reverse=True)[:self.MAX_CANDIDATES]
+            else:
+                candidates = list(collisions)
+            best, best_sim = None, 0.0
+            for entry_id in candidates:
+                entry = self._entries.get(entry_id)
+                if entry is None:
+                    continue
+                if now - entry.created > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                if entry.words & NEGATION_WORDS != negations:
+                    continue
+                sim = 1.0 if entry.words == words else jaccard(grams, entry.grams)
+                if sim > best_sim:
+                    best, best_sim = entry_id, sim
+            if best is None or best_sim < self.threshold:
+                return None
+            entry = self._entries[best]
+            self._entries.move_to_end(best)
+            entry.hits += 1
+            self.hits += 1
+            response = json.loads(json.dumps(entry.response))
+            record = {"query": text, "matched": entry.query, "similarity": round(best_sim, 3),
+                      "scope": entry.scope, "response": response}
+        self._sample_hit(record)
+        return response
+
+    def store(self, text: str, scope: Hashable, response: Dict) -> bool:
+        words, grams = self._prepare(text)
+        if grams is None:
+            return False
+        band_keys = self._band_keys(scope, grams)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(text, words, grams, json.loads(json.dumps(response)), scope, band_keys)
+            for key in band_keys:
+                self._buckets.setdefault(key, []).append(entry_id)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "lookups": self.lookups, "hits": self.hits,
+                    "hit_ratio": self.hits / self.lookups if self.lookups else 0.0,
+                    "stores": self.stores, "evictions": self.evictions}
+
+
+def jsonl_quality_hook(path: str) -> QualityHook:
+    """Gancho padrão: grava os acertos amostrados num JSONL para revisão humana."""
+    lock = threading.Lock()
+
+    def hook(record: Dict) -> None:
+        line = json.dumps(dict(record, scope=list(record["scope"]) if isinstance(record["scope"], tuple)
+                               else record["scope"], ts=int(time.time())), ensure_ascii=False)
+        with lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    return hook
@@ -0,0 +1,318 @@
+"""
+Pools de respostas pré-geradas por (persona, humor, intenção).
+
+As aberturas, os follow-ups e as respostas das intenções comuns saem de
+pools grandes gerados offline (`data/response_pools.json`), em vez das
+poucas frases fixas do código. O job offline usa o Gemini ou, sem chave/rede,
+um gerador local combinatório a partir de fragmentos escritos à mão.
+
+No app, cada usuário percorre o pool de uma chave numa permutação própria
+(semente = usuário + chave + versão do arquivo): nenhuma resposta se repete
+até o pool inteiro ter sido usado, e o estado por usuário é só a posição.
+
+Uso:
+    python response_pools.py generate [--backend local|gemini] [--size 30]
+    python response_pools.py show <persona> <humor> <intencao> [n]
+    python response_pools.py stats
+"""
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import textwrap
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+POOLS_FILE = os.getenv("MYLLE_RESPONSE_POOLS", os.path.join(DATA_DIR, "response_pools.json"))
+DEFAULT_SIZE = 30
+MAX_CHARS = 180
+
+# Marcador substituído pela saudação do horário (com o nome, se conhecido)
+GREETING_SLOT = "{saudacao}"
+
+PERSONAS = ("manha", "tarde", "noite", "madrugada")
+HUMORS = ("fim_de_semana", "normal", "otimo", "carente")
+
+INTENTS = {
+    "abertura": "primeira mensagem da Mylle para um cliente que acabou de abrir o chat; "
+                f"comece com o marcador {GREETING_SLOT} e termine com uma pergunta (nome, cidade ou como a achou); "
+                "vocês nunca conversaram antes",
+    "follow_up": "mensagem curta para um cliente que parou de responder há alguns minutos",
+    "saudacao": "resposta a um 'oi' do cliente, puxando assunto (pode ser o primeiro contato: "
+                "nada de 'senti sua falta')",
+    "preco": "resposta a quem pergunta o preço dos packs, convidando a ver os valores",
+    "amostra": "resposta a quem pede uma amostra grátis, oferecendo as prévias da galeria",
+}
+
+# CTA de cada intenção (None = sem CTA); o rótulo varia por resposta
+INTENT_CTA = {
+    "preco": ("offers", ["🎁 Ver Packs VIP", "💰 Ver Valores", "🔥 Aproveitar Desconto", "💎 Escolher Meu Pack"]),
+    "amostra": ("gallery", ["📸 Ver Amostras", "👀 Ver Prévias", "📸 Galeria", "🔥 Espiar Agora"]),
+}
+
+# ---------- gerador local (fragmentos) ----------
+PERSONA_TONES = {
+    "manha": (["Ainda tô de pijama aqui", "Comecei o dia toda preguiçosa", "Manhã de café e preguiça por aqui",
+               "Acordei pensando em você", "Café na mão e você na cabeça"], ["☀️", "😘", "🥰"]),
+    "tarde": (["Essa tarde tá pedindo companhia", "Tô de bobeira aqui à tarde", "Tarde quente por aqui",
+               "Fugi do calor e vim te ver"], ["🌅", "😏", "🔥"]),
+    "noite": (["A noite tá só começando", "Noite perfeita pra conversar", "Acabei de sair do banho",
+               "Já deitei e lembrei de você"], ["🌙", "😈", "💋"]),
+    "madrugada": (["Sem sono nenhum aqui", "Essa hora só os especiais aparecem", "Madrugada é meu horário preferido",
+                   "Tô aqui no escurinho"], ["🌙", "🤫", "😈"]),
+}
+
+HUMOR_TONES = {
+    "fim_de_semana": (["e fim de semana me deixa animada", "e hoje é dia de se divertir", "e tô sem pressa nenhuma"],
+                      ["🎉", "🔥"]),
+    "normal": (["", "e tô de boa", "e tô toda atenta a você"], ["😘", "😏"]),
+    "otimo": (["e hoje eu tô impossível", "e tô com a corda toda", "e tô criativa hoje"], ["🔥", "😈"]),
+    "carente": (["e tô manhosa hoje", "e tô precisando de atenção", "e senti tua falta"], ["🥺", "💋"]),
+}
+
+# Frases que pressupõem conversa anterior ("senti tua falta"): nunca no primeiro contato
+FAMILIAR_LINES = frozenset({
+    "Acordei pensando em você", "Café na mão e você na cabeça", "Fugi do calor e vim te ver",
+    "Já deitei e lembrei de você", "e tô toda atenta a você", "e senti tua falta",
+})
+
+# Regras de slot por intenção: (tom da persona, tom do humor, frases de quem já conversou).
+# Abertura e saudação podem ser o primeiro contato; preço e amostra respondem
+# direto (só o cenário, sem o humor); o follow-up vem no meio de uma conversa.
+INTENT_SLOTS = {
+    "abertura": (True, True, False),
+    "saudacao": (True, False, False),
+    "preco": (True, False, False),
+    "amostra": (True, False, False),
+    "follow_up": (True, True, True),
+}
+
+# (texto, áudio opcional)
+INTENT_BODIES = {
+    "abertura": [
+        ("Finalmente chegou até mim! Como me achou, gostoso?", None),
+        ("Que delícia te ver aqui... me conta seu nome, amor?", None),
+        ("Bem-vindo ao meu cantinho... de onde você é?", None),
+        ("Me conta, o que te trouxe até aqui?", None),
+        ("Quero saber tudo de você... como te chamo?", None),
+        ("Chegou na hora certa, viu? De onde tá falando comigo?", None),
+        ("Adoro gente nova por aqui... qual seu nome, gato?", None),
+    ],
+    "follow_up": [
+        ("Vida, tô esperando você me responder gatinho... O que aconteceu?", "vida_to_esperando_voce_me_responder_gatinho"),
+        ("Ei, sumido! Tô aqui esperando sua resposta...", None),
+        ("Oi amor, ainda tá aí? Me responde...", None),
+        ("Me deixou falando sozinha, foi?", None),
+        ("Cadê você, gato? Fiquei curiosa...", None),
+        ("Tá ocupado? Volta aqui que a conversa tava boa...", None),
+    ],
+    "saudacao": [
+        ("Oi amor! Tudo bem com você?", "oi_meu_amor_tudo_bem"),
+        ("Oiii gato, que bom que apareceu... tudo bem contigo?", None),
+        ("Oi delícia! Me conta, o que você tá aprontando hoje?", None),
+        ("Hmm, olha quem chegou... oi meu bem", None),
+        ("Oi vida! Como foi seu dia até agora?", None),
+        ("Oi gostoso, tava mesmo querendo alguém pra conversar", None),
+    ],
+    "preco": [
+        ("Meus packs começam bem acessíveis, amor... dá uma olhada nas opções que separei pra você", None),
+        ("Tenho três packs, cada um mais quente que o outro. Vem ver os valores e escolhe o seu",
+         "eu_tenho_uns_conteudos_que_vai_amar"),
+        ("Hoje tá com desconto especial, amor... mas só até acabar as vagas", None),
+        ("Tem pack pra todo gosto e todo bolso, gato... quer ver?", None),
+        ("Os valores tão aqui embaixo, e o mais completo é o que eu mais recomendo", None),
+    ],
+    "amostra": [
+        ("Claro que tenho um gostinho pra você, amor... dá uma espiada", "claro_tenho_amostra_gratis"),
+        ("Separei umas prévias só pra você... depois me diz o que achou", "o_que_achou_amostras"),
+        ("Um pouquinho eu mostro... o resto é só pra quem é VIP", None),
+        ("Deixei umas fotinhas na galeria pra você provar antes", None),
+        ("Amostra eu tenho sim, mas cuidado que vicia...", None),
+    ],
+}
+
+
+def pool_key(persona: str, humor: str, intent: str) -> str:
+    return f"{persona}|{humor}|{intent}"
+
+
+def _with_cta(entry: Dict, intent: str, rng: random.Random) -> Dict:
+    cta = INTENT_CTA.get(intent)
+    entry["cta"] = {"show": True, "label": rng.choice(cta[1]), "target": cta[0]} if cta else {"show": False}
+    return entry
+
+
+def _clash(lead: str, mood: str) -> bool:
+    """Tom da persona e do humor repetindo palavra ("Acordei ... e acordei ...")."""
+    words = lambda text: {w.strip(".,!?").lower() for w in text.split() if len(w) > 3}
+    return bool(words(lead) & words(mood))
+
+
+def generate_local(persona: str, humor: str, intent: str, size: int = DEFAULT_SIZE, seed: int = 0) -> List[Dict]:
+    """Combina tom da persona + tom do humor + corpo da intenção (regras de INTENT_SLOTS), sem repetir texto."""
+    rng = random.Random(f"{seed}|{pool_key(persona, humor, intent)}")
+    use_lead, use_mood, familiar = INTENT_SLOTS[intent]
+    allowed = lambda lines: [line for line in lines if familiar or line not in FAMILIAR_LINES]
+    persona_lines, persona_emojis = PERSONA_TONES[persona]
+    humor_lines, humor_emojis = HUMOR_TONES[humor]
+    leads = (allowed(persona_lines) if use_lead else []) + [""]
+    moods = allowed(humor_lines) if use_mood else [""]
+    combos = [combo for combo in itertools.product(leads, moods, INTENT_BODIES[intent], persona_emojis + humor_emojis)
+              if not _clash(combo[0], combo[1])]
+    rng.shuffle(combos)
+    entries, seen = [], set()
+    for lead, mood, (body, audio), emoji in combos:
+        opener = f"{lead} {mood}".strip() if lead else ""
+        text = f"{opener[0].upper()}{opener[1:]}... {body}" if opener else body
+        if intent == "abertura":
+            text = f"{GREETING_SLOT} {text}"
+        text = f"{text} {emoji}"
+        if text in seen or len(text) > MAX_CHARS:
+            continue
+        seen.add(text)
+        entry = {"text": text}
+        if audio:
+            entry["audio"] = audio
+        entries.append(_with_cta(entry, intent, rng))
+        if len(entries) >= size:
+            break
+    return entries
+
+
+def generate_gemini(persona: str, humor: str, intent: str, size: int = DEFAULT_SIZE, seed: int = 0) -> List[Dict]:
+    """Pede ao Gemini `size` variações no tom da persona/humor (mesmo modelo do app)."""
+    import requests
+    from chatbot import Config, DynamicPersonality, Persona
+
+    prompt = (
+        f"{textwrap.dedent(Persona.MYLLE_BASE).strip()}\n\n"
+        f"Persona do momento: {DynamicPersonality.PERSONAS[persona]}\n"
+        f"Humor: {DynamicPersonality.HUMORS[humor]}\n\n"
+        f"Escreva {size} variações diferentes de: {INTENTS[intent]}.\n"
+        f"Cada uma com no máximo {MAX_CHARS} caracteres, português informal, no máximo dois emojis.\n"
+        'Responda APENAS com um array JSON de strings.'
+    )
+    data = {
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "generationConfig": {"temperature": 1.1, "topP": 0.95, "responseMimeType": "application/json"},
+    }
+    response = requests.post(Config.API_URL, json=data, timeout=Config.REQUEST_TIMEOUT)
+    response.raise_for_status()
+    texts = json.loads(response.json()["candidates"][0]["content"]["parts"][0]["text"])
+    rng = random.Random(f"{seed}|{pool_key(persona, humor, intent)}")
+    entries, seen = [], set()
+    for text in texts:
+        text = str(text).strip()
+        if not text or text in seen or len(text) > MAX_CHARS:
+            continue
+        if intent == "abertura" and not text.startswith(GREETING_SLOT):
+            continue
+        seen.add(text)
+        entries.append(_with_cta({"text": text}, intent, rng))
+    return entries[:size]
+
+
+def generate(backend: str = "local", size: int = DEFAULT_SIZE, seed: int = 0) -> Dict:
+    """Gera todos os pools; no backend gemini, chaves que falham caem no gerador local."""
+    pools = {}
+    for persona, humor, intent in itertools.product(PERSONAS, HUMORS, INTENTS):
+        entries = []
+        if backend == "gemini":
+            try:
+                entries = generate_gemini(persona, humor, intent, size, seed)
+            except Exception as e:
+                logger.warning(f"Gemini falhou para {pool_key(persona, humor, intent)}: {e}")
+        if len(entries) < size // 2:
+            entries = generate_local(persona, humor, intent, size, seed)
+        pools[pool_key(persona, humor, intent)] = entries
+    return {"version": int(time.time()), "pools": pools}
+
+
+class ResponsePools:
+    """Pools carregados do JSON com amostragem sem repetição por usuário."""
+    def __init__(self, pools: Dict[str, List[Dict]], version: int = 0):
+        self.pools = pools
+        self.version = version
+
+    @classmethod
+    def load(cls, path: str = POOLS_FILE) -> Optional["ResponsePools"]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data["pools"], data.get("version", 0))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Pools de respostas indisponíveis ({path}): {e}")
+            return None
+
+    def save(self, path: str = POOLS_FILE) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "pools": self.pools}, f, ensure_ascii=False, separators=(",", ":"))
+
+    def size(self, key: str) -> int:
+        return len(self.pools.get(key, ()))
+
+    def _order(self, key: str, user_id: str, cycle: int) -> List[int]:
+        n = self.size(key)
+        return random.Random(f"{user_id}|{key}|{self.version}|{cycle}").sample(range(n), n)
+
+    def pick(self, key: str, user_id: str, position: int) -> Optional[Dict]:
+        """Entrada na `position`-ésima vez que o usuário usa esta chave.
+
+        Cada ciclo é uma permutação completa do pool; a primeira de um ciclo
+        nunca repete a última do ciclo anterior.
+        """
+        n = self.size(key)
+        if not n:
+            return None
+        cycle, index = divmod(position, n)
+        order = self._order(key, user_id, cycle)
+        if cycle and n > 1 and order[0] == self._order(key, user_id, cycle - 1)[-1]:
+            order[0], order[1] = order[1], order[0]
+        return json.loads(json.dumps(self.pools[key][order[index]]))
+
+    def audio_references(self) -> List[str]:
+        return [e["audio"] for entries in self.pools.values() for e in entries if e.get("audio")]
+
+    def stats(self) -> Dict:
+        sizes = [len(entries) for entries in self.pools.values()]
+        return {"version": self.version, "keys": len(sizes), "entries": sum(sizes),
+                "min_pool": min(sizes, default=0)}
+
+
+@lru_cache(maxsize=1)
+def get_response_pools() -> Optional[ResponsePools]:
+    """Pools carregados uma vez por processo (None se o arquivo não existir)."""
+    return ResponsePools.load()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "generate":
+        backend = sys.argv[sys.argv.index("--backend") + 1] if "--backend" in sys.argv else "local"
+        size = int(sys.argv[sys.argv.index("--size") + 1]) if "--size" in sys.argv else DEFAULT_SIZE
+        data = generate(backend, size)
+        pools = ResponsePools(data["pools"], data["version"])
+        pools.save()
+        stats = pools.stats()
+        print(f"✅ {stats['entries']} respostas em {stats['keys']} pools (menor: {stats['min_pool']}) -> {POOLS_FILE}")
+    elif command == "show" and len(sys.argv) > 4:
+        pools = get_response_pools()
+        if pools is None:
+            sys.exit(1)
+        key = pool_key(*sys.argv[2:5])
+        count = int(sys.argv[5]) if len(sys.argv) > 5 else pools.size(key)
+        for position in range(count):
+            print(pools.pick(key, "cli", position)["text"])
+    elif command == "stats":
+        pools = get_response_pools()
+        print(pools.stats() if pools else "sem pools")
+    else:
+        print(__doc__)
+        sys.exit(2)
@@ -0,0 +1,222 @@
+"""
+Profiler por amostragem para produção: uma thread de fundo lê a pilha das
+threads do Streamlit que estão rodando main() (`sys._current_frames()`) a
+cada `interval` segundos e agrega as pilhas iguais.
+
+A cada janela grava `profiles/<início>-<fim>.collapsed` (formato do
+flamegraph.pl / speedscope: "a;b;c N") e `.speedscope.json` (abre direto em
+https://www.speedscope.app). O tempo é de relógio: esperas (sleep da
+digitação, HTTP do Gemini) aparecem como tal.
+
+Uso:
+    python sampling_profiler.py top profiles/<arquivo>.collapsed [n]   # funções mais quentes
+    python sampling_profiler.py speedscope profiles/<arquivo>.collapsed
+"""
+import atexit
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("MYLLE_PROFILE_DIR", "profiles")
+MAX_DEPTH = 128
+
+
+def _frame_name(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame, max_depth: int = MAX_DEPTH) -> str:
+    """Pilha da raiz até a folha, separada por ';'."""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def to_speedscope(stacks: Dict[str, int], interval: float, name: str) -> Dict:
+    """Perfil "sampled" do speedscope a partir das pilhas agregadas."""
+    frames: List[Dict] = []
+    index: Dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in stacks.items():
+        ids = []
+        for frame in stack.split(";"):
+            if frame not in index:
+                index[frame] = len(frames)
+                func, _, location = frame.rpartition(" (")
+                file, _, line = location.rstrip(")").rpartition(":")
+                frames.append({"name": func or frame, "file": file, "line": int(line) if line.isdigit() else 0})
+            ids.append(index[frame])
+        samples.append(ids)
+        weights.append(count * interval)
+    total = sum(weights)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{"type": "sampled", "name": name, "unit": "seconds", "startValue": 0,
+                      "endValue": total, "samples": samples, "weights": weights}],
+        "name": name,
+        "exporter": "mylle sampling_profiler",
+    }
+
+
+def read_collapsed(path: str) -> Dict[str, int]:
+    stacks: Dict[str, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack and count.isdigit():
+                stacks[stack] = stacks.get(stack, 0) + int(count)
+    return stacks
+
+
+class SamplingProfiler:
+    """Amostrador de pilhas das threads registradas, com exportação por janela."""
+    def __init__(self, out_dir: str = PROFILE_DIR, interval: float = 0.01, window: float = 60.0,
+                 speedscope: bool = True):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.window = window
+        self.speedscope = speedscope
+        self._threads: Set[int] = set()
+        self._stacks: Counter = Counter()
+        self._window_started = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+        self.files: List[str] = []
+        # Última decisão manual (True = ligado, False = desligado); o modo automático a respeita
+        self.override: Optional[bool] = None
+        atexit.register(self.stop)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def watch_current_thread(self) -> None:
+        """Inclui a thread atual (a do rerun do Streamlit) na amostragem."""
+        with self._lock:
+            self._threads.add(threading.get_ident())
+
+    def set_override(self, enabled: bool) -> None:
+        """Liga/desliga por decisão manual (vale até a próxima decisão manual)."""
+        self.override = enabled
+        if enabled:
+            self.start()
+        else:
+            self.stop()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._window_started = time.time()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        logger.info(f"Profiler ligado ({1 / self.interval:.0f} amostras/s, janelas de {self.window:.0f} s em {self.out_dir})")
+
+    def stop(self) -> None:
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout=2)
+        self._thread = None
+        self.flush()
+        logger.info("Profiler desligado")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+            if time.time() - self._window_started >= self.window:
+                self.flush()
+
+    def _sample(self) -> None:
+        frames = sys._current_frames()
+        with self._lock:
+            threads = list(self._threads)
+        for ident in threads:
+            frame = frames.get(ident)
+            if frame is None:  # thread do rerun já terminou
+                with self._lock:
+                    self._threads.discard(ident)
+                continue
+            stack = collapse(frame)
+            with self._lock:
+                self._stacks[stack] += 1
+                self.samples += 1
+
+    def flush(self) -> List[str]:
+        """Grava a janela atual (se tiver amostras) e começa outra."""
+        with self._lock:
+            stacks, self._stacks = self._stacks, Counter()
+            started, self._window_started = self._window_started, time.time()
+        if not stacks:
+            return []
+        name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}-{time.strftime('%H%M%S')}"
+        base = os.path.join(self.out_dir, name)
+        written = []
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            written.append(f"{base}.collapsed")
+            if self.speedscope:
+                with open(f"{base}.speedscope.json", "w", encoding="utf-8") as f:
+                    json.dump(to_speedscope(stacks, self.interval, name), f)
+                written.append(f"{base}.speedscope.json")
+        except OSError as e:
+            logger.warning(f"Falha ao gravar perfil em {self.out_dir}: {e}")
+        self.files.extend(written)
+        return written
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"running": self.running, "threads": len(self._threads), "samples": self.samples,
+                    "window_stacks": len(self._stacks), "files": len(self.files)}
+
+
+def _top(path: str, n: int = 20) -> None:
+    stacks = read_collapsed(path)
+    total = sum(stacks.values()) or 1
+    own: Counter = Counter()
+    inclusive: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for frame in set(frames):
+            inclusive[frame] += count
+    print(f"{total} amostras")
+    print("próprio:")
+    for frame, count in own.most_common(n):
+        print(f"  {count / total:6.1%}  {frame}")
+    print("inclusivo:")
+    for frame, count in inclusive.most_common(n):
+        print(f"  {count / total:6.1%}  {frame}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "top" and len(sys.argv) > 2:
+        _top(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 20)
+    elif command == "speedscope" and len(sys.argv) > 2:
+        source = sys.argv[2]
+        target = source.rsplit(".collapsed", 1)[0] + ".speedscope.json"
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(to_speedscope(read_collapsed(source), 0.01, os.path.basename(source)), f)
+        print(f"✅ {target}")
+    else:
+        print(__doc__)
+        sys.exit(2)
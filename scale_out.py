@@ -0,0 +1,283 @@
+"""
+Modo scale-out: sobe N workers do Streamlit (um processo por núcleo) atrás de
+um roteador que manda cada usuário sempre ao mesmo worker, por hash
+consistente do id (`?uid=` ou cookie `mylle_uid`, ver identity.py).
+
+O roteador trabalha no nível TCP: lê só o cabeçalho da primeira requisição de
+cada conexão, escolhe o worker e daí em diante copia os bytes nos dois
+sentidos (keep-alive e o WebSocket do Streamlit passam intactos). Quando a
+página chega com `?uid=`, a resposta leva o token no cookie `mylle_uid`, para
+que o WebSocket e a mídia da mesma aba sigam a mesma rota; sem id, a rota é
+pelo IP + user agent. Worker fora do ar sai do anel até voltar a responder
+em /_stcore/health, e só os usuários dele mudam de worker.
+
+A rota é decidida uma vez por conexão: as requisições seguintes de uma
+conexão keep-alive vão ao mesmo worker sem o cabeçalho ser relido. O
+navegador manda o mesmo `?uid=`/cookie em todas elas, então na prática a
+diferença só aparece quando a conexão que abriu sem id recebe o cookie no
+meio do caminho (fica no worker escolhido pelo IP até reconectar).
+
+O IP do cliente é o da conexão; o `X-Forwarded-For` recebido só vale atrás
+de MYLLE_TRUSTED_PROXY_HOPS proxies, e o roteador sempre anexa o endereço
+que viu. Os workers recebem MYLLE_TRUSTED_PROXY_HOPS + 1 (o roteador conta
+como proxy confiável).
+
+As conversas ficam no store de sessões (MYLLE_SESSION_STORE), então trocar de
+worker ou reiniciar um deles só custa a reconexão do navegador.
+
+Uso:
+    python scale_out.py run [workers] [porta]   # padrão: um worker por núcleo, porta 8501
+    python scale_out.py route <uid> [workers]   # qual worker atende o usuário
+"""
+import asyncio
+import bisect
+import logging
+import os
+import signal
+import subprocess
+import sys
+from hashlib import blake2b
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import identity
+from rate_limiter import client_ip
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+WORKER_BASE_PORT = int(os.getenv("MYLLE_WORKER_BASE_PORT", "8601"))
+TRUSTED_PROXY_HOPS = int(os.getenv("MYLLE_TRUSTED_PROXY_HOPS", "0"))
+HEALTH_INTERVAL = 2.0
+MAX_HEAD_BYTES = 64 * 1024
+
+Backend = Tuple[str, int]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Anel de hash consistente com `replicas` pontos virtuais por nó."""
+    def __init__(self, nodes: List[str], replicas: int = 100):
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def lookup(self, key: str, alive: Optional[Set[str]] = None) -> Optional[str]:
+        """Primeiro nó vivo a partir do ponto da chave, no sentido do anel."""
+        if not self._keys:
+            return None
+        start = bisect.bisect(self._keys, _hash(key))
+        seen: Set[str] = set()
+        for offset in range(len(self._keys)):
+            node = self._nodes[(start + offset) % len(self._keys)]
+            if node in seen:
+                continue
+            if alive is None or node in alive:
+                return node
+            seen.add(node)
+            if len(seen) == len(self.nodes):
+                break
+        return None
+
+
+def _parse_head(head: bytes) -> Tuple[str, Dict[str, str]]:
+    lines = head.decode("latin-1").split("\r\n")
+    target = lines[0].split(" ")[1] if lines[0].count(" ") >= 2 else "/"
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return target, headers
+
+
+def route_key(target: str, headers: Dict[str, str], peer: str) -> Tuple[str, Optional[str]]:
+    """(chave de roteamento, token para devolver em cookie ou None)."""
+    token = (parse_qs(urlsplit(target).query).get(identity.PARAM) or [None])[0]
+    if token:
+        return token.rpartition(".")[0] or token, token
+    cookie = SimpleCookie()
+    try:
+        cookie.load(headers.get("cookie", ""))
+    except Exception:
+        pass
+    if identity.COOKIE in cookie:
+        value = cookie[identity.COOKIE].value
+        return value.rpartition(".")[0] or value, None
+    client = client_ip(peer, headers.get("x-forwarded-for", ""), TRUSTED_PROXY_HOPS)
+    return f"{client}|{headers.get('user-agent', '')}", None
+
+
+def _with_forwarded_for(head: bytes, peer: str) -> bytes:
+    """Cabeçalho da requisição com `peer` no fim do X-Forwarded-For (criado se não houver)."""
+    lines = head[:-4].split(b"\r\n")
+    chain = []
+    kept = [lines[0]]
+    for line in lines[1:]:
+        name, sep, value = line.partition(b":")
+        if sep and name.strip().lower() == b"x-forwarded-for":
+            chain.append(value.strip())
+        else:
+            kept.append(line)
+    chain.append(peer.encode("latin-1"))
+    kept.append(b"X-Forwarded-For: " + b", ".join(chain))
+    return b"\r\n".join(kept) + b"\r\n\r\n"
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Copia até o EOF e repassa o half-close; erro de conexão fecha o destino."""
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (ConnectionError, asyncio.CancelledError):
+        writer.close()
+
+
+class Router:
+    """Proxy TCP com afinidade por usuário para os workers do Streamlit."""
+    def __init__(self, backends: List[Backend]):
+        self.backends = {f"{host}:{port}": (host, port) for host, port in backends}
+        self.ring = HashRing(list(self.backends))
+        self.alive: Set[str] = set(self.backends)
+        self.routed: Dict[str, int] = {name: 0 for name in self.backends}
+
+    async def handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+        peer = (client_writer.get_extra_info("peername") or ("", 0))[0]
+        target, headers = _parse_head(head)
+        key, set_token = route_key(target, headers, peer)
+
+        backend_reader = backend_writer = None
+        while backend_writer is None:
+            name = self.ring.lookup(key, self.alive)
+            if name is None:
+                client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n")
+                client_writer.close()
+                return
+            try:
+                backend_reader, backend_writer = await asyncio.open_connection(*self.backends[name])
+            except OSError:
+                logger.warning(f"Worker {name} fora do ar")
+                self.alive.discard(name)
+        self.routed[name] += 1
+
+        # IP real do cliente para o app (impressão digital do limitador de taxa): anexado ao
+        # X-Forwarded-For recebido, que o worker só lê até o número de proxies confiáveis
+        backend_writer.write(_with_forwarded_for(head, peer))
+        await backend_writer.drain()
+
+        upstream = asyncio.ensure_future(_pipe(client_reader, backend_writer))
+        if set_token:
+            try:
+                response_head = await backend_reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                upstream.cancel()
+                client_writer.close()
+                return
+            cookie = f"Set-Cookie: {identity.COOKIE}={set_token}; Path=/; SameSite=Lax; Max-Age=31536000\r\n"
+            client_writer.write(response_head[:-2] + cookie.encode("latin-1") + b"\r\n")
+        try:
+            await asyncio.gather(upstream, _pipe(backend_reader, client_writer))
+        finally:
+            backend_writer.close()
+            client_writer.close()
+
+    async def _health_loop(self) -> None:
+        while True:
+            for name, (host, port) in self.backends.items():
+                healthy = False
+                try:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), 1.0)
+                    writer.write(f"GET /_stcore/health HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+                    status = await asyncio.wait_for(reader.readline(), 2.0)
+                    healthy = b" 200 " in status
+                    writer.close()
+                except (OSError, asyncio.TimeoutError):
+                    pass
+                if healthy and name not in self.alive:
+                    logger.info(f"Worker {name} de volta")
+                if healthy:
+                    self.alive.add(name)
+                else:
+                    self.alive.discard(name)
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEAD_BYTES)
+        asyncio.ensure_future(self._health_loop())
+        logger.info(f"Roteador em http://{host}:{port} -> {', '.join(self.backends)}")
+        async with server:
+            await server.serve_forever()
+
+
+def start_workers(count: int, base_port: int = WORKER_BASE_PORT, script: str = "chatbot.py") -> List[subprocess.Popen]:
+    """Um processo `streamlit run` por worker, só em 127.0.0.1 (o acesso externo é pelo roteador)."""
+    # Todos os workers precisam do mesmo segredo: cria .identity_secret antes de subir
+    identity.load_secret(os.getenv("MYLLE_IDENTITY_SECRET", ""))
+    metrics_port = int(os.getenv("MYLLE_METRICS_PORT", "9464"))
+    workers = []
+    for i in range(count):
+        env = dict(os.environ, MYLLE_METRICS_PORT=str(metrics_port + i if metrics_port else 0),
+                   MYLLE_TRUSTED_PROXY_HOPS=str(TRUSTED_PROXY_HOPS + 1))
+        workers.append(subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, script),
+             "--server.port", str(base_port + i), "--server.address", "127.0.0.1",
+             "--server.headless", "true", "--server.fileWatcherType", "none",
+             "--browser.gatherUsageStats", "false"],
+            env=env))
+    return workers
+
+
+def stop_workers(workers: List[subprocess.Popen]) -> None:
+    for worker in workers:
+        if worker.poll() is None:
+            worker.terminate()
+    for worker in workers:
+        try:
+            worker.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+
+
+def run(count: int, port: int, host: str = "0.0.0.0") -> None:
+    workers = start_workers(count)
+    router = Router([("127.0.0.1", WORKER_BASE_PORT + i) for i in range(count)])
+    loop = asyncio.new_event_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, loop.stop)
+    try:
+        loop.run_until_complete(asyncio.wait([loop.create_task(router.serve(host, port))]))
+    except RuntimeError:
+        pass  # loop.stop() pelo sinal
+    finally:
+        stop_workers(workers)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "run":
+        run(int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1),
+            int(sys.argv[3]) if len(sys.argv) > 3 else 8501)
+    elif command == "route" and len(sys.argv) > 2:
+        count = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+        ring = HashRing([f"127.0.0.1:{WORKER_BASE_PORT + i}" for i in range(count)])
+        print(ring.lookup(sys.argv[2].rpartition(".")[0] or sys.argv[2]))
+    else:
+        print(__doc__)
+        sys.exit(2)
@@ -0,0 +1,195 @@
+"""
+Análise de sentimento em português (léxico próprio com gírias e emojis).
+
+Substitui o analisador em inglês do TextBlob, que devolve 0.0 para quase
+toda mensagem em português. O léxico cobre palavras, gírias de chat e
+emojis; intensificadores ("muito", "mt", "demais") ampliam o termo seguinte
+e negações ("não", "nem", "nunca") invertem os três termos seguintes.
+
+`score()` analisa uma mensagem; `score_batch()` analisa muitas de uma vez com
+NumPy sobre ids de tokens (para reprocessar históricos e análises).
+"""
+import math
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from text_utils import fold_text
+
+np = None  # NumPy é importado no primeiro score_batch
+
+# Valência de -3 (muito negativo) a +3 (muito positivo); chaves sem acento
+LEXICON: Dict[str, float] = {
+    # positivos
+    "amor": 2.0, "amo": 2.5, "adoro": 2.5, "adorei": 2.5, "amei": 2.5, "gosto": 1.5, "gostei": 2.0,
+    "lindo": 2.0, "linda": 2.0, "lindeza": 2.0, "maravilhosa": 2.5, "maravilhoso": 2.5, "perfeita": 2.5,
+    "perfeito": 2.5, "incrivel": 2.5, "demais": 1.0, "top": 1.5, "otimo": 2.0, "otima": 2.0, "bom": 1.0,
+    "boa": 1.0, "bem": 0.5, "legal": 1.5, "massa": 1.5, "show": 1.5, "feliz": 2.5, "alegre": 2.0,
+    "gostosa": 2.0, "gostoso": 2.0, "delicia": 2.5, "deliciosa": 2.5, "gata": 1.5, "gato": 1.5,
+    "gatinha": 1.5, "princesa": 1.5, "querida": 1.5, "fofa": 1.5, "fofo": 1.5, "obrigado": 1.5,
+    "obrigada": 1.5, "valeu": 1.5, "vlw": 1.5, "parabens": 2.0, "sim": 0.5, "claro": 0.5, "quero": 0.5,
+    "tesao": 1.5, "safadinha": 1.0, "animado": 1.5, "animada": 1.5, "saudade": 1.0,
+    "curti": 1.5, "curto": 1.0, "apaixonado": 2.5, "apaixonada": 2.5, "beijo": 1.5, "beijos": 1.5,
+    "bjs": 1.5, "bj": 1.5, "carinho": 1.5, "sexy": 1.5, "uau": 2.0, "nossa": 0.5, "hehe": 1.0,
+    "haha": 1.5, "kk": 1.5, "rs": 1.0, "lol": 1.5, "aff": -1.5, "tranquilo": 1.0,
+    "relaxado": 1.0, "satisfeito": 2.0, "incrivelmente": 1.0, "especial": 1.5, "divertido": 1.5,
+    "engracado": 1.5, "perfeicao": 2.5, "recomendo": 2.0, "vale": 0.5, "sucesso": 2.0,
+    # negativos
+    "odeio": -3.0, "odiei": -3.0, "ruim": -2.0, "pessimo": -3.0, "pessima": -3.0, "horrivel": -3.0,
+    "triste": -2.5, "tristeza": -2.5, "chateado": -2.0, "chateada": -2.0, "raiva": -2.5, "irritado": -2.0,
+    "irritada": -2.0, "bravo": -2.0, "brava": -2.0, "cansado": -1.5, "cansada": -1.5, "sozinho": -1.5,
+    "sozinha": -1.5, "mal": -1.5, "chato": -2.0, "chata": -2.0, "feio": -2.0, "feia": -2.0,
+    "mentira": -2.0, "mentirosa": -2.5, "fake": -2.0, "golpe": -3.0, "golpista": -3.0, "roubo": -3.0,
+    "caro": -1.5, "lixo": -3.0, "merda": -2.5, "porra": -1.0, "droga": -2.0, "pqp": -2.0,
+    "vtnc": -3.0, "desgraca": -3.0, "decepcionado": -2.5, "decepcionada": -2.5, "decepcao": -2.5,
+    "problema": -1.5, "medo": -2.0, "preocupado": -1.5, "preocupada": -1.5, "dor": -2.0, "doente": -2.0,
+    "nojo": -2.5, "nojento": -2.5, "burro": -2.0, "burra": -2.0, "idiota": -2.5, "estupido": -2.5,
+    "estupida": -2.5, "demora": -1.0, "demorou": -1.0, "enrolando": -1.5, "enrolacao": -2.0,
+    "desisto": -2.0, "cansei": -2.0, "bosta": -2.5, "sacanagem": -1.0, "furada": -2.0, "errado": -1.5,
+    "errada": -1.5, "robo": -1.0, "bot": -1.0, "duvido": -1.0, "falsa": -2.0,
+    "saco": -1.5, "tedio": -1.5, "ansioso": -1.0, "ansiosa": -1.0, "infeliz": -2.5, "sofrendo": -2.5,
+}
+
+# Emojis (mantidos como tokens próprios)
+EMOJI_LEXICON: Dict[str, float] = {
+    "😍": 3.0, "🥰": 3.0, "😘": 2.5, "❤": 2.5, "❤️": 2.5, "💕": 2.5, "💖": 2.5, "💋": 2.0, "😊": 2.0,
+    "🙂": 1.0, "😁": 2.0, "😀": 2.0, "😃": 2.0, "😄": 2.0, "😂": 1.5, "🤣": 1.5, "😆": 1.5, "😉": 1.5,
+    "😏": 1.0, "😈": 1.0, "🔥": 2.0, "🤤": 2.0, "👍": 1.5, "👏": 1.5, "🙏": 1.0, "✨": 1.0, "🥵": 1.5,
+    "😢": -2.0, "😭": -2.5, "😞": -2.0, "😔": -2.0, "☹": -2.0, "🙁": -1.5, "😡": -3.0, "🤬": -3.0,
+    "😠": -2.5, "😒": -1.5, "🙄": -1.5, "😤": -2.0, "💔": -2.5, "👎": -2.0, "😩": -2.0, "😫": -2.0,
+    "🤮": -3.0, "😑": -1.0, "😐": -0.5,
+}
+
+INTENSIFIERS: Dict[str, float] = {
+    "muito": 1.5, "mto": 1.5, "mt": 1.5, "muita": 1.5, "super": 1.6, "mega": 1.6, "ultra": 1.6,
+    "tao": 1.4, "bastante": 1.4, "demais": 1.5, "extremamente": 1.8, "totalmente": 1.4, "bem": 1.3,
+    "pouco": 0.5, "meio": 0.6, "quase": 0.6,
+}
+NEGATORS = frozenset({"nao", "n", "nem", "nunca", "jamais", "nada", "ninguem", "sem"})
+NEGATION_SCOPE = 3
+NEGATION_FACTOR = -0.75
+EXCLAMATION_BOOST = 0.1
+NORMALIZATION_ALPHA = 15.0
+
+_EMOJI_PATTERN = "|".join(sorted((re.escape(e) for e in EMOJI_LEXICON), key=len, reverse=True))
+_TOKEN_RE = re.compile(rf"{_EMOJI_PATTERN}|\w+")
+_REPEAT_RE = re.compile(r"(\w)\1{2,}")
+_LAUGH_RE = re.compile(r"^(?:k{2,}|(?:ha){2,}h?|(?:he){2,}h?|(?:rs)+)$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados: minúsculas, sem acento, letras repetidas reduzidas ("lindaaa" -> "linda")."""
+    tokens = []
+    for token in _TOKEN_RE.findall(fold_text(text)):
+        if _LAUGH_RE.match(token):
+            token = "haha" if "h" in token else ("rs" if token[0] == "r" else "kk")
+        elif len(token) > 3:
+            token = _REPEAT_RE.sub(r"\1", token)
+        tokens.append(token)
+    return tokens
+
+
+def _require_numpy() -> None:
+    global np
+    if np is None:
+        try:
+            import numpy as np
+        except ImportError:
+            raise RuntimeError("o caminho em lote requer numpy")
+
+
+def _normalize(total: float) -> float:
+    return total / math.sqrt(total * total + NORMALIZATION_ALPHA)
+
+
+class PortugueseSentiment:
+    """Analisador de sentimento baseado em léxico, com caminho escalar e em lote."""
+    def __init__(self, lexicon: Dict[str, float] = None, emoji_lexicon: Dict[str, float] = None):
+        self.valence: Dict[str, float] = dict(lexicon or LEXICON)
+        self.valence.update(emoji_lexicon or EMOJI_LEXICON)
+        # Vocabulário de ids para o caminho vetorizado (0 = token desconhecido)
+        vocab = sorted(set(self.valence) | set(INTENSIFIERS) | NEGATORS)
+        self.token_ids: Dict[str, int] = {token: i + 1 for i, token in enumerate(vocab)}
+        self._valence_arr = None
+
+    # ---------- caminho escalar (uma mensagem) ----------
+    def score(self, text: str) -> Tuple[float, float]:
+        """Retorna (polaridade em [-1, 1], subjetividade em [0, 1])."""
+        tokens = tokenize(text)
+        if not tokens:
+            return 0.0, 0.0
+        total = 0.0
+        hits = 0
+        negated_until = -1
+        for i, token in enumerate(tokens):
+            if token in NEGATORS:
+                negated_until = i + NEGATION_SCOPE
+                continue
+            value = self.valence.get(token)
+            if value is None:
+                continue
+            hits += 1
+            if i > 0:
+                value *= INTENSIFIERS.get(tokens[i - 1], 1.0)
+            if i <= negated_until:
+                value *= NEGATION_FACTOR
+            total += value
+        total *= 1.0 + EXCLAMATION_BOOST * min(text.count("!"), 3)
+        return round(_normalize(total), 4), round(min(1.0, hits / len(tokens) * 2), 4)
+
+    # ---------- caminho vetorizado (muitas mensagens) ----------
+    def _arrays(self):
+        if self._valence_arr is None:
+            size = len(self.token_ids) + 1
+            valence = np.zeros(size)
+            boost = np.ones(size)
+            negator = np.zeros(size, dtype=bool)
+            for token, idx in self.token_ids.items():
+                valence[idx] = self.valence.get(token, 0.0)
+                boost[idx] = INTENSIFIERS.get(token, 1.0)
+                negator[idx] = token in NEGATORS
+            self._valence_arr, self._boost_arr, self._negator_arr = valence, boost, negator
+        return self._valence_arr, self._boost_arr, self._negator_arr
+
+    def encode(self, texts: Iterable[str]):
+        """Converte mensagens em matriz de ids (linhas com padding 0) e vetor de exclamações."""
+        _require_numpy()
+        texts = list(texts)
+        token_ids = self.token_ids
+        flat: List[int] = []
+        lengths = np.empty(len(texts), dtype=np.int32)
+        for i, text in enumerate(texts):
+            row = [token_ids.get(t, 0) for t in tokenize(text)]
+            flat.extend(row)
+            lengths[i] = len(row)
+        width = int(lengths.max()) if len(texts) and lengths.max() > 0 else 1
+        ids = np.zeros((len(texts), width), dtype=np.int32)
+        ids[np.arange(width) < lengths[:, None]] = flat
+        exclamations = np.array([min(t.count("!"), 3) for t in texts], dtype=np.float64)
+        return ids, lengths, exclamations
+
+    def score_batch(self, texts: List[str]):
+        """Polaridade e subjetividade de várias mensagens de uma vez (arrays NumPy)."""
+        _require_numpy()
+        if not texts:
+            return np.zeros(0), np.zeros(0)
+        valence, boost, negator = self._arrays()
+        ids, lengths, exclamations = self.encode(texts)
+
+        values = valence[ids]
+        is_negator = negator[ids]
+        # Intensificador = token imediatamente anterior
+        prev_boost = np.ones_like(values)
+        prev_boost[:, 1:] = boost[ids[:, :-1]]
+        values = values * prev_boost
+        # Negação: algum negador nas NEGATION_SCOPE posições anteriores
+        negated = np.zeros_like(is_negator)
+        for shift in range(1, NEGATION_SCOPE + 1):
+            negated[:, shift:] |= is_negator[:, :-shift]
+        values = np.where(negated, values * NEGATION_FACTOR, values)
+        values[is_negator] = 0.0
+
+        totals = values.sum(axis=1) * (1.0 + EXCLAMATION_BOOST * exclamations)
+        polarity = totals / np.sqrt(totals * totals + NORMALIZATION_ALPHA)
+        hits = ((valence[ids] != 0) & ~is_negator).sum(axis=1)
+        subjectivity = np.minimum(1.0, np.divide(hits * 2, lengths, out=np.zeros(len(texts)), where=lengths > 0))
+        return np.round(polarity, 4), np.round(subjectivity, 4)
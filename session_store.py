@@ -0,0 +1,73 @@
+"""
+Estado persistente das sessões do chat, fora do processo do Streamlit.
+
+O `st.session_state` guarda só handles (id do usuário e da sessão) e caches
+reconstruíveis; mensagens, página atual e contadores são lidos do store uma
+vez por sessão e gravados quando mudam. Assim um worker pode reiniciar, ou o
+usuário cair em outra réplica, sem perder a conversa:
+
+- `SQLiteSessionStore`: um nó (todos os workers lendo o mesmo arquivo, WAL);
+- `RedisSessionStore`: vários nós (requer o pacote `redis`).
+"""
+import json
+import sqlite3
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from db_pool import SQLitePool
+
+
+class SQLiteSessionStore:
+    """Uma linha JSON por usuário na tabela `session_state`.
+
+    As conexões vêm de um SQLitePool: o Streamlit roda cada rerun numa thread
+    nova, então uma conexão por thread seria aberta (com PRAGMAs) a cada rerun.
+    """
+    def __init__(self, path: str = "session_data.db",
+                 on_commit: Optional[Callable[[sqlite3.Connection], None]] = None, pool_size: int = 16):
+        self.path = path
+        self._commit = on_commit or (lambda conn: conn.commit())
+        self._pool = SQLitePool(self._connect, pool_size)
+        with self._pool.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''CREATE TABLE IF NOT EXISTS session_state
+                            (user_id TEXT PRIMARY KEY, state_json TEXT, last_updated DATETIME)''')
+            self._commit(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+
+    def load(self, user_id: str) -> Optional[Dict]:
+        with self._pool.connection() as conn:
+            row = conn.execute('SELECT state_json FROM session_state WHERE user_id = ?', (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, user_id: str, state: Dict) -> None:
+        with self._pool.connection() as conn:
+            conn.execute('''INSERT OR REPLACE INTO session_state (user_id, state_json, last_updated)
+                            VALUES (?, ?, ?)''', (user_id, json.dumps(state, default=str), datetime.now()))
+            self._commit(conn)
+
+
+class RedisSessionStore:
+    """Uma chave JSON por usuário, expirando `ttl` segundos após a última gravação."""
+    def __init__(self, url: str, prefix: str = "mylle:session:", ttl: int = 30 * 24 * 3600):
+        import redis  # dependência opcional, só no modo com vários nós
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def load(self, user_id: str) -> Optional[Dict]:
+        raw = self.client.get(self.prefix + user_id)
+        return json.loads(raw) if raw else None
+
+    def save(self, user_id: str, state: Dict) -> None:
+        self.client.set(self.prefix + user_id, json.dumps(state, default=str), ex=self.ttl)
+
+
+def create_store(url: str = "", on_commit: Optional[Callable[[sqlite3.Connection], None]] = None):
+    """`redis://...` para vários nós; caso contrário, caminho do arquivo SQLite."""
+    if url.startswith(("redis://", "rediss://")):
+        return RedisSessionStore(url)
+    return SQLiteSessionStore(url or "session_data.db", on_commit)
@@ -0,0 +1,70 @@
+import json
+import logging
+import queue
+import threading
+
+import pytest
+
+from app_logging import ContextQueueHandler, bind, current_context, setup_async_logging
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+@pytest.fixture(autouse=True)
+def clean_context():
+    bind(session=None, turn=None)
+    yield
+    bind(session=None, turn=None)
+
+
+def test_bind_adds_and_removes_fields():
+    bind(session="abc", turn=1)
+    bind(turn=2)
+    assert current_context() == {"session": "abc", "turn": 2}
+    bind(turn=None)
+    assert current_context() == {"session": "abc"}
+
+
+def test_context_is_per_thread():
+    bind(session="main")
+    seen = []
+    thread = threading.Thread(target=lambda: (bind(session="outra"), seen.append(current_context())))
+    thread.start()
+    thread.join()
+    assert seen == [{"session": "outra"}]
+    assert current_context() == {"session": "main"}
+
+
+def test_json_lines_carry_context(tmp_path, root_logger):
+    path = tmp_path / "app.log"
+    async_logging = setup_async_logging(str(path), console=False)
+    bind(session="abc", turn=3)
+    logging.getLogger("mylle").info("resposta %s", "enviada")
+    try:
+        raise ValueError("falhou")
+    except ValueError:
+        logging.getLogger("mylle").exception("erro")
+    async_logging.stop()
+    first, second = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert first["msg"] == "resposta enviada" and first["session"] == "abc" and first["turn"] == 3
+    assert first["level"] == "INFO" and first["logger"] == "mylle"
+    assert second["level"] == "ERROR" and "ValueError: falhou" in second["exc"]
+    assert async_logging.stats() == {"queued": 0, "dropped": 0}
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = ContextQueueHandler(queue.Queue(maxsize=1))
+    record = logging.LogRecord("mylle", logging.INFO, __file__, 1, "msg", None, None)
+    handler.handle(record)
+    handler.handle(record)
+    assert handler.dropped == 1
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import audio_assets
+from audio_assets import AudioAssetStore, format_duration, probe_mp3
+
+# MPEG-1 camada III, 128 kbps, 44100 Hz, estéreo: 417 bytes por frame
+FRAME_HEADER = b"\xff\xfb\x90\x00"
+FRAME_LEN = 417
+
+
+def mp3(frames: int = 10, xing_frames: int = 0) -> bytes:
+    frame = bytearray(FRAME_HEADER + b"\x00" * (FRAME_LEN - 4))
+    if xing_frames:
+        xing = 4 + 32
+        frame[xing:xing + 12] = b"Xing" + b"\x00\x00\x00\x01" + xing_frames.to_bytes(4, "big")
+    return bytes(frame) + (FRAME_HEADER + b"\x00" * (FRAME_LEN - 4)) * (frames - 1)
+
+
+def test_probe_cbr():
+    assert probe_mp3(mp3(10)) == {"duration": 0.26, "bitrate": 128, "sample_rate": 44100}
+
+
+def test_probe_skips_id3_tag():
+    tag = b"ID3\x04\x00\x00\x00\x00\x00\x14" + b"\x00" * 20
+    assert probe_mp3(tag + mp3(10)) == probe_mp3(mp3(10))
+
+
+def test_probe_xing_frame_count():
+    assert probe_mp3(mp3(10, xing_frames=100))["duration"] == round(100 * 1152 / 44100, 2)
+
+
+def test_probe_rejects_non_mp3():
+    assert probe_mp3(b"<html>not found</html>") is None
+    assert probe_mp3(b"\xff\x00" * 100) is None
+
+
+def test_format_duration():
+    assert format_duration(0.26) == "0:00"
+    assert format_duration(61.6) == "1:02"
+
+
+class FakeResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    calls = []
+
+    def get(url, timeout):
+        calls.append(url)
+        return FakeResponse(b"<html>" if url.endswith("quebrado.mp3") else mp3(10))
+
+    monkeypatch.setattr(audio_assets.requests, "get", get)
+    monkeypatch.setattr(audio_assets.time, "sleep", lambda s: None)
+    return calls
+
+
+def test_sync_downloads_once_and_persists(tmp_path, downloads):
+    store = AudioAssetStore(str(tmp_path), base_url="https://cdn.example.com")
+    manifest = store.sync({"oi": "https://origem/oi.mp3"})
+    entry = manifest["oi"]
+    assert entry["duration"] == 0.26 and entry["size"] == 10 * FRAME_LEN
+    assert entry["file"] == f"oi.{entry['sha256'][:12]}.mp3"
+    assert os.path.getsize(store.local_path("oi")) == entry["size"]
+
+    store.sync({"oi": "https://origem/oi.mp3"})
+    assert downloads == ["https://origem/oi.mp3"]
+    assert AudioAssetStore(str(tmp_path)).get("oi") == entry
+
+
+def test_invalid_download_is_skipped(tmp_path, downloads):
+    store = AudioAssetStore(str(tmp_path))
+    assert store.sync({"x": "https://origem/quebrado.mp3"}) == {}
+    assert len(downloads) == audio_assets.DOWNLOAD_RETRIES
+
+
+def test_url_for(tmp_path, downloads):
+    store = AudioAssetStore(str(tmp_path), base_url="https://cdn.example.com")
+    store.sync({"oi": "https://origem/oi.mp3"})
+    assert store.url_for("oi", "https://origem/oi.mp3") == f"https://cdn.example.com/audio/{store.get('oi')['file']}"
+    assert store.url_for("outro", "https://origem/outro.mp3") == "https://origem/outro.mp3"
+    store.base_url = ""
+    assert store.url_for("oi", "https://origem/oi.mp3") == "https://origem/oi.mp3"
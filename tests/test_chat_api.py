@@ -0,0 +1,93 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from chat_api import ChatApp, _chunks
+
+
+class FakeEngine:
+    class pool:
+        @staticmethod
+        def stats():
+            return {"idle": 1}
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    def turn(self, message, token, session_id, fingerprint, network):
+        self.calls.append((message, token, session_id))
+        return self.result
+
+
+@pytest.fixture
+def app():
+    app = ChatApp()
+    app._engine = FakeEngine((200, {"text": "oi amor, tudo bem com você?", "source": "local"}))
+    app._executor = ThreadPoolExecutor(max_workers=1)
+    yield app
+    app._executor.shutdown()
+
+
+def call(app, method, path, body=b""):
+    scope = {"type": "http", "method": method, "path": path, "headers": [(b"user-agent", b"teste")],
+             "client": ("10.0.0.1", 5000)}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    return start["status"], headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_chunks():
+    assert _chunks("um dois três quatro cinco", 2) == ["um dois ", "três quatro ", "cinco"]
+    assert _chunks("") == []
+
+
+def test_routes(app):
+    status, _, body = call(app, "GET", "/health")
+    assert status == 200 and json.loads(body) == {"status": "ok", "db_pool": {"idle": 1}}
+    assert call(app, "GET", "/chat")[0] == 405
+    assert call(app, "GET", "/nada")[0] == 404
+
+
+@pytest.mark.parametrize("body", [b"", b"nao e json", b"[]", b'{"message": 1}', b'{"message": "  "}',
+                                  b'{"message": "oi", "token": 5}', b'{"message": "oi", "session_id": []}',
+                                  json.dumps({"message": "a" * 20000}).encode()])
+def test_invalid_body_is_rejected(app, body):
+    assert call(app, "POST", "/chat", body)[0] == 400
+    assert app._engine.calls == []
+
+
+def test_chat(app):
+    status, headers, body = call(app, "POST", "/chat", b'{"message": "oi", "token": "t", "session_id": "s"}')
+    assert status == 200 and json.loads(body)["text"] == "oi amor, tudo bem com você?"
+    assert "retry-after" not in headers
+    assert app._engine.calls == [("oi", "t", "s")]
+
+
+def test_rate_limited_sends_retry_after(app):
+    app._engine.result = (429, {"error": "muitas mensagens", "retry_after": 7})
+    status, headers, _ = call(app, "POST", "/chat", b'{"message": "oi"}')
+    assert status == 429 and headers["retry-after"] == "7"
+
+
+def test_stream(app):
+    status, headers, body = call(app, "POST", "/chat/stream", b'{"message": "oi"}')
+    assert status == 200 and headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in body.decode().strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names == ["typing", "delta", "delta", "done"]
+    deltas = [json.loads(lines[1].removeprefix("data: "))["text"] for lines in events if lines[0] == "event: delta"]
+    assert "".join(deltas) == "oi amor, tudo bem com você?"
+    assert json.loads(events[-1][1].removeprefix("data: "))["status"] == 200
@@ -0,0 +1,38 @@
+import sqlite3
+
+import pytest
+
+from db_pool import SQLitePool
+
+
+def test_reuses_most_recent_connection():
+    pool = SQLitePool(lambda: sqlite3.connect(":memory:"), size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert pool.stats() == {"idle": 1, "in_use": 0, "created": 1, "size": 2}
+
+
+def test_grows_when_empty_and_closes_extras():
+    pool = SQLitePool(lambda: sqlite3.connect(":memory:"), size=1)
+    a, b = pool.acquire(), pool.acquire()
+    assert a is not b and pool.stats()["in_use"] == 2
+    pool.release(a)
+    pool.release(b)
+    assert pool.stats() == {"idle": 1, "in_use": 0, "created": 2, "size": 1}
+    with pytest.raises(sqlite3.ProgrammingError):
+        b.execute("SELECT 1")
+
+
+def test_release_rolls_back_open_transaction(tmp_path):
+    path = str(tmp_path / "pool.db")
+    pool = SQLitePool(lambda: sqlite3.connect(path), size=1)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+        assert conn.in_transaction
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (0,)
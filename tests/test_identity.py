@@ -0,0 +1,37 @@
+import pytest
+
+from identity import IdentitySigner, load_secret
+
+
+@pytest.fixture
+def signer():
+    return IdentitySigner(b"segredo-de-teste")
+
+
+def test_sign_and_verify_roundtrip(signer):
+    user_id, token = signer.new_identity()
+    assert signer.verify(token) == user_id
+
+
+def test_other_secret_rejects(signer):
+    token = signer.sign("abc")
+    assert IdentitySigner(b"outro").verify(token) is None
+
+
+@pytest.mark.parametrize("token", [
+    None, "", "abc", ".", "abc.", ".assinatura", "abc.é", "é.é", "abc.\udcff", "\udcff.abc", 42,
+])
+def test_malformed_tokens_are_rejected(signer, token):
+    assert signer.verify(token) is None
+
+
+def test_tampered_signature_is_rejected(signer):
+    token = signer.sign("abc")
+    assert signer.verify(token[:-1] + ("A" if token[-1] != "A" else "B")) is None
+
+
+def test_load_secret_persists(tmp_path):
+    path = str(tmp_path / "secret")
+    first = load_secret(path=path)
+    assert load_secret(path=path) == first
+    assert load_secret("explicito", path=path) == b"explicito"
@@ -0,0 +1,80 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+
+import image_assets
+from image_assets import PRESETS, ImageAssetStore, image_presets
+
+SOURCE = "https://origem/perfil.jpg"
+
+
+def jpeg(width: int = 600, height: int = 300) -> bytes:
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 80, 120)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    source = jpeg()
+    calls = []
+
+    def get(url, timeout):
+        calls.append(url)
+        return SimpleNamespace(content=source, raise_for_status=lambda: None)
+
+    monkeypatch.setattr(image_assets.requests, "get", get)
+    store = ImageAssetStore(str(tmp_path), base_url="https://cdn.example.com")
+    store.downloads = calls
+    return store
+
+
+def test_image_presets():
+    config = SimpleNamespace(IMG_PROFILE="p.jpg", IMG_PREVIEW="v.jpg", PACK_IMAGES={"vip": "p.jpg"},
+                             IMG_GALLERY=["g.jpg"], IMG_HOME_PREVIEWS=["v.jpg"])
+    assert image_presets(config) == {
+        "p.jpg": ["avatar", "card", "gallery", "profile"],
+        "v.jpg": ["gallery", "preview"],
+        "g.jpg": ["gallery"],
+    }
+
+
+def test_without_variants_falls_back_to_source(tmp_path):
+    store = ImageAssetStore(str(tmp_path), base_url="https://cdn.example.com")
+    assert store.src(SOURCE, "avatar") == SOURCE
+    assert store.picture_html(SOURCE, "avatar", alt='a "b"') == f'<img src="{SOURCE}" alt="a &quot;b&quot;" style="" >'
+    assert store.page_weight(SOURCE, "avatar") == {"original": 0, "optimized": 0}
+
+
+def test_sync_builds_1x_and_2x_variants(store):
+    manifest = store.sync({SOURCE: ["avatar", "gallery"]})
+    variants = manifest[SOURCE]["variants"]
+    assert {v["width"] for v in variants["avatar"]} == {PRESETS["avatar"], PRESETS["avatar"] * 2}
+    # a origem (600 px) não é ampliada para o 2x da galeria (800 px)
+    assert {v["width"] for v in variants["gallery"]} == {PRESETS["gallery"], 600}
+    assert "image/jpeg" in {v["mime"] for v in variants["avatar"]}
+
+    store.sync({SOURCE: ["gallery", "avatar"]})
+    assert store.downloads == [SOURCE]
+    assert ImageAssetStore(store.cache_dir).manifest == manifest
+
+
+def test_src_and_picture_html(store):
+    store.sync({SOURCE: ["avatar"]})
+    src = store.src(SOURCE, "avatar")
+    assert src.startswith("https://cdn.example.com/img/") and src.endswith((".webp", ".jpg"))
+    html = store.picture_html(SOURCE, "avatar", alt="Mylle")
+    assert html.startswith("<picture>") and html.endswith("</picture>")
+    assert 'sizes="48px"' in html and "48w" in html and "96w" in html and 'alt="Mylle"' in html
+
+    store.base_url = ""
+    assert store.src(SOURCE, "avatar").startswith(store.cache_dir)
+    assert store.picture_html(SOURCE, "avatar").startswith(f'<img src="{SOURCE}"')
+
+
+def test_page_weight(store):
+    store.sync({SOURCE: ["avatar"]})
+    weight = store.page_weight(SOURCE, "avatar")
+    assert 0 < weight["optimized"] < weight["original"]
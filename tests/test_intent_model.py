@@ -0,0 +1,53 @@
+import json
+
+from intent_model import DecisionLog, IntentDecision, get_intent_model, load_samples, redact
+
+
+def test_redact_masks_personal_data():
+    text = "meu nome é João, me chama no (11) 98765-4321 ou joao@mail.com, insta @joaozin, www.site.com"
+    redacted = redact(text)
+    for secret in ("João", "98765", "joao@mail.com", "@joaozin", "www.site.com"):
+        assert secret not in redacted
+    assert redact("quanto custa o pack?") == "quanto custa o pack?"
+
+
+def test_decision_log_keeps_only_training_fields(tmp_path):
+    path = str(tmp_path / "decisions.jsonl")
+    DecisionLog(path).write("me chamo Ana, quanto custa?", IntentDecision("preco", 0.97), True)
+    with open(path, encoding="utf-8") as f:
+        record = json.loads(f.readline())
+    assert set(record) == {"text", "intent", "confidence", "local", "label"}
+    assert "Ana" not in record["text"]
+
+
+def test_decision_log_rotates(tmp_path):
+    path = str(tmp_path / "decisions.jsonl")
+    log = DecisionLog(path, max_bytes=200)
+    for _ in range(20):
+        log.write("quanto custa o pack?", IntentDecision("preco", 0.97), True)
+    assert (tmp_path / "decisions.jsonl.1").exists()
+    assert (tmp_path / "decisions.jsonl").stat().st_size < 400
+
+
+def test_decision_log_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    DecisionLog("").write("oi", IntentDecision("saudacao", 0.99), True)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_rotated_reviews_are_loaded_for_training(tmp_path):
+    path = str(tmp_path / "decisions.jsonl")
+    with open(path + ".1", "w", encoding="utf-8") as f:
+        f.write(json.dumps({"text": "cadê as fotos", "label": "amostra"}) + "\n")
+    samples = load_samples(decisions_file=path)
+    assert ("amostra", "cadê as fotos") in samples
+
+
+def test_covers_rejects_negation_and_extra_content():
+    model = get_intent_model()
+    decision = model.predict("quanto custa o pack?")
+    assert decision.intent == "preco" and model.covers("quanto custa o pack?", decision)
+    negated = model.predict("não quero saber quanto custa")
+    assert not model.covers("não quero saber quanto custa", negated)
+    chatty = model.predict("oi, tudo bem? meu nome é joão")
+    assert not model.covers("oi, tudo bem? meu nome é joão", chatty)
@@ -0,0 +1,49 @@
+import pytest
+
+import chatbot
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = chatbot.ApiService(state={"session_id": "s", "messages": []})
+    monkeypatch.setattr(service, "_simulate_typing", lambda: None)
+    return service
+
+
+HISTORY = [
+    {"role": "user", "content": "oi"},
+    {"role": "assistant", "content": "oi amor"},
+    {"role": "user", "content": "quanto custa o pack?"},
+]
+
+
+def test_gated_cta_uses_variant_without_button(service):
+    first = service._answer_locally("quanto custa o pack?", "u1", HISTORY, "Mylle:normal", "normal", "Neutro")
+    assert first["cta"]["show"]
+    assert service.state["last_cta_time"] > 0
+
+    # Dentro da pausa de 90 s: sem botão e sem texto que aponte para ele
+    second = service._answer_locally("quanto custa o pack?", "u1", HISTORY, "Mylle:normal", "normal", "Neutro")
+    assert second["cta"] == {"show": False}
+    assert second["text"] in {r["text"] for r in service.INTENT_RESPONSES_NO_CTA["preco"]}
+
+
+@pytest.mark.parametrize("text", [
+    "não quero saber quanto custa",
+    "oi, tudo bem? meu nome é joão",
+    "ok",
+    "quanto custa? sou de sp e tenho 25 anos",
+])
+def test_off_target_messages_go_to_gemini(service, text):
+    assert service._answer_locally(text, "u1", HISTORY, "Mylle:normal", "normal", "Neutro") is None
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("quanto custa o pack?", "preco"),
+    ("oi gata, tudo bem?", "saudacao"),
+    ("manda uma amostra", "amostra"),
+])
+def test_plain_intents_are_answered_locally(service, text, intent):
+    assert service._answer_locally(text, "u1", HISTORY, "Mylle:normal", "normal", "Neutro") is not None
+    assert service.turn_intent == intent
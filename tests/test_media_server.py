@@ -0,0 +1,79 @@
+import http.client
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from media_server import CACHE_CONTROL, MediaRequestHandler, cache_control, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=1000-", (-1, -1)),
+    ("bytes=50-10", (-1, -1)),
+    ("bytes=-0", (-1, -1)),
+    ("bytes=-", None),
+    ("bytes=0-1,5-9", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("name, immutable", [
+    ("audio/oi_meu_amor_tudo_bem.3f2a9c01b7de.mp3", True),
+    ("img/0123456789abcdef0123.webp", True),
+    ("img/src-0123456789abcdef0123.jpg", True),
+    ("audio/manifest.json", False),
+    ("img/manifest.json", False),
+])
+def test_cache_control(name, immutable):
+    assert (cache_control(name) == CACHE_CONTROL) is immutable
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "audio").mkdir()
+    (tmp_path / "audio" / "clip.3f2a9c01b7de.mp3").write_bytes(bytes(range(256)) * 4)
+    (tmp_path / "audio" / "manifest.json").write_text("{}")
+    handler = type("Handler", (MediaRequestHandler,), {"root": str(tmp_path)})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def request(port, path, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def test_range_and_conditional_requests(server):
+    response, body = request(server, "/audio/clip.3f2a9c01b7de.mp3", {"Range": "bytes=10-19"})
+    assert response.status == 206 and body == bytes(range(10, 20))
+    assert response.getheader("Content-Range") == "bytes 10-19/1024"
+    assert "immutable" in response.getheader("Cache-Control")
+
+    etag = response.getheader("ETag")
+    response, body = request(server, "/audio/clip.3f2a9c01b7de.mp3", {"If-None-Match": etag})
+    assert response.status == 304 and body == b""
+
+
+def test_manifest_is_revalidated(server):
+    response, _ = request(server, "/audio/manifest.json")
+    assert response.status == 200 and response.getheader("Cache-Control") == "no-cache"
+
+
+def test_paths_outside_root_are_not_served(server):
+    response, _ = request(server, "/../etc/passwd")
+    assert response.status == 404
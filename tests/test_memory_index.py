@@ -0,0 +1,70 @@
+import json
+import sqlite3
+
+import pytest
+
+from memory_index import MemoryIndex, tokenize
+from text_utils import collapse_repeats, extract_message_text, fold_text, words
+
+
+def test_text_utils():
+    assert fold_text("Vídeo AÇÃO") == "video acao"
+    assert words("Oi, você!") == ["oi", "voce"]
+    assert collapse_repeats("lindaaa") == "linda"
+    assert extract_message_text(json.dumps({"text": "oi amor", "cta": {"show": False}})) == "oi amor"
+    assert extract_message_text('{"text" quebrado') == '{"text" quebrado'
+
+
+def test_tokenize_drops_stopwords_and_numbers():
+    assert tokenize("Eu moro em São Paulo há 3 anos") == ["moro", "sao", "paulo", "ha", "anos"]
+
+
+@pytest.fixture
+def memory(tmp_path):
+    return MemoryIndex(root=str(tmp_path / "memory"), max_loaded=2)
+
+
+def test_search_ranks_relevant_messages(memory):
+    memory.add("u1", "s1", "user", "meu cachorro se chama thor", timestamp=1)
+    memory.add("u1", "s1", "user", "trabalho de enfermeira no hospital", timestamp=2)
+    memory.add("u1", "s1", "assistant", json.dumps({"text": "que fofo o thor, amor"}), timestamp=3)
+    hits = memory.search("u1", "como está o thor?", k=2)
+    assert [h["text"] for h in hits] == ["que fofo o thor, amor", "meu cachorro se chama thor"]
+    assert hits[0]["score"] >= hits[1]["score"] > 0
+
+
+def test_short_messages_are_not_indexed(memory):
+    assert not memory.add("u1", "s1", "user", "kkk")
+
+
+def test_users_and_sessions_are_isolated(memory):
+    memory.add("u1", "s1", "user", "adoro praia de floripa")
+    memory.add("u2", "s9", "user", "adoro praia de floripa")
+    memory.add("u1", "s2", "user", "hoje fui na praia")
+    assert [h["session"] for h in memory.search("u1", "praia", exclude_session="s2")] == ["s1"]
+    memory.forget("u2")
+    assert memory.search("u2", "praia") == []
+
+
+def test_index_reloads_from_disk_after_eviction(memory, tmp_path):
+    memory.add("u1", "s1", "user", "gosto de vinho tinto")
+    memory.search("u1", "vinho")
+    memory.search("u2", "vinho")
+    memory.search("u3", "vinho")  # u1 sai do LRU
+    assert memory.stats()["loaded_users"] == 2
+    assert memory.search("u1", "vinho")[0]["text"] == "gosto de vinho tinto"
+    assert MemoryIndex(root=str(tmp_path / "memory")).search("u1", "vinho tinto")
+
+
+def test_rebuild_from_sqlite(memory, tmp_path):
+    db = str(tmp_path / "chat.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE conversations (id INTEGER PRIMARY KEY, user_id TEXT, session_id TEXT, "
+                 "timestamp TEXT, role TEXT, content TEXT)")
+    conn.executemany("INSERT INTO conversations (user_id, session_id, timestamp, role, content) VALUES (?,?,?,?,?)",
+                     [("u1", "s1", "2024-05-01 10:00:00", "user", "sou de curitiba capital"),
+                      ("u1", "s1", "2024-05-01 10:01:00", "user", "ok")])
+    conn.commit()
+    conn.close()
+    assert memory.rebuild(db) == 1
+    assert memory.search("u1", "curitiba")[0]["session"] == "s1"
@@ -0,0 +1,74 @@
+import urllib.request
+
+from metrics import ActivityTracker, Histogram, MetricsRegistry, parse, start_http_server
+
+
+def test_histogram_buckets_are_inclusive():
+    histogram = Histogram((0.1, 0.5, 1.0))
+    for value in (0.1, 0.3, 0.5, 2.0):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {0.1: 1, 0.5: 3, 1.0: 3, float("inf"): 4}
+    assert snapshot["count"] == 4 and snapshot["sum"] == 2.9
+    assert snapshot["p50"] == 0.5 and snapshot["p95"] == float("inf")
+
+
+def test_empty_histogram_quantile():
+    assert Histogram((1.0,)).quantile(0.5) == 0.0
+
+
+def test_registering_twice_returns_same_metric():
+    registry = MetricsRegistry()
+    counter = registry.counter("mylle_msgs_total", "Mensagens", ("route",))
+    assert registry.counter("mylle_msgs_total", "Mensagens", ("route",)) is counter
+
+
+def test_render_and_parse_round_trip():
+    registry = MetricsRegistry()
+    registry.counter("mylle_msgs_total", "Mensagens", ("route",)).inc(route="local")
+    registry.counter("mylle_msgs_total", "Mensagens", ("route",)).inc(2, route='gem"ini')
+    registry.gauge("mylle_active", "Sessões ativas").set(3)
+    registry.histogram("mylle_latency_seconds", "Latência", (0.5, 1.0)).observe(0.7)
+    text = registry.render()
+    assert "# TYPE mylle_msgs_total counter" in text
+    samples = parse(text)
+    assert samples['mylle_msgs_total{route="local"}'] == 1
+    assert samples['mylle_msgs_total{route="gem\\"ini"}'] == 2
+    assert samples["mylle_active"] == 3
+    assert samples['mylle_latency_seconds_bucket{le="0.5"}'] == 0
+    assert samples['mylle_latency_seconds_bucket{le="+Inf"}'] == 1
+    assert samples["mylle_latency_seconds_count"] == 1
+
+
+def test_failing_collector_is_skipped():
+    registry = MetricsRegistry()
+    registry.gauge("mylle_ok", "ok").set(1)
+    registry.add_collector("quebrado", lambda: 1 / 0)
+    registry.add_collector("cache", lambda: [("mylle_cache_hits", "gauge", "Hits", [({}, 5.0)])])
+    assert registry.snapshot() == {"mylle_ok": [({}, 1)], "mylle_cache_hits": [({}, 5.0)]}
+
+
+def test_activity_tracker_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("metrics.time.time", lambda: now[0])
+    tracker = ActivityTracker(window=60)
+    tracker.touch("a")
+    now[0] += 30
+    tracker.touch("b")
+    assert tracker.active() == 2
+    now[0] += 45
+    assert tracker.active() == 1
+
+
+def test_http_endpoint():
+    registry = MetricsRegistry()
+    registry.counter("mylle_msgs_total", "Mensagens").inc()
+    server = start_http_server(registry, 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert parse(response.read().decode())["mylle_msgs_total"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
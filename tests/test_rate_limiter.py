@@ -0,0 +1,72 @@
+import pytest
+
+from rate_limiter import SQLiteBucketStore, TokenBucketLimiter, client_ip, create_store, network_of
+
+
+@pytest.mark.parametrize("peer, forwarded_for, hops, expected", [
+    ("10.0.0.1", "", 0, "10.0.0.1"),
+    ("10.0.0.1", "1.2.3.4", 0, "10.0.0.1"),            # sem proxy confiável o cabeçalho é ignorado
+    ("10.0.0.1", "6.6.6.6, 1.2.3.4", 1, "1.2.3.4"),    # só a entrada do proxy mais próximo vale
+    ("10.0.0.1", "6.6.6.6, 1.2.3.4, 10.0.0.9", 2, "1.2.3.4"),
+    ("10.0.0.1", "1.2.3.4", 3, "1.2.3.4"),
+    (None, "", 0, ""),
+])
+def test_client_ip(peer, forwarded_for, hops, expected):
+    assert client_ip(peer, forwarded_for, hops) == expected
+
+
+@pytest.mark.parametrize("ip, expected", [
+    ("203.0.113.7", "203.0.113.7"),
+    ("::ffff:203.0.113.7", "203.0.113.7"),
+    ("2001:db8:1:2:3:4:5:6", "2001:db8:1:2::/64"),
+    ("não é ip", ""),
+    ("", ""),
+])
+def test_network_of(ip, expected):
+    assert network_of(ip) == expected
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteBucketStore(str(tmp_path / "rate.db"))
+
+
+def test_bucket_refills_over_time(store):
+    buckets = [("u:a", 2, 1.0)]
+    assert store.take(buckets, now=100).allowed
+    assert store.take(buckets, now=100).allowed
+    denied = store.take(buckets, now=100)
+    assert not denied.allowed and denied.retry_after == pytest.approx(1.0)
+    assert store.take(buckets, now=101).allowed
+
+
+def test_take_is_all_or_nothing(store):
+    assert store.take([("u:a", 5, 0.001), ("f:x", 1, 0.001)], now=0).allowed
+    assert not store.take([("u:a", 5, 0.001), ("f:x", 1, 0.001)], now=0).allowed
+    # O balde do usuário não foi debitado pela tentativa negada
+    assert store.take([("u:a", 5, 0.001)], now=0).remaining == pytest.approx(3)
+
+
+def test_prune_removes_full_buckets(store):
+    store.take([("u:a", 2, 1.0)], now=0)
+    assert store.prune(full_after=2, now=10) == 1
+
+
+def test_limiter_fingerprint_and_network_buckets(store):
+    limiter = TokenBucketLimiter(store, capacity=2, window=3600, fingerprint_factor=2, network_factor=3)
+    # Ids novos a cada aba continuam presos ao balde da impressão digital...
+    results = [limiter.take(f"user-{i}", fingerprint="fp").allowed for i in range(6)]
+    assert results == [True] * 4 + [False] * 2
+    # ...e trocar a impressão digital não escapa do balde da rede
+    results = [limiter.take(f"other-{i}", fingerprint=f"fp-{i}", network="203.0.113.7").allowed for i in range(8)]
+    assert results == [True] * 6 + [False] * 2
+    assert limiter.stats() == {"allowed": 10, "denied": 4}
+
+
+def test_limiter_capacity_override(store):
+    limiter = TokenBucketLimiter(store, capacity=1, window=3600)
+    assert [limiter.take("vip", capacity=3).allowed for _ in range(4)] == [True, True, True, False]
+
+
+def test_create_store_defaults_to_sqlite(tmp_path):
+    assert isinstance(create_store(str(tmp_path / "x.db")), SQLiteBucketStore)
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from response_cache import SemanticResponseCache, jsonl_quality_hook, normalize
+
+SCOPE = ("Mylle", "aquecimento", False, False)
+RESPONSE = {"text": "Tenho sim, amor 😘", "cta": {"show": False}}
+
+
+@pytest.fixture
+def cache():
+    return SemanticResponseCache(threshold=0.8)
+
+
+def test_normalize():
+    assert normalize("Oiii, VOCÊ tá aí?? 😍") == "oi voce ta"
+
+
+def test_near_duplicate_hits(cache):
+    assert cache.store("você tem fotos novas?", SCOPE, RESPONSE)
+    assert cache.lookup("voce tem fotos novas", SCOPE) == RESPONSE
+    assert cache.lookup("Você tem fotos novaaas??", SCOPE) == RESPONSE
+
+
+def test_negation_never_matches_affirmation(cache):
+    cache.store("eu quero ver suas fotos", SCOPE, RESPONSE)
+    assert cache.lookup("eu não quero ver suas fotos", SCOPE) is None
+    cache.store("não gostei das fotos", SCOPE, RESPONSE)
+    assert cache.lookup("gostei das fotos", SCOPE) is None
+
+
+def test_scope_and_distance(cache):
+    cache.store("você tem fotos novas?", SCOPE, RESPONSE)
+    assert cache.lookup("você tem fotos novas?", ("Mylle", "avancado", False, False)) is None
+    assert cache.lookup("qual seu signo?", SCOPE) is None
+
+
+def test_long_messages_are_not_cached(cache):
+    assert not cache.store(" ".join(["palavra"] * 20), SCOPE, RESPONSE)
+
+
+def test_returns_copies(cache):
+    cache.store("você tem fotos novas?", SCOPE, RESPONSE)
+    cache.lookup("você tem fotos novas?", SCOPE)["text"] = "alterado"
+    assert cache.lookup("você tem fotos novas?", SCOPE) == RESPONSE
+
+
+def test_lru_and_ttl(monkeypatch):
+    cache = SemanticResponseCache(max_entries=2, ttl=60)
+    for text in ("primeira mensagem aqui", "segunda mensagem aqui", "terceira mensagem aqui"):
+        cache.store(text, SCOPE, RESPONSE)
+    assert cache.stats()["evictions"] == 1
+    assert cache.lookup("primeira mensagem aqui", SCOPE) is None
+
+    import response_cache
+    now = response_cache.time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 120)
+    assert cache.lookup("terceira mensagem aqui", SCOPE) is None
+
+
+def test_quality_hook_samples_hits(tmp_path):
+    cache = SemanticResponseCache(sample_rate=1.0)
+    path = str(tmp_path / "samples.jsonl")
+    cache.add_quality_hook(jsonl_quality_hook(path))
+    cache.store("você tem fotos novas?", SCOPE, RESPONSE)
+    cache.lookup("voce tem fotos novas", SCOPE)
+    with open(path, encoding="utf-8") as f:
+        record = json.loads(f.readline())
+    assert record["matched"] == "você tem fotos novas?" and record["scope"] == list(SCOPE)
@@ -0,0 +1,73 @@
+import itertools
+
+import pytest
+
+from response_pools import (
+    GREETING_SLOT, HUMORS, INTENT_CTA, INTENT_SLOTS, INTENTS, MAX_CHARS, PERSONAS,
+    ResponsePools, _clash, generate_local, pool_key,
+)
+
+
+@pytest.fixture
+def pools():
+    return ResponsePools({"k": [{"text": str(i)} for i in range(5)]}, version=3)
+
+
+def test_pool_key():
+    assert pool_key("noite", "carente", "preco") == "noite|carente|preco"
+
+
+def test_clash():
+    assert _clash("Acordei agora", "e acordei pensando em você")
+    assert not _clash("Acordei agora", "hoje tô carente")
+
+
+def test_every_intent_has_slot_rules():
+    assert set(INTENT_SLOTS) == set(INTENTS)
+
+
+def test_each_cycle_is_a_permutation(pools):
+    for cycle in range(3):
+        picked = [pools.pick("k", "u1", cycle * 5 + i)["text"] for i in range(5)]
+        assert sorted(picked) == [str(i) for i in range(5)]
+
+
+def test_no_repeat_across_cycles(pools):
+    for user in ("u1", "u2", "u3"):
+        picked = [pools.pick("k", user, i)["text"] for i in range(40)]
+        assert all(a != b for a, b in zip(picked, picked[1:]))
+
+
+def test_pick_is_deterministic_and_returns_a_copy(pools):
+    entry = pools.pick("k", "u1", 7)
+    assert entry == pools.pick("k", "u1", 7)
+    entry["text"] = "mudou"
+    assert all(e["text"] != "mudou" for e in pools.pools["k"])
+
+
+def test_pick_unknown_key(pools):
+    assert pools.pick("nada", "u1", 0) is None
+
+
+def test_save_and_load(tmp_path, pools):
+    path = str(tmp_path / "pools.json")
+    pools.save(path)
+    loaded = ResponsePools.load(path)
+    assert loaded.pools == pools.pools and loaded.version == 3
+    assert ResponsePools.load(str(tmp_path / "missing.json")) is None
+
+
+def test_stats(pools):
+    assert pools.stats() == {"version": 3, "keys": 1, "entries": 5, "min_pool": 5}
+
+
+@pytest.mark.parametrize("persona,humor,intent", list(itertools.product(PERSONAS, HUMORS, INTENTS)))
+def test_generate_local(persona, humor, intent):
+    entries = generate_local(persona, humor, intent, size=10)
+    assert entries
+    texts = [e["text"] for e in entries]
+    assert len(set(texts)) == len(texts)
+    assert all(len(text) <= MAX_CHARS for text in texts)
+    if intent == "abertura":
+        assert all(text.startswith(GREETING_SLOT) for text in texts)
+    assert all(e["cta"]["show"] == (intent in INTENT_CTA) for e in entries)
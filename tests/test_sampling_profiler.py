@@ -0,0 +1,65 @@
+import json
+import sys
+import threading
+import time
+
+from sampling_profiler import SamplingProfiler, collapse, read_collapsed, to_speedscope
+
+
+def test_collapse_goes_root_to_leaf():
+    def inner():
+        return collapse(sys._getframe())
+
+    stack = collapse(sys._getframe())
+    assert inner().startswith(stack + ";")
+    assert inner().rsplit(";", 1)[1].startswith("test_collapse_goes_root_to_leaf.<locals>.inner (test_sampling_profiler.py:")
+
+
+def test_to_speedscope_shares_frames():
+    stacks = {"main (app.py:1);a (app.py:5)": 3, "main (app.py:1);b (app.py:9)": 1}
+    profile = to_speedscope(stacks, 0.01, "janela")
+    frames = profile["shared"]["frames"]
+    assert frames == [{"name": "main", "file": "app.py", "line": 1},
+                      {"name": "a", "file": "app.py", "line": 5},
+                      {"name": "b", "file": "app.py", "line": 9}]
+    sampled = profile["profiles"][0]
+    assert sampled["samples"] == [[0, 1], [0, 2]]
+    assert sampled["weights"] == [0.03, 0.01] and sampled["endValue"] == 0.04
+
+
+def _busy_worker(stop: threading.Event, ready: threading.Event, profiler: SamplingProfiler):
+    profiler.watch_current_thread()
+    ready.set()
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_samples_watched_thread_and_writes_window(tmp_path):
+    profiler = SamplingProfiler(out_dir=str(tmp_path), interval=0.002, window=60)
+    stop, ready = threading.Event(), threading.Event()
+    worker = threading.Thread(target=_busy_worker, args=(stop, ready, profiler))
+    worker.start()
+    ready.wait(5)
+    profiler.set_override(True)
+    assert profiler.running and profiler.override is True
+    deadline = time.time() + 5
+    while profiler.stats()["samples"] < 5 and time.time() < deadline:
+        time.sleep(0.01)
+    profiler.set_override(False)
+    stop.set()
+    worker.join()
+
+    assert not profiler.running and profiler.override is False
+    collapsed, speedscope = profiler.files
+    assert collapsed.endswith(".collapsed") and speedscope.endswith(".speedscope.json")
+    stacks = read_collapsed(collapsed)
+    assert sum(stacks.values()) == profiler.stats()["samples"] >= 5
+    assert all("_busy_worker" in stack for stack in stacks)
+    with open(speedscope, encoding="utf-8") as f:
+        assert json.load(f)["profiles"][0]["type"] == "sampled"
+
+
+def test_flush_without_samples_writes_nothing(tmp_path):
+    profiler = SamplingProfiler(out_dir=str(tmp_path / "perfis"))
+    assert profiler.flush() == []
+    assert not (tmp_path / "perfis").exists()
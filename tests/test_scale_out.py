@@ -0,0 +1,63 @@
+import pytest
+
+import identity
+from scale_out import HashRing, _parse_head, _with_forwarded_for, route_key
+
+HEAD = (b"GET /?uid=abc.sig HTTP/1.1\r\nHost: localhost\r\n"
+        b"X-Forwarded-For: 1.1.1.1\r\nUser-Agent: teste\r\n\r\n")
+
+
+def test_parse_head():
+    target, headers = _parse_head(HEAD)
+    assert target == "/?uid=abc.sig"
+    assert headers["host"] == "localhost" and headers["user-agent"] == "teste"
+
+
+def test_route_key_prefers_query_token():
+    assert route_key(f"/?{identity.PARAM}=abc.sig", {}, "9.9.9.9") == ("abc", "abc.sig")
+
+
+def test_route_key_uses_cookie_without_resending_it():
+    headers = {"cookie": f"outro=1; {identity.COOKIE}=abc.sig"}
+    assert route_key("/_stcore/stream", headers, "9.9.9.9") == ("abc", None)
+
+
+def test_route_key_falls_back_to_peer_and_user_agent(monkeypatch):
+    monkeypatch.setattr("scale_out.TRUSTED_PROXY_HOPS", 0)
+    headers = {"x-forwarded-for": "1.1.1.1", "user-agent": "teste"}
+    assert route_key("/", headers, "9.9.9.9") == ("9.9.9.9|teste", None)
+
+
+def test_with_forwarded_for_appends_peer():
+    head = _with_forwarded_for(HEAD, "9.9.9.9")
+    assert head.endswith(b"\r\n\r\n") and head.startswith(b"GET /?uid=abc.sig HTTP/1.1\r\n")
+    _, headers = _parse_head(head)
+    assert headers["x-forwarded-for"] == "1.1.1.1, 9.9.9.9"
+    assert head.lower().count(b"x-forwarded-for") == 1
+
+
+def test_with_forwarded_for_creates_header():
+    _, headers = _parse_head(_with_forwarded_for(b"GET / HTTP/1.1\r\nHost: x\r\n\r\n", "9.9.9.9"))
+    assert headers["x-forwarded-for"] == "9.9.9.9"
+
+
+@pytest.fixture
+def ring():
+    return HashRing(["w0", "w1", "w2"])
+
+
+def test_ring_is_sticky_and_spread(ring):
+    keys = [f"user{i}" for i in range(300)]
+    routes = {key: ring.lookup(key) for key in keys}
+    assert routes == {key: ring.lookup(key) for key in keys}
+    assert set(routes.values()) == {"w0", "w1", "w2"}
+
+
+def test_dead_node_only_moves_its_users(ring):
+    keys = [f"user{i}" for i in range(300)]
+    before = {key: ring.lookup(key) for key in keys}
+    after = {key: ring.lookup(key, alive={"w0", "w2"}) for key in keys}
+    assert all(after[key] == before[key] for key in keys if before[key] != "w1")
+    assert all(after[key] in ("w0", "w2") for key in keys)
+    assert ring.lookup("user1", alive=set()) is None
+    assert HashRing([]).lookup("user1") is None
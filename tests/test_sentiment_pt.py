@@ -0,0 +1,40 @@
+import pytest
+
+from sentiment_pt import PortugueseSentiment, tokenize
+
+MESSAGES = [
+    "te amo demais ❤️",
+    "que droga, odiei",
+    "não gostei nada disso",
+    "muito lindaaa!!!",
+    "kkkkkk",
+    "vou no mercado",
+    "",
+]
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return PortugueseSentiment()
+
+
+def test_tokenize_normalizes_slang():
+    assert tokenize("Lindaaa KKKKK hahaha rsrs ❤️") == ["linda", "kk", "haha", "rs", "❤️"]
+
+
+def test_polarity_direction(analyzer):
+    assert analyzer.score("te amo demais ❤️")[0] > 0.3
+    assert analyzer.score("que droga, odiei")[0] < -0.3
+    assert analyzer.score("vou no mercado") == (0.0, 0.0)
+
+
+def test_negation_and_intensifier(analyzer):
+    assert analyzer.score("não gostei")[0] < 0 < analyzer.score("gostei")[0]
+    assert analyzer.score("muito lindo")[0] > analyzer.score("lindo")[0]
+    assert analyzer.score("lindo!!!")[0] > analyzer.score("lindo")[0]
+
+
+def test_batch_matches_scalar(analyzer):
+    polarity, subjectivity = analyzer.score_batch(MESSAGES)
+    for i, text in enumerate(MESSAGES):
+        assert (float(polarity[i]), float(subjectivity[i])) == pytest.approx(analyzer.score(text))
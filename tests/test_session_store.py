@@ -0,0 +1,28 @@
+from session_store import SQLiteSessionStore, create_store
+
+
+def test_round_trip_and_overwrite(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    assert store.load("u1") is None
+    store.save("u1", {"messages": [{"role": "user", "content": "oi"}], "page": "chat"})
+    store.save("u1", {"messages": [], "page": "offers"})
+    assert store.load("u1") == {"messages": [], "page": "offers"}
+
+
+def test_shared_between_store_instances(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(path).save("u1", {"session_id": "abc"})
+    assert SQLiteSessionStore(path).load("u1") == {"session_id": "abc"}
+
+
+def test_on_commit_hook_is_used(tmp_path):
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+        conn.commit()
+
+    store = create_store(str(tmp_path / "sessions.db"), on_commit)
+    assert isinstance(store, SQLiteSessionStore)
+    store.save("u1", {})
+    assert len(commits) == 2
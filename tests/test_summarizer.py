@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+import chatbot
+
+
+def messages(start, end):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"msg-{i:02d}"} for i in range(start, end)]
+
+
+def wait_idle(summarizer, session_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while session_id in summarizer._pending and time.time() < deadline:
+        time.sleep(0.01)
+    assert session_id not in summarizer._pending
+
+
+@pytest.fixture
+def summarizer(monkeypatch):
+    summarizer = chatbot.ConversationSummarizer(max_workers=1, max_sessions=2)
+    # Resumo "remoto" determinístico: lista as mensagens resumidas
+    monkeypatch.setattr(summarizer, "_summarize_remote", lambda previous, lines: f"{previous} | {lines}")
+    return summarizer
+
+
+def test_coverage_is_counted_from_conversation_start(summarizer):
+    summarizer.schedule("s", messages(0, 10), 6)
+    wait_idle(summarizer, "s")
+    covered, summary = summarizer.get("s", 10)
+    assert covered == 6 and "msg-05" in summary and "msg-06" not in summary
+
+    # A lista perdeu as 4 primeiras mensagens: folded_until e o histórico são relativos ao offset
+    summarizer.schedule("s", messages(4, 24), 8, offset=4)
+    wait_idle(summarizer, "s")
+    covered, summary = summarizer.get("s", 24)
+    assert covered == 12
+    new_part = summary.split(" | ")[-1]
+    assert "msg-06" in new_part and "msg-11" in new_part
+    assert "msg-04" not in new_part and "msg-05" not in new_part and "msg-12" not in new_part
+
+
+def test_small_gap_is_not_summarized(summarizer):
+    summarizer.schedule("s", messages(0, 10), chatbot.Config.SUMMARY_REFRESH_MIN - 1)
+    wait_idle(summarizer, "s")
+    assert summarizer.get("s", 10) == (0, "")
+
+
+def test_restarted_history_drops_summary(summarizer):
+    summarizer.schedule("s", messages(0, 10), 6)
+    wait_idle(summarizer, "s")
+    assert summarizer.get("s", 3) == (0, "")
+
+
+def test_sessions_are_bounded(summarizer):
+    for session_id in ("a", "b", "c"):
+        summarizer.schedule(session_id, messages(0, 10), 6)
+        wait_idle(summarizer, session_id)
+    assert summarizer.stats()["sessions"] == 2
+    assert summarizer.get("a", 10) == (0, "")
+
+
+def test_context_keeps_unsummarized_messages_after_trim(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shared = chatbot.get_conversation_summarizer()
+    monkeypatch.setitem(shared._summaries, "u:s", (6, "RESUMO"))
+    shared._pending.add("u:s")  # sem atualização em segundo plano durante o teste
+    try:
+        service = chatbot.ApiService(state={"session_id": "s", "history_offset": 4, "messages": []})
+        context = service._format_conversation_context(messages(4, 24), {}, "u:s")
+    finally:
+        shared._pending.discard("u:s")
+    assert "RESUMO" in context
+    assert "msg-04" not in context and "msg-05" not in context
+    assert all(f"msg-{i:02d}" in context for i in range(6, 24))
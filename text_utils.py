@@ -0,0 +1,46 @@
+"""
+Normalização de texto compartilhada pelos módulos de linguagem: palavras-chave
+do chatbot, classificador de intenção, sentimento, memória e cache de respostas.
+
+Todos comparam palavras do mesmo jeito: minúsculas, sem acento ("Vídeo" ->
+"video") e, quando pedem, com letras repetidas colapsadas ("oiii" -> "oi").
+"""
+import json
+import re
+import unicodedata
+from typing import List
+
+WORD_RE = re.compile(r"\w+")
+_COMBINING_RE = re.compile("[\u0300-\u036f]")
+_REPEAT_RE = re.compile(r"(\w)\1+")
+
+# Palavras que invertem o sentido da mensagem (já dobradas)
+NEGATION_WORDS = frozenset({"nao", "nunca", "nem", "jamais", "nada", "ninguem", "nenhum", "nenhuma", "sem"})
+
+
+def fold_text(text: str) -> str:
+    """Minúsculas e sem acentos; texto ASCII não passa pelo unicodedata."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return _COMBINING_RE.sub("", unicodedata.normalize("NFD", text))
+
+
+def words(text: str) -> List[str]:
+    """Palavras do texto depois de `fold_text`."""
+    return WORD_RE.findall(fold_text(text))
+
+
+def collapse_repeats(word: str) -> str:
+    """Reduz letras repetidas a uma só ("lindaaa" -> "linda")."""
+    return _REPEAT_RE.sub(r"\1", word)
+
+
+def extract_message_text(content: str) -> str:
+    """Texto de uma mensagem salva (respostas da Mylle ficam em JSON)."""
+    if content.startswith('{"text"'):
+        try:
+            return json.loads(content).get("text", content)
+        except (ValueError, AttributeError):
+            pass
+    return content